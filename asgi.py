@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point: uvicorn asgi:app
+This script ensures the project root is in the Python path.
+"""
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.asgi import create_asgi_app
+
+app = create_asgi_app()
@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_cors import CORS
 from backend.config import get_config
@@ -26,8 +27,18 @@ def create_app():
         "http://localhost:3000",  # Alternative frontend port
     ], supports_credentials=True)
     
+    # Per-request timing (Server-Timing header) and aggregate metrics
+    if config.METRICS_ENABLED:
+        from backend.utils import metrics as request_metrics
+        request_metrics.init_app(app)
+    
+    # ETags, 304s and compression (registered after the metrics hooks, so
+    # it runs before them and its time is part of the request's timing)
+    from backend.utils import http_cache
+    http_cache.init_app(app)
+    
     # Register blueprints
-    from backend.routes import auth, datasets, assignments, chat, submissions, grading, debug
+    from backend.routes import auth, datasets, assignments, chat, submissions, grading, debug, metrics
 
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(datasets.bp, url_prefix='/api/datasets')
@@ -36,6 +47,15 @@ def create_app():
     app.register_blueprint(submissions.bp, url_prefix='/api/submissions')
     app.register_blueprint(grading.bp, url_prefix='/api/grading')
     app.register_blueprint(debug.bp, url_prefix='/api/debug')
+    # Route latency and traffic are not public: no token, no scrape endpoint
+    if config.METRICS_ENABLED and config.METRICS_TOKEN:
+        app.register_blueprint(metrics.bp, url_prefix='/api/metrics')
+    
+    # Keep the scenario warm pool topped up in the background.
+    # Under the debug reloader only the serving child process runs it.
+    if config.SCENARIO_POOL_BACKGROUND and (not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        from backend.services.scenario_pool import start_pool_replenisher
+        start_pool_replenisher()
     
     # Health check endpoint
     @app.route('/api/health')
@@ -0,0 +1,298 @@
+"""
+ASGI serving mode.
+
+The LLM-bound routes (first assignment load and chat turns) are served by
+native async views: the Gemini call is awaited, so a request waiting on the
+model holds no thread and one process can keep hundreds of conversations in
+flight. Their short Supabase queries run in a bounded thread pool, since
+supabase-py has no async client in the version we use. Every other route is
+the regular Flask app behind a WSGI bridge, so both modes share all the
+service code.
+
+The sync mode (run.py, api/index.py) is unchanged.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import wraps
+from a2wsgi import WSGIMiddleware
+from pydantic import ValidationError
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from backend.app import create_app
+from backend.config import get_config
+from backend.models.chat_message import ChatMessageCreate
+from backend.routes.assignments import assignment_etag, assignment_payload
+from backend.routes.chat import sse_event
+from backend.services.assignment_service import get_assignment_access, get_or_create_assignment_async
+from backend.services.auth_service import verify_jwt_token_async
+from backend.services.chat_service import append_chat_turn, get_chat_context_async
+from backend.services.llm_service import chat_with_stakeholder_async, stream_chat_with_stakeholder_async
+from backend.utils.http_cache import CACHE_CONTROL, compress, etag_matches
+from backend.utils.metrics import finish_async_request, start_async_request, timed
+
+config = get_config()
+
+def create_asgi_app() -> Starlette:
+    """ASGI application factory"""
+    flask_app = create_app()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Bounds the threads used for DB calls from the async views
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=config.ASGI_THREADPOOL_SIZE, thread_name_prefix='asgi-db')
+        )
+        yield
+
+    def json_response(data: dict, status: int, request=None, etag: str = None) -> Response:
+        # Flask's JSON provider, so values (e.g. datetimes) encode as in the sync app
+        with timed('serialize'):
+            body = flask_app.json.dumps(data).encode('utf-8')
+
+        headers = {}
+        if etag is not None:
+            headers.update({'ETag': f'W/"{etag}"', 'Cache-Control': CACHE_CONTROL})
+        if request is not None:
+            # Compressed like the Flask routes' responses (http_cache.init_app)
+            body, coding = compress(body, request.headers.get('accept-encoding'))
+            headers['Vary'] = 'Accept-Encoding'
+            if coding:
+                headers['Content-Encoding'] = coding
+
+        return Response(body, status_code=status, headers=headers, media_type='application/json')
+
+    def require_auth(user_type=None):
+        """Async counterpart of routes.auth.require_auth; sets request.state.user"""
+        def decorator(view):
+            @wraps(view)
+            async def decorated_view(request):
+                auth_header = request.headers.get('Authorization')
+
+                if not auth_header or not auth_header.startswith('Bearer '):
+                    return json_response({'error': 'Missing or invalid authorization header'}, 401)
+
+                token = auth_header.split(' ')[1]
+
+                try:
+                    payload = await verify_jwt_token_async(token)
+
+                    # Check user type if specified
+                    if user_type and payload.get('user_type') != user_type:
+                        return json_response({'error': 'Unauthorized'}, 403)
+
+                    request.state.user = payload
+
+                except ValueError as e:
+                    return json_response({'error': str(e)}, 401)
+
+                return await view(request)
+            return decorated_view
+        return decorator
+
+    def instrumented(route: str):
+        """Server-Timing header and metrics, as metrics.init_app does for Flask routes"""
+        def decorator(view):
+            @wraps(view)
+            async def instrumented_view(request):
+                if not config.METRICS_ENABLED:
+                    return await view(request)
+
+                timings = start_async_request()
+                response = await view(request)
+
+                if isinstance(response, StreamingResponse):
+                    # Header covers setup only; aggregates are recorded when the stream ends
+                    response.headers['Server-Timing'] = timings.server_timing(time.perf_counter() - timings.started)
+                    body = response.body_iterator
+
+                    async def observed_body():
+                        try:
+                            async for chunk in body:
+                                yield chunk
+                        finally:
+                            finish_async_request(timings, route, request.method, response.status_code)
+
+                    response.body_iterator = observed_body()
+                else:
+                    response.headers['Server-Timing'] = finish_async_request(
+                        timings, route, request.method, response.status_code
+                    )
+
+                return response
+            return instrumented_view
+        return decorator
+
+    @instrumented('/api/assignments/me')
+    @require_auth('student')
+    async def get_my_assignment(request):
+        """Get or create assignment for current student (JIT generation with meta-prompt)"""
+        try:
+            student_nim = request.state.user['user_id']
+
+            # Get or create assignment (JIT generation happens here)
+            assignment = await get_or_create_assignment_async(student_nim)
+
+            etag = assignment_etag(assignment)
+            if etag_matches(request.headers.get('if-none-match'), etag):
+                return Response(status_code=304, headers={
+                    'ETag': f'W/"{etag}"',
+                    'Cache-Control': CACHE_CONTROL,
+                    'Vary': 'Accept-Encoding'
+                })
+
+            return json_response({
+                'success': True,
+                'assignment': assignment_payload(assignment)
+            }, 200, request=request, etag=etag)
+
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        except Exception as e:
+            print(f"Error in get_my_assignment: {e}")
+            return json_response({'error': 'Internal server error'}, 500)
+
+    @instrumented('/api/chat/<assignment_id>/message')
+    @require_auth('student')
+    async def send_chat_message(request):
+        """Send a chat message and get AI response (Actor LLM with meta-prompt)"""
+        assignment_id = request.path_params['assignment_id']
+
+        try:
+            student_nim = request.state.user['user_id']
+            data = await request.json()
+
+            # Validate input
+            message_data = ChatMessageCreate(**data)
+
+            # Verify assignment belongs to student
+            assignment = await asyncio.to_thread(get_assignment_access, assignment_id)
+            if assignment.student_nim != student_nim:
+                return json_response({'error': 'Unauthorized'}, 403)
+
+            scenario = assignment.scenario
+            chat_context = await get_chat_context_async(assignment_id, scenario)
+
+            ai_response = await chat_with_stakeholder_async(
+                scenario=scenario,
+                context=chat_context,
+                new_message=message_data.content
+            )
+
+            # Save the message and reply together once the reply exists
+            _, ai_msg = await asyncio.to_thread(append_chat_turn, assignment_id, message_data.content, ai_response)
+
+            return json_response({
+                'success': True,
+                'response': ai_response,
+                'timestamp': ai_msg['timestamp']
+            }, 200)
+
+        except ValidationError as e:
+            return json_response({'error': 'Invalid input', 'details': e.errors()}, 400)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 404)
+        except Exception as e:
+            print(f"Error in send_chat_message: {e}")
+            return json_response({'error': 'Internal server error'}, 500)
+
+    @instrumented('/api/chat/<assignment_id>/message/stream')
+    @require_auth('student')
+    async def stream_chat_message(request):
+        """Send a chat message and stream the AI response as Server-Sent Events"""
+        assignment_id = request.path_params['assignment_id']
+
+        try:
+            student_nim = request.state.user['user_id']
+            data = await request.json()
+
+            # Validate input
+            message_data = ChatMessageCreate(**data)
+
+            # Verify assignment belongs to student
+            assignment = await asyncio.to_thread(get_assignment_access, assignment_id)
+            if assignment.student_nim != student_nim:
+                return json_response({'error': 'Unauthorized'}, 403)
+
+            scenario = assignment.scenario
+            chat_context = await get_chat_context_async(assignment_id, scenario)
+
+        except ValidationError as e:
+            return json_response({'error': 'Invalid input', 'details': e.errors()}, 400)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 404)
+        except Exception as e:
+            print(f"Error in stream_chat_message: {e}")
+            return json_response({'error': 'Internal server error'}, 500)
+
+        async def generate():
+            chunks = []
+            try:
+                async for chunk in stream_chat_with_stakeholder_async(
+                    scenario=scenario,
+                    context=chat_context,
+                    new_message=message_data.content
+                ):
+                    chunks.append(chunk)
+                    yield sse_event('token', {'text': chunk})
+
+                # Save the message with the assembled reply once the stream is complete
+                ai_response = ''.join(chunks).strip()
+                _, ai_msg = await asyncio.to_thread(
+                    append_chat_turn, assignment_id, message_data.content, ai_response
+                )
+
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client disconnected mid-stream: stop pulling tokens from Gemini
+                # and don't persist the turn
+                print(f"Client disconnected from chat stream for assignment {assignment_id}")
+                raise
+            except Exception as e:
+                print(f"Error in stream_chat_message: {e}")
+                yield sse_event('error', {'error': 'Internal server error'})
+                return
+
+            yield sse_event('done', {
+                'response': ai_response,
+                'timestamp': ai_msg['timestamp']
+            })
+
+        return StreamingResponse(
+            generate(),
+            media_type='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # Disable proxy buffering so tokens flush immediately
+            }
+        )
+
+    app = Starlette(
+        routes=[
+            Route('/api/assignments/me', get_my_assignment, methods=['GET']),
+            Route('/api/chat/{assignment_id}/message', send_chat_message, methods=['POST']),
+            Route('/api/chat/{assignment_id}/message/stream', stream_chat_message, methods=['POST']),
+            # Everything else goes to the Flask app
+            Mount('/', app=WSGIMiddleware(flask_app, workers=config.ASGI_THREADPOOL_SIZE))
+        ],
+        middleware=[
+            # Same origins as the Flask app; the async views bypass flask-cors
+            Middleware(
+                CORSMiddleware,
+                allow_origins=[
+                    config.FRONTEND_URL,
+                    "http://localhost:5173",  # Vite default
+                    "http://localhost:3000",  # Alternative frontend port
+                ],
+                allow_methods=['*'],
+                allow_headers=['*'],
+                allow_credentials=True
+            )
+        ],
+        lifespan=lifespan
+    )
+
+    return app
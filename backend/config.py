@@ -14,14 +14,95 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
     SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
+    SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv('SUPABASE_POOL_MAX_CONNECTIONS', '50'))  # Per client, per worker process
+    SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv('SUPABASE_POOL_MAX_KEEPALIVE', '20'))  # Idle connections kept open
+    SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', '30'))  # Seconds an idle connection is kept
+    SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))  # Seconds
+    SUPABASE_READ_TIMEOUT = float(os.getenv('SUPABASE_READ_TIMEOUT', '30'))  # Seconds, also used for writes
+    SUPABASE_POOL_TIMEOUT = float(os.getenv('SUPABASE_POOL_TIMEOUT', '10'))  # Seconds to wait for a free connection
+    
+    # LLM backend: 'gemini' (Google Gemini API) or 'stub' (deterministic local stand-in for load testing)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini').lower()
     
     # Gemini API
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+    # Opt-in: generated personas (~400 words) are below the model's minimum cacheable size,
+    # so explicit caching only applies to personas written or extended beyond it
+    GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'False').lower() == 'true'  # Cache chat personas as CachedContent
+    GEMINI_CONTEXT_CACHE_TTL = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '900'))  # Seconds, provider bills cache storage per hour
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('GEMINI_CONTEXT_CACHE_MIN_TOKENS', '1024'))  # Model's minimum cacheable size
+    GEMINI_CONTEXT_CACHE_SIZE = int(os.getenv('GEMINI_CONTEXT_CACHE_SIZE', '1000'))  # Persona models kept in memory
+    
+    # Stub LLM backend
+    LLM_STUB_LATENCY_MS = float(os.getenv('LLM_STUB_LATENCY_MS', '500'))  # Time to first token
+    LLM_STUB_TOKENS_PER_SECOND = float(os.getenv('LLM_STUB_TOKENS_PER_SECOND', '50'))  # 0 = instant
+    LLM_STUB_FAILURE_RATE = float(os.getenv('LLM_STUB_FAILURE_RATE', '0'))  # 0-1
+    LLM_STUB_SEED = int(os.getenv('LLM_STUB_SEED', '0'))
     
     # JWT
     JWT_SECRET = os.getenv('JWT_SECRET')
     JWT_ALGORITHM = 'HS256'
     JWT_EXPIRATION_HOURS = 24
+    JWT_VERIFY_CACHE_SIZE = int(os.getenv('JWT_VERIFY_CACHE_SIZE', '10000'))  # Verified tokens kept per worker (0 = verify every request)
+    TOKEN_REVOCATION_REFRESH = float(os.getenv('TOKEN_REVOCATION_REFRESH', '30'))  # Seconds before revocations from other workers apply
+    
+    # Password hashing
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))  # Work factor; existing hashes are upgraded on login
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))  # Concurrent bcrypt operations per worker process
+    PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '16'))  # Waiting operations before logins get 503
+    
+    # Assignment creation claims (deduplicate concurrent generation across workers)
+    ASSIGNMENT_CLAIM_TTL = int(os.getenv('ASSIGNMENT_CLAIM_TTL', '120'))  # Seconds before a claim is considered abandoned
+    ASSIGNMENT_CLAIM_POLL_INTERVAL = float(os.getenv('ASSIGNMENT_CLAIM_POLL_INTERVAL', '0.5'))  # Seconds between waits
+    
+    # Assignment ownership/scenario cache for chat and submission routes
+    ASSIGNMENT_ACCESS_CACHE_SIZE = int(os.getenv('ASSIGNMENT_ACCESS_CACHE_SIZE', '2000'))
+    ASSIGNMENT_ACCESS_CACHE_TTL = int(os.getenv('ASSIGNMENT_ACCESS_CACHE_TTL', '300'))  # Seconds
+    
+    # Chat
+    CHAT_HISTORY_WINDOW = int(os.getenv('CHAT_HISTORY_WINDOW', '20'))  # Max recent messages sent verbatim to the Actor LLM
+    CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', '2000'))  # Summary + recent messages
+    CHAT_SUMMARY_MAX_TOKENS = int(os.getenv('CHAT_SUMMARY_MAX_TOKENS', '300'))  # Share of the budget reserved for the summary
+    CHAT_SUMMARY_BATCH_TOKENS = int(os.getenv('CHAT_SUMMARY_BATCH_TOKENS', '500'))  # Overflow folded into the summary at once (sent verbatim until then)
+    CHAT_MESSAGE_MAX_TOKENS = int(os.getenv('CHAT_MESSAGE_MAX_TOKENS', '500'))  # Longer messages are truncated in the prompt
+    CHAT_WINDOW_CACHE_SIZE = int(os.getenv('CHAT_WINDOW_CACHE_SIZE', '1000'))  # Conversations kept in memory
+    CHAT_WINDOW_CACHE_TTL = int(os.getenv('CHAT_WINDOW_CACHE_TTL', '900'))  # Seconds
+    CHAT_PAGE_SIZE = int(os.getenv('CHAT_PAGE_SIZE', '50'))  # Default chat messages per page
+    CHAT_PAGE_SIZE_MAX = int(os.getenv('CHAT_PAGE_SIZE_MAX', '200'))  # Larger limits are capped to this
+    
+    # Roster import
+    ROSTER_IMPORT_CHUNK_SIZE = int(os.getenv('ROSTER_IMPORT_CHUNK_SIZE', '500'))  # Students per upsert request
+    ROSTER_IMPORT_MAX_ERRORS = int(os.getenv('ROSTER_IMPORT_MAX_ERRORS', '100'))  # Row errors listed in the response
+    
+    # Grading
+    GRADING_PAGE_SIZE = int(os.getenv('GRADING_PAGE_SIZE', '50'))  # Default students per page
+    GRADING_PAGE_SIZE_MAX = int(os.getenv('GRADING_PAGE_SIZE_MAX', '100'))  # Larger limits are capped to this
+    SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', '20'))  # Default student search results
+    SEARCH_RESULT_LIMIT_MAX = int(os.getenv('SEARCH_RESULT_LIMIT_MAX', '100'))  # Larger limits are capped to this
+    GRADE_BULK_MAX_ITEMS = int(os.getenv('GRADE_BULK_MAX_ITEMS', '1000'))  # Grades per bulk upsert request
+    GRADEBOOK_EXPORT_BATCH_SIZE = int(os.getenv('GRADEBOOK_EXPORT_BATCH_SIZE', '200'))  # Students per query batch, also the IN filter size
+    GRADEBOOK_EXPORT_SPOOL_BYTES = int(os.getenv('GRADEBOOK_EXPORT_SPOOL_BYTES', str(8 * 1024 * 1024)))  # XLSX kept in memory up to this size, then on disk
+    
+    # Dataset catalog cache
+    DATASET_CATALOG_TTL = int(os.getenv('DATASET_CATALOG_TTL', '60'))  # Seconds, bounds staleness across workers
+    
+    # Scenario warm pool (0 disables pre-generation)
+    SCENARIO_POOL_DEPTH = int(os.getenv('SCENARIO_POOL_DEPTH', '0'))  # Pre-generated scenarios per dataset
+    SCENARIO_POOL_REFILL_INTERVAL = int(os.getenv('SCENARIO_POOL_REFILL_INTERVAL', '60'))  # Seconds
+    SCENARIO_POOL_BACKGROUND = os.getenv('SCENARIO_POOL_BACKGROUND', 'True').lower() == 'true'  # Run the replenisher thread
+    SCENARIO_POOL_LEASE_TTL = int(os.getenv('SCENARIO_POOL_LEASE_TTL', '300'))  # Seconds before an unrenewed replenish lease is taken over
+    
+    # Metrics: Prometheus scrape endpoint at /api/metrics (only served when METRICS_TOKEN is set)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    
+    # HTTP responses: ETags/304 for GET JSON, compression of larger bodies
+    RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'True').lower() == 'true'  # brotli/gzip (disable if a proxy compresses)
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))  # Smaller bodies are sent as is
+    
+    # ASGI mode (asgi.py): threads for DB calls from async views and for the bridged Flask routes
+    ASGI_THREADPOOL_SIZE = int(os.getenv('ASGI_THREADPOOL_SIZE', '40'))
     
     # CORS
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
@@ -33,10 +114,13 @@ class Config:
             'SUPABASE_URL',
             'SUPABASE_KEY',
             'SUPABASE_SERVICE_KEY',
-            'GEMINI_API_KEY',
             'JWT_SECRET'
         ]
         
+        # The stub LLM backend runs without an API key
+        if os.getenv('LLM_BACKEND', 'gemini').lower() == 'gemini':
+            required_vars.append('GEMINI_API_KEY')
+        
         missing = [var for var in required_vars if not os.getenv(var)]
         
         if missing:
@@ -42,6 +42,13 @@ class AssignmentWithDataset(BaseModel):
     scenario: Scenario
     created_at: datetime
 
+class AssignmentAccess(BaseModel):
+    """Owner and parsed scenario of an assignment (cached for authorization checks)"""
+    id: str
+    student_nim: str
+    dataset_id: str
+    scenario: Scenario
+
 class RegenerateAssignment(BaseModel):
     """Model for regenerating an assignment"""
     student_nim: str
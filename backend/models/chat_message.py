@@ -32,3 +32,8 @@ class ChatResponse(BaseModel):
     """Model for AI chat response"""
     response: str
     timestamp: datetime
+
+class ChatContext(BaseModel):
+    """Conversation context sent to the Actor LLM"""
+    summary: Optional[str] = None  # Rolling summary of older messages
+    recent: list[dict] = []  # Most recent messages that fit the token budget, oldest first
@@ -18,6 +18,10 @@ class GradeCreate(BaseModel):
     score: int
     feedback: Optional[str] = None
 
+class GradeBulkCreate(BaseModel):
+    """Model for bulk grade upsert; entries are validated one by one as GradeCreate"""
+    grades: list[dict]
+
 class GradeResponse(BaseModel):
     """Model for grade response"""
     assignment_id: str
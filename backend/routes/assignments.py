@@ -3,7 +3,9 @@ from backend.routes.auth import require_auth
 from backend.services.assignment_service import (
     get_or_create_assignment, delete_assignment
 )
-from backend.models.assignment import RegenerateAssignment
+from backend.services.scenario_pool import get_pool_status, replenish_pool
+from backend.models.assignment import AssignmentWithDataset, RegenerateAssignment
+from backend.utils.http_cache import not_modified, weak_etag
 from pydantic import ValidationError
 
 bp = Blueprint('assignments', __name__)
@@ -18,25 +20,17 @@ def get_my_assignment():
         # Get or create assignment (JIT generation happens here)
         assignment = get_or_create_assignment(student_nim)
         
-        return jsonify({
+        etag = assignment_etag(assignment)
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+        
+        response = jsonify({
             'success': True,
-            'assignment': {
-                'id': assignment.id,
-                'student_nim': assignment.student_nim,
-                'dataset': assignment.dataset,
-                'scenario': {
-                    'scenario_title': assignment.scenario.scenario_title,
-                    'difficulty_level': assignment.scenario.difficulty_level,
-                    'stakeholder_name': assignment.scenario.stakeholder_name,
-                    'stakeholder_role': assignment.scenario.stakeholder_role,
-                    'email_body': assignment.scenario.email_body,
-                    'key_objectives': assignment.scenario.key_objectives,
-                    # NOTE: persona_system_instruction is NOT sent to frontend
-                    # It's only used internally by the Actor LLM for chat
-                },
-                'created_at': assignment.created_at
-            }
-        }), 200
+            'assignment': assignment_payload(assignment)
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -66,3 +60,58 @@ def regenerate_assignment():
         return jsonify({'error': 'Invalid input', 'details': e.errors()}), 400
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/pool', methods=['GET'])
+@require_auth('lecturer')
+def get_scenario_pool():
+    """Get scenario warm pool depth per dataset and counters (lecturer only)"""
+    try:
+        return jsonify({
+            'success': True,
+            'pool': get_pool_status()
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in get_scenario_pool: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/pool/replenish', methods=['POST'])
+@require_auth('lecturer')
+def replenish_scenario_pool():
+    """Top up the scenario warm pool now, e.g. right before a lab session (lecturer only)"""
+    try:
+        added = replenish_pool()
+        
+        return jsonify({
+            'success': True,
+            'added': added,
+            'pool': get_pool_status()
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in replenish_scenario_pool: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def assignment_etag(assignment: AssignmentWithDataset) -> str:
+    """ETag of an assignment payload (also used by the ASGI app)"""
+    # Assignments aren't edited: regenerating deletes the row and creates a new one
+    return weak_etag(assignment.id, assignment.created_at)
+
+def assignment_payload(assignment: AssignmentWithDataset) -> dict:
+    """Assignment as returned to the student (also used by the ASGI app)"""
+    return {
+        'id': assignment.id,
+        'student_nim': assignment.student_nim,
+        'dataset': assignment.dataset,
+        'scenario': {
+            'scenario_title': assignment.scenario.scenario_title,
+            'difficulty_level': assignment.scenario.difficulty_level,
+            'stakeholder_name': assignment.scenario.stakeholder_name,
+            'stakeholder_role': assignment.scenario.stakeholder_role,
+            'email_body': assignment.scenario.email_body,
+            'key_objectives': assignment.scenario.key_objectives,
+            # NOTE: persona_system_instruction is NOT sent to frontend
+            # It's only used internally by the Actor LLM for chat
+        },
+        'created_at': assignment.created_at
+    }
@@ -2,11 +2,13 @@ from flask import Blueprint, request, jsonify
 from functools import wraps
 from backend.services.auth_service import (
     authenticate_lecturer, authenticate_student,
-    create_lecturer, generate_jwt_token, decode_jwt_token
+    create_lecturer, generate_jwt_token, verify_jwt_token,
+    revoke_token, revoke_user_tokens
 )
 from backend.models.user import UserLogin, UserCreate
 from backend.models.student import StudentLogin, StudentBulkCreate
-from backend.utils.db import get_supabase_admin
+from backend.services.roster_service import import_roster, upsert_students
+from backend.utils.bounded_executor import ExecutorBusyError
 from backend.utils.validators import EmailValidator, PasswordValidator, NIMValidator
 from pydantic import ValidationError
 
@@ -31,7 +33,7 @@ def require_auth(user_type=None):
             token = auth_header.split(' ')[1]
             
             try:
-                payload = decode_jwt_token(token)
+                payload = verify_jwt_token(token)
                 
                 # Check user type if specified
                 if user_type and payload.get('user_type') != user_type:
@@ -108,6 +110,8 @@ def lecturer_login():
         return jsonify({'error': 'Invalid input', 'details': e.errors()}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 401
+    except ExecutorBusyError:
+        return jsonify({'error': 'Too many login attempts, please try again shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -137,6 +141,8 @@ def lecturer_register():
         return jsonify({'error': 'Invalid input', 'details': e.errors()}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except ExecutorBusyError:
+        return jsonify({'error': 'Server is busy, please try again shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         print(f"Error in lecturer_register: {e}")
         import traceback
@@ -153,24 +159,89 @@ def upload_roster():
         # Validate input
         roster_data = StudentBulkCreate(**data)
         
-        supabase = get_supabase_admin()
-        
-        # Prepare students for bulk insert
-        students_to_insert = [
-            {'nim': student.nim, 'name': student.name}
-            for student in roster_data.students
-        ]
-        
-        # Bulk insert (upsert to handle duplicates)
-        result = supabase.table('students').upsert(students_to_insert).execute()
+        # Upsert in chunks to handle duplicates without one oversized request
+        summary = upsert_students(
+            (row, {'nim': student.nim, 'name': student.name}, None)
+            for row, student in enumerate(roster_data.students, start=1)
+        )
         
         return jsonify({
             'success': True,
-            'count': len(result.data),
-            'message': f'Successfully uploaded {len(result.data)} students'
+            'count': summary['imported'],
+            'failed': summary['failed'],
+            'errors': summary['errors'],
+            'message': f'Successfully uploaded {summary["imported"]} students'
         }), 201
         
     except ValidationError as e:
         return jsonify({'error': 'Invalid input', 'details': e.errors()}), 400
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/students/import-roster', methods=['POST'])
+@require_auth('lecturer')
+def import_roster_file():
+    """
+    Import a student roster from a CSV or XLSX file
+    
+    Accepts a multipart upload (field `file`) or a raw text/csv body.
+    Rows are validated and upserted as they are read; invalid rows are
+    reported and skipped.
+    """
+    try:
+        if 'file' in request.files:
+            upload = request.files['file']
+            summary = import_roster(upload.stream, upload.filename or '')
+        elif request.mimetype == 'text/csv':
+            summary = import_roster(request.stream)
+        else:
+            return jsonify({'error': 'Upload a CSV or XLSX file in the "file" field'}), 400
+        
+        return jsonify({
+            'success': True,
+            **summary,
+            'message': f'Imported {summary["imported"]} students, {summary["failed"]} rows failed'
+        }), 201 if summary['imported'] else 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in import_roster_file: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/logout', methods=['POST'])
+@require_auth()
+def logout():
+    """Revoke the token used for this request"""
+    try:
+        revoke_token(request.user)
+        
+        return jsonify({'success': True}), 200
+        
+    except Exception as e:
+        print(f"Error in logout: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/revoke', methods=['POST'])
+@require_auth('lecturer')
+def revoke():
+    """
+    Force-logout a user: revoke every token issued to them so far
+    
+    Body: {"user_id": "<student NIM or lecturer email>"}. The user can log
+    in again afterwards.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('user_id')
+        
+        if not isinstance(user_id, str) or not user_id.strip():
+            return jsonify({'error': 'user_id is required'}), 400
+        
+        revoke_user_tokens(user_id.strip())
+        
+        return jsonify({'success': True, 'user_id': user_id.strip()}), 200
+        
+    except Exception as e:
+        print(f"Error in revoke: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
@@ -1,41 +1,129 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from datetime import datetime
+import json
 from backend.routes.auth import require_auth
 from backend.models.chat_message import ChatMessageCreate
-from backend.models.assignment import Scenario
-from backend.utils.db import get_supabase_admin
-from backend.services.llm_service import chat_with_stakeholder
-from backend.services.assignment_service import get_assignment_by_id
+from backend.utils.db import get_supabase_admin, parse_timestamp
+from backend.services.llm_service import chat_with_stakeholder, stream_chat_with_stakeholder
+from backend.services.assignment_service import get_assignment_access
+from backend.services.chat_service import append_chat_turn, get_chat_context
+from backend.utils.http_cache import not_modified, weak_etag
+from backend.utils.pagination import decode_cursor, encode_cursor
+from backend.config import get_config
 from pydantic import ValidationError
 
 bp = Blueprint('chat', __name__)
+config = get_config()
 
 @bp.route('/<assignment_id>/messages', methods=['GET'])
 @require_auth('student')
 def get_chat_messages(assignment_id):
-    """Get chat messages for an assignment"""
+    """
+    Get a page of chat messages for an assignment, oldest first
+
+    Messages are paged with a keyset cursor on their timestamp (served by the
+    (assignment_id, timestamp) index), so a sync reads only the messages it
+    returns, however long the conversation is.
+
+    Query params:
+        after: `next_cursor` of an earlier response; returns the messages sent since
+        before: `prev_cursor` of an earlier response; returns the older messages just before
+        limit: Page size (default CHAT_PAGE_SIZE, capped at CHAT_PAGE_SIZE_MAX)
+
+    Without a cursor, the newest page is returned.
+    """
+    try:
+        limit, after_timestamp, before_timestamp = _message_page_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         student_nim = request.user['user_id']
         supabase = get_supabase_admin()
         
         # Verify assignment belongs to student
-        assignment = get_assignment_by_id(assignment_id)
-        if assignment['student_nim'] != student_nim:
+        assignment = get_assignment_access(assignment_id)
+        if assignment.student_nim != student_nim:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Get chat messages
-        result = supabase.table('chat_messages').select('*').eq('assignment_id', assignment_id).order('timestamp').execute()
+        # Timestamps are unique within a conversation (append_chat_turn stamps the
+        # reply 1 microsecond after the student's message), so they key the pages.
+        # One extra row tells whether there is more without counting.
+        query = supabase.table('chat_messages').select('*').eq('assignment_id', assignment_id)
+        if after_timestamp is not None:
+            result = query.gt('timestamp', after_timestamp).order('timestamp').limit(limit + 1).execute()
+            messages = result.data[:limit]
+        else:
+            if before_timestamp is not None:
+                query = query.lt('timestamp', before_timestamp)
+            result = query.order('timestamp', desc=True).limit(limit + 1).execute()
+            messages = result.data[:limit][::-1]
         
-        return jsonify({
+        # More messages past this page: newer ones for `after`, older ones otherwise
+        has_more = len(result.data) > limit
+        
+        # Messages are append-only: the page's bounds and size version it
+        first_message = messages[0] if messages else {}
+        last_message = messages[-1] if messages else {}
+        etag = weak_etag(len(messages), first_message.get('id'), last_message.get('id'), last_message.get('timestamp'), has_more)
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+        
+        # An empty sync keeps the client's position
+        newest_timestamp = last_message.get('timestamp', after_timestamp)
+        older_remain = has_more and after_timestamp is None
+        
+        response = jsonify({
             'success': True,
-            'messages': result.data
-        }), 200
+            'messages': messages,
+            'next_cursor': encode_cursor({'timestamp': newest_timestamp}) if newest_timestamp else None,
+            'prev_cursor': encode_cursor({'timestamp': first_message['timestamp']}) if older_remain else None,
+            'has_more': has_more,
+            'limit': limit
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
+def _message_page_params():
+    """
+    Read the paging query params of the chat history
+
+    Returns:
+        (limit, after timestamp or None, before timestamp or None)
+
+    Raises:
+        ValueError: If the limit or a cursor is invalid, or both cursors are given
+    """
+    limit = request.args.get('limit', config.CHAT_PAGE_SIZE, type=int)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, config.CHAT_PAGE_SIZE_MAX)
+
+    after = request.args.get('after')
+    before = request.args.get('before')
+    if after and before:
+        raise ValueError("Pass either after or before, not both")
+
+    after_timestamp = _cursor_timestamp(after) if after else None
+    before_timestamp = _cursor_timestamp(before) if before else None
+    return limit, after_timestamp, before_timestamp
+
+def _cursor_timestamp(cursor: str) -> str:
+    """Read the message timestamp from a chat cursor, checking it parses as one"""
+    timestamp = decode_cursor(cursor, ('timestamp',))['timestamp']
+    try:
+        parse_timestamp(timestamp)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    # The stored string is compared as is, keeping its full precision
+    return timestamp
+
 @bp.route('/<assignment_id>/message', methods=['POST'])
 @require_auth('student')
 def send_chat_message(assignment_id):
@@ -47,52 +135,35 @@ def send_chat_message(assignment_id):
         # Validate input
         message_data = ChatMessageCreate(**data)
         
-        supabase = get_supabase_admin()
-        
         # Verify assignment belongs to student
-        assignment = get_assignment_by_id(assignment_id)
-        if assignment['student_nim'] != student_nim:
+        assignment = get_assignment_access(assignment_id)
+        if assignment.student_nim != student_nim:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Save student message
-        student_msg = supabase.table('chat_messages').insert({
-            'assignment_id': assignment_id,
-            'sender': 'student',
-            'content': message_data.content
-        }).execute()
-        
-        # Get recent chat history
-        history_result = supabase.table('chat_messages').select('sender, content').eq('assignment_id', assignment_id).order('timestamp').execute()
+        # Scenario is parsed once and cached with the assignment
+        scenario = assignment.scenario
         
-        chat_history = [
-            {'sender': msg['sender'], 'content': msg['content']}
-            for msg in history_result.data
-        ]
-        
-        # Parse scenario from assignment
-        scenario_data = assignment['scenario_json']
-        scenario = Scenario(**scenario_data)
+        # Summary + recent turns within the token budget (the new message
+        # is sent to the LLM separately)
+        chat_context = get_chat_context(assignment_id, scenario)
         
         # Generate AI response using Actor LLM
         # The Actor uses the persona_system_instruction generated by Architect
         # No need to pass dataset info - it's already in the system instruction
         ai_response = chat_with_stakeholder(
             scenario=scenario,
-            chat_history=chat_history,
+            context=chat_context,
             new_message=message_data.content
         )
         
-        # Save AI response
-        ai_msg = supabase.table('chat_messages').insert({
-            'assignment_id': assignment_id,
-            'sender': 'ai',
-            'content': ai_response
-        }).execute()
+        # Save the message and reply together once the reply exists, so a
+        # failed LLM call doesn't leave an unanswered message behind
+        _, ai_msg = append_chat_turn(assignment_id, message_data.content, ai_response)
         
         return jsonify({
             'success': True,
             'response': ai_response,
-            'timestamp': ai_msg.data[0]['timestamp']
+            'timestamp': ai_msg['timestamp']
         }), 200
         
     except ValidationError as e:
@@ -102,3 +173,85 @@ def send_chat_message(assignment_id):
     except Exception as e:
         print(f"Error in send_chat_message: {e}")
         return jsonify({'error': 'Internal server error'}), 500
+
+
+@bp.route('/<assignment_id>/message/stream', methods=['POST'])
+@require_auth('student')
+def stream_chat_message(assignment_id):
+    """
+    Send a chat message and stream the AI response as Server-Sent Events
+    
+    Events:
+        token: {"text": "..."} for every chunk produced by the Actor LLM
+        done:  {"response": "...", "timestamp": "..."} once the message and reply are saved
+        error: {"error": "..."} if generation fails mid-stream
+    """
+    try:
+        student_nim = request.user['user_id']
+        data = request.get_json()
+        
+        # Validate input
+        message_data = ChatMessageCreate(**data)
+        
+        # Verify assignment belongs to student
+        assignment = get_assignment_access(assignment_id)
+        if assignment.student_nim != student_nim:
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        # Scenario is parsed once and cached with the assignment
+        scenario = assignment.scenario
+        
+        # Summary + recent turns within the token budget (the new message
+        # is sent to the LLM separately)
+        chat_context = get_chat_context(assignment_id, scenario)
+        
+    except ValidationError as e:
+        return jsonify({'error': 'Invalid input', 'details': e.errors()}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        print(f"Error in stream_chat_message: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    
+    def generate():
+        chunks = []
+        try:
+            for chunk in stream_chat_with_stakeholder(
+                scenario=scenario,
+                context=chat_context,
+                new_message=message_data.content
+            ):
+                chunks.append(chunk)
+                yield sse_event('token', {'text': chunk})
+            
+            # Save the message with the assembled reply once the stream is complete
+            ai_response = ''.join(chunks).strip()
+            _, ai_msg = append_chat_turn(assignment_id, message_data.content, ai_response)
+            
+        except GeneratorExit:
+            # Client disconnected mid-stream: stop pulling tokens from Gemini
+            # and don't persist the turn
+            print(f"Client disconnected from chat stream for assignment {assignment_id}")
+            return
+        except Exception as e:
+            print(f"Error in stream_chat_message: {e}")
+            yield sse_event('error', {'error': 'Internal server error'})
+            return
+        
+        yield sse_event('done', {
+            'response': ai_response,
+            'timestamp': ai_msg['timestamp']
+        })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so tokens flush immediately
+        }
+    )
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event (also used by the ASGI app)"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
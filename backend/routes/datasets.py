@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
 from backend.routes.auth import require_auth
 from backend.models.dataset import DatasetCreate
-from backend.utils.db import get_supabase_admin
+from backend.services.dataset_service import (
+    get_dataset_catalog,
+    get_dataset_catalog_etag,
+    create_dataset as create_dataset_record,
+    delete_dataset as delete_dataset_record
+)
+from backend.utils.http_cache import not_modified
 from backend.utils.validators import URLValidator
 from pydantic import ValidationError
 
@@ -10,16 +16,19 @@ bp = Blueprint('datasets', __name__)
 @bp.route('', methods=['GET'])
 @require_auth('lecturer')
 def get_datasets():
-    """Get all datasets (lecturer only)"""
+    """Get all datasets (lecturer only, served from the catalog cache without sample_data)"""
     try:
-        supabase = get_supabase_admin()
+        etag = get_dataset_catalog_etag()
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
         
-        result = supabase.table('datasets').select('*').order('created_at', desc=True).execute()
-        
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'datasets': result.data
-        }), 200
+            'datasets': get_dataset_catalog()
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
@@ -35,24 +44,19 @@ def create_dataset():
         dataset_data = DatasetCreate(**data)
         URLValidator(url=dataset_data.url)
         
-        supabase = get_supabase_admin()
-        
         # Insert dataset with enhanced metadata
-        result = supabase.table('datasets').insert({
+        dataset = create_dataset_record({
             'name': dataset_data.name,
             'url': dataset_data.url,
             'metadata_summary': dataset_data.metadata_summary,
             'columns_list': dataset_data.columns_list,
             'sample_data': dataset_data.sample_data,
             'data_quality_notes': dataset_data.data_quality_notes
-        }).execute()
-        
-        if not result.data:
-            raise ValueError("Failed to create dataset")
+        })
         
         return jsonify({
             'success': True,
-            'dataset': result.data[0]
+            'dataset': dataset
         }), 201
         
     except ValidationError as e:
@@ -67,10 +71,8 @@ def create_dataset():
 def delete_dataset(dataset_id):
     """Delete a dataset (lecturer only)"""
     try:
-        supabase = get_supabase_admin()
-        
         # Delete dataset
-        result = supabase.table('datasets').delete().eq('id', dataset_id).execute()
+        delete_dataset_record(dataset_id)
         
         return jsonify({
             'success': True,
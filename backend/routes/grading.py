@@ -1,80 +1,193 @@
-from flask import Blueprint, request, jsonify
+import itertools
+import uuid
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from backend.routes.auth import require_auth
-from backend.models.grade import GradeCreate
+from backend.config import get_config
+from backend.models.grade import GradeCreate, GradeBulkCreate
+from backend.services import search_service
+from backend.services.dataset_service import get_dataset_catalog_etag
+from backend.services.gradebook_service import iter_gradebook_rows, stream_csv, stream_xlsx
 from backend.utils.db import get_supabase_admin
+from backend.utils.http_cache import not_modified, weak_etag
+from backend.utils.pagination import decode_cursor, encode_cursor
 from backend.utils.validators import validate_score
 from pydantic import ValidationError
 
 bp = Blueprint('grading', __name__)
+config = get_config()
+
+# Max values per PostgREST IN filter, keeps request URLs well under server limits
+IN_FILTER_CHUNK_SIZE = 200
 
 @bp.route('/students', methods=['GET'])
 @require_auth('lecturer')
 def get_students_for_grading():
-    """Get all students with their assignments, submissions, and grades (lecturer only)"""
+    """
+    Get a page of students with their assignments, submissions, and grades (lecturer only)
+
+    Students are ordered by NIM and paged with a keyset cursor, so every page
+    costs the same no matter how deep it is.
+
+    Query params:
+        cursor: `next_cursor` of the previous page (omit for the first page)
+        limit: Page size (default GRADING_PAGE_SIZE, capped at GRADING_PAGE_SIZE_MAX)
+        count: 'estimated' to include an approximate `total`
+    """
     try:
+        limit = request.args.get('limit', config.GRADING_PAGE_SIZE, type=int)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, config.GRADING_PAGE_SIZE_MAX)
+
+        count = request.args.get('count')
+        if count not in (None, 'estimated'):
+            raise ValueError("count must be 'estimated'")
+
+        cursor = request.args.get('cursor')
+        after_nim = decode_cursor(cursor, ('nim',))['nim'] if cursor else None
+
         supabase = get_supabase_admin()
-        
-        # Pagination parameters
-        page = request.args.get('page', type=int)
-        limit = request.args.get('limit', type=int)
 
-        query = supabase.table('students').select('*', count='exact')
-        
-        if page and limit:
-            start = (page - 1) * limit
-            end = start + limit - 1
-            query = query.range(start, end)
-        
-        # Get students (paginated or all)
+        # One extra row tells whether there is a next page without counting
+        query = supabase.table('students').select('*', count=count).order('nim').limit(limit + 1)
+        if after_nim is not None:
+            query = query.gt('nim', after_nim)
         students_result = query.execute()
-        
-        students_data = [_enrich_student_data(supabase, student) for student in students_result.data]
-        
-        return jsonify({
+
+        students = students_result.data[:limit]
+        next_cursor = None
+        if len(students_result.data) > limit:
+            next_cursor = encode_cursor({'nim': students[-1]['nim']})
+        total = students_result.count if count else None
+
+        # Checked before the page is enriched, so an unchanged page costs two narrow queries
+        etag = weak_etag(students, next_cursor, limit, total, _students_page_versions(supabase, students), get_dataset_catalog_etag())
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+
+        students_data = _enrich_students_data(supabase, students)
+
+        response = jsonify({
             'success': True,
             'students': students_data,
-            'total': students_result.count,
-            'page': page,
-            'limit': limit
-        }), 200
-        
+            'next_cursor': next_cursor,
+            'limit': limit,
+            'total': total
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_students_for_grading: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-def _enrich_student_data(supabase, student):
-    """Helper to fetch assignment and grade data for a student"""
-    # Get assignment for this student
-    assignment_result = supabase.table('assignments').select('*, datasets(*)').eq('student_nim', student['nim']).execute()
-    
-    if not assignment_result.data:
-        # Student has no assignment yet
-        return {
+def _students_page_versions(supabase, students):
+    """
+    Get the row versions behind an enriched page of students, for its ETag
+
+    One narrow query per chunk of NIMs: assignment ids and creation times,
+    with the ids of their submissions (insert-only) and the `updated_at` of
+    their grades embedded.
+
+    Args:
+        supabase: Supabase client
+        students: List of student dicts
+
+    Returns:
+        JSON-serializable list of (nim, assignment id, created_at, submission ids, grade updated_at)
+    """
+    nims = [student['nim'] for student in students]
+
+    versions = []
+    for nim_chunk in _chunked(nims, IN_FILTER_CHUNK_SIZE):
+        result = supabase.table('assignments').select(
+            'id, student_nim, created_at, submissions(id), grades(updated_at)'
+        ).in_('student_nim', nim_chunk).execute()
+        for assignment in result.data:
+            # PostgREST embeds a one-to-one relation (grades) as an object or a one-item list, depending on version
+            grades = assignment['grades']
+            grade = (grades[0] if grades else None) if isinstance(grades, list) else grades
+            versions.append((
+                assignment['student_nim'],
+                assignment['id'],
+                assignment['created_at'],
+                sorted(submission['id'] for submission in assignment['submissions'] or []),
+                grade['updated_at'] if grade else None
+            ))
+
+    return sorted(versions)
+
+def _enrich_students_data(supabase, students):
+    """
+    Fetch assignments, submissions and grades for a page of students in bulk
+
+    Issues one query per table (per chunk of IN filter values) instead of
+    three queries per student, then joins the rows in memory.
+
+    Args:
+        supabase: Supabase client
+        students: List of student dicts
+
+    Returns:
+        List of enriched student dicts, in the same order as `students`
+    """
+    nims = [student['nim'] for student in students]
+
+    assignments_by_nim = {}
+    for nim_chunk in _chunked(nims, IN_FILTER_CHUNK_SIZE):
+        assignment_result = supabase.table('assignments').select('*, datasets(*)').in_('student_nim', nim_chunk).execute()
+        for assignment in assignment_result.data:
+            assignments_by_nim[assignment['student_nim']] = assignment
+
+    assignment_ids = [assignment['id'] for assignment in assignments_by_nim.values()]
+
+    submissions_by_assignment = {}
+    grades_by_assignment = {}
+    for id_chunk in _chunked(assignment_ids, IN_FILTER_CHUNK_SIZE):
+        submissions_result = supabase.table('submissions').select('*').in_('assignment_id', id_chunk).order('created_at', desc=True).execute()
+        for submission in submissions_result.data:
+            submissions_by_assignment.setdefault(submission['assignment_id'], []).append(submission)
+
+        grade_result = supabase.table('grades').select('*').in_('assignment_id', id_chunk).execute()
+        for grade in grade_result.data:
+            grades_by_assignment[grade['assignment_id']] = grade
+
+    students_data = []
+    for student in students:
+        assignment = assignments_by_nim.get(student['nim'])
+
+        if not assignment:
+            # Student has no assignment yet
+            students_data.append({
+                'student': student,
+                'assignment': None,
+                'submissions': [],
+                'grade': None
+            })
+            continue
+
+        students_data.append({
             'student': student,
-            'assignment': None,
-            'submissions': [],
-            'grade': None
-        }
-    
-    assignment = assignment_result.data[0]
-    
-    # Get submissions for this assignment
-    submissions_result = supabase.table('submissions').select('*').eq('assignment_id', assignment['id']).order('created_at', desc=True).execute()
-    
-    # Get grade for this assignment
-    grade_result = supabase.table('grades').select('*').eq('assignment_id', assignment['id']).execute()
-    
-    return {
-        'student': student,
-        'assignment': {
-            'id': assignment['id'],
-            'dataset': assignment['datasets'],
-            'scenario': assignment['scenario_json'],
-            'created_at': assignment['created_at']
-        },
-        'submissions': submissions_result.data,
-        'grade': grade_result.data[0] if grade_result.data else None
-    }
+            'assignment': {
+                'id': assignment['id'],
+                'dataset': assignment['datasets'],
+                'scenario': assignment['scenario_json'],
+                'created_at': assignment['created_at']
+            },
+            'submissions': submissions_by_assignment.get(assignment['id'], []),
+            'grade': grades_by_assignment.get(assignment['id'])
+        })
+
+    return students_data
+
+def _chunked(values, size):
+    """Split a list into consecutive chunks of at most `size` items"""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
 
 @bp.route('/grade', methods=['POST'])
 @require_auth('lecturer')
@@ -93,7 +206,8 @@ def create_or_update_grade():
         result = supabase.table('grades').upsert({
             'assignment_id': grade_data.assignment_id,
             'score': grade_data.score,
-            'feedback': grade_data.feedback
+            'feedback': grade_data.feedback,
+            'updated_at': datetime.utcnow().isoformat()
         }).execute()
         
         if not result.data:
@@ -111,25 +225,212 @@ def create_or_update_grade():
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
-@bp.route('/search/<query>', methods=['GET'])
+@bp.route('/grades/bulk', methods=['POST'])
 @require_auth('lecturer')
-def search_students(query):
+def bulk_upsert_grades():
+    """
+    Create or update many grades in one batched upsert (lecturer only)
+
+    Each entry is validated on its own; invalid entries and unknown
+    assignments are reported in `results` (same order as the input) and the
+    rest are saved.
+    """
     try:
+        data = request.get_json()
+        
+        # Validate input
+        bulk_data = GradeBulkCreate(**data)
+        if len(bulk_data.grades) > config.GRADE_BULK_MAX_ITEMS:
+            raise ValueError(f"Too many grades (max {config.GRADE_BULK_MAX_ITEMS} per request)")
+        
         supabase = get_supabase_admin()
         
-        # Search students
-        if query.isdigit():
-            result = supabase.table('students').select('*').ilike('nim', f'%{query}%').execute()
-        else:
-            result = supabase.table('students').select('*').ilike('name', f'%{query}%').execute()
+        results, rows_by_assignment = _validate_grade_entries(bulk_data.grades)
+        
+        # Unknown assignments would fail the whole batch on the foreign key
+        existing_ids = set()
+        for id_chunk in _chunked(list(rows_by_assignment), IN_FILTER_CHUNK_SIZE):
+            assignment_result = supabase.table('assignments').select('id').in_('id', id_chunk).execute()
+            existing_ids.update(assignment['id'] for assignment in assignment_result.data)
+        
+        for assignment_id in list(rows_by_assignment):
+            if assignment_id not in existing_ids:
+                index, _ = rows_by_assignment.pop(assignment_id)
+                results[index] = {'index': index, 'assignment_id': assignment_id, 'success': False, 'error': 'Assignment not found'}
+        
+        saved = []
+        if rows_by_assignment:
+            updated_at = datetime.utcnow().isoformat()
+            upsert_result = supabase.table('grades').upsert(
+                [{**row, 'updated_at': updated_at} for _, row in rows_by_assignment.values()]
+            ).execute()
+            saved = upsert_result.data
+        
+        for grade in saved:
+            index, _ = rows_by_assignment[grade['assignment_id']]
+            results[index] = {'index': index, 'assignment_id': grade['assignment_id'], 'success': True, 'grade': grade}
+        
+        return jsonify({
+            'success': True,
+            'saved': len(saved),
+            'failed': len(results) - len(saved),
+            'results': results
+        }), 200
+        
+    except ValidationError as e:
+        return jsonify({'error': 'Invalid input', 'details': e.errors()}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in bulk_upsert_grades: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def _validate_grade_entries(entries):
+    """
+    Validate bulk grade entries
+
+    Args:
+        entries: Raw grade dicts from the request
+
+    Returns:
+        (results, rows_by_assignment): per-entry results, filled in for
+        invalid entries, and assignment_id -> (index, grade row) for valid
+        ones. A later entry for the same assignment replaces an earlier one,
+        since one upsert can't write the same row twice.
+    """
+    results = [None] * len(entries)
+    rows_by_assignment = {}
+
+    for index, entry in enumerate(entries):
+        try:
+            grade_data = GradeCreate(**entry)
+            validate_score(grade_data.score)
+            error = None if _is_uuid(grade_data.assignment_id) else 'Invalid assignment_id'
+        except ValidationError as e:
+            first_error = e.errors()[0]
+            error = f"{'.'.join(str(loc) for loc in first_error['loc'])}: {first_error['msg']}"
+        except ValueError as e:
+            error = str(e)
+
+        if error:
+            results[index] = {'index': index, 'assignment_id': entry.get('assignment_id'), 'success': False, 'error': error}
+            continue
+
+        previous = rows_by_assignment.get(grade_data.assignment_id)
+        if previous is not None:
+            results[previous[0]] = {
+                'index': previous[0],
+                'assignment_id': grade_data.assignment_id,
+                'success': False,
+                'error': f'Superseded by entry {index} for the same assignment'
+            }
+
+        rows_by_assignment[grade_data.assignment_id] = (index, {
+            'assignment_id': grade_data.assignment_id,
+            'score': grade_data.score,
+            'feedback': grade_data.feedback
+        })
+
+    return results, rows_by_assignment
+
+def _is_uuid(value: str) -> bool:
+    """Whether a string is a valid UUID"""
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+@bp.route('/export', methods=['GET'])
+@require_auth('lecturer')
+def export_gradebook():
+    """
+    Download the gradebook for all students as CSV (default) or XLSX (lecturer only)
+
+    Query params:
+        format: 'csv' or 'xlsx'
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': "format must be 'csv' or 'xlsx'"}), 400
 
-        students_data = [_enrich_student_data(supabase, student) for student in result.data]
+    try:
+        # Read the first batch here so a failing query is a proper error
+        # response rather than a truncated download
+        rows = iter_gradebook_rows()
+        first_row = next(rows, None)
+        if first_row is not None:
+            rows = itertools.chain([first_row], rows)
+    except Exception as e:
+        print(f"Error in export_gradebook: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+    if export_format == 'csv':
+        body, mimetype = stream_csv(rows), 'text/csv'
+    else:
+        body, mimetype = stream_xlsx(rows), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def generate():
+        try:
+            yield from body
+        except Exception as e:
+            # Headers are already sent; cutting the stream marks the download as failed
+            print(f"Error in export_gradebook: {e}")
+            raise
+
+    filename = f"gradebook-{datetime.utcnow():%Y%m%d}.{export_format}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so rows flush as they are read
+        }
+    )
+
+@bp.route('/search/<query>', methods=['GET'])
+@require_auth('lecturer')
+def search_students(query):
+    """
+    Search students by NIM or name, best matches first (lecturer only)
+
+    Query params:
+        limit: Maximum results (default SEARCH_RESULT_LIMIT, capped at SEARCH_RESULT_LIMIT_MAX)
+        mode: 'lite' to return only NIM, name and rank (no assignments,
+              submissions or grades), e.g. for type-ahead
+    """
+    try:
+        limit = request.args.get('limit', config.SEARCH_RESULT_LIMIT, type=int)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, config.SEARCH_RESULT_LIMIT_MAX)
+
+        mode = request.args.get('mode', 'full')
+        if mode not in ('full', 'lite'):
+            raise ValueError("mode must be 'full' or 'lite'")
+
+        students = search_service.search_students(query, limit)
+
+        if mode == 'lite':
+            return jsonify({
+                'success': True,
+                'students': [
+                    {'nim': student['nim'], 'name': student['name'], 'rank': student['rank']}
+                    for student in students
+                ]
+            }), 200
+
+        supabase = get_supabase_admin()
+        students_data = _enrich_students_data(supabase, students)
 
         return jsonify({
             'success': True,
             'students': students_data
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in search_students: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Internal server error'}), 500
@@ -0,0 +1,21 @@
+from flask import Blueprint, Response, request, jsonify
+import hmac
+from backend.config import get_config
+from backend.utils.metrics import registry
+
+bp = Blueprint('metrics', __name__)
+config = get_config()
+
+@bp.route('', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus scrape endpoint: per-route request/stage histograms,
+    DB query counts and LLM token counts for this worker process.
+    Requires `Authorization: Bearer <METRICS_TOKEN>` (only registered when
+    METRICS_TOKEN is set).
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if not config.METRICS_TOKEN or not hmac.compare_digest(auth_header, f'Bearer {config.METRICS_TOKEN}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
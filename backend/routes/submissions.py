@@ -3,7 +3,7 @@ from backend.routes.auth import require_auth
 from backend.models.submission import SubmissionCreate
 from backend.utils.db import get_supabase_admin
 from backend.utils.validators import URLValidator
-from backend.services.assignment_service import get_assignment_by_id
+from backend.services.assignment_service import get_assignment_access
 from pydantic import ValidationError
 
 bp = Blueprint('submissions', __name__)
@@ -17,8 +17,8 @@ def get_submissions(assignment_id):
         
         # If student, verify assignment belongs to them
         if request.user['user_type'] == 'student':
-            assignment = get_assignment_by_id(assignment_id)
-            if assignment['student_nim'] != request.user['user_id']:
+            assignment = get_assignment_access(assignment_id)
+            if assignment.student_nim != request.user['user_id']:
                 return jsonify({'error': 'Unauthorized'}), 403
         
         # Get submissions
@@ -49,8 +49,8 @@ def create_submission():
         supabase = get_supabase_admin()
         
         # Verify assignment belongs to student
-        assignment = get_assignment_by_id(submission_data.assignment_id)
-        if assignment['student_nim'] != student_nim:
+        assignment = get_assignment_access(submission_data.assignment_id)
+        if assignment.student_nim != student_nim:
             return jsonify({'error': 'Unauthorized'}), 403
         
         # Create submission
@@ -1,46 +1,220 @@
-import random
+import asyncio
 import json
-from backend.utils.db import get_supabase_admin
-from backend.services.llm_service import generate_scenario
-from backend.models.assignment import Scenario, AssignmentWithDataset
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from backend.config import get_config
+from backend.utils.cache import LRUCache
+from backend.utils.db import get_supabase_admin, is_foreign_key_violation, is_unique_violation
+from backend.utils.metrics import timed
+from backend.utils.single_flight import AsyncSingleFlight, SingleFlight
+from backend.services.llm_service import generate_scenario, generate_scenario_async
+from backend.services.dataset_service import get_dataset, invalidate_dataset_catalog, select_random_dataset_id
+from backend.services.scenario_pool import claim_pooled_scenario
+from backend.models.assignment import Scenario, AssignmentWithDataset, AssignmentAccess
+
+config = get_config()
+
+# In-process deduplication of concurrent assignment creation per NIM
+_creation_flight = SingleFlight()
+_async_creation_flight = AsyncSingleFlight()
+
+# assignment_id -> AssignmentAccess, so chat/submission routes can check
+# ownership and read the scenario without re-querying on every request
+_access_cache = LRUCache(
+    maxsize=config.ASSIGNMENT_ACCESS_CACHE_SIZE,
+    ttl=config.ASSIGNMENT_ACCESS_CACHE_TTL
+)
 
 def get_or_create_assignment(student_nim: str) -> AssignmentWithDataset:
     """
     Get existing assignment or create new one (Just-in-Time generation)
     
+    Concurrent requests for the same student (two tabs, frontend retries)
+    share a single generation: in-process via single-flight, across workers
+    via a claim row in `assignment_claims`.
+    
     Args:
         student_nim: Student's NIM
     
     Returns:
         Assignment with dataset and scenario details
     """
+    # Check if assignment already exists
+    assignment = _get_existing_assignment(student_nim)
+    if assignment:
+        return assignment
+    
+    # No assignment exists, create new one (once per NIM at a time)
+    return _creation_flight.do(student_nim, lambda: _create_assignment_once(student_nim))
+
+async def get_or_create_assignment_async(student_nim: str) -> AssignmentWithDataset:
+    """
+    Async `get_or_create_assignment` (ASGI app)
+    
+    Database calls run in worker threads; the Architect LLM call and the wait
+    for another worker's generation are awaited, so no thread is held while
+    a scenario is being generated.
+    """
+    assignment = await asyncio.to_thread(_get_existing_assignment, student_nim)
+    if assignment:
+        return assignment
+    
+    return await _async_creation_flight.do(student_nim, lambda: _create_assignment_once_async(student_nim))
+
+def _get_existing_assignment(student_nim: str) -> Optional[AssignmentWithDataset]:
+    """
+    Get a student's assignment if it already exists
+    
+    Args:
+        student_nim: Student's NIM
+    
+    Returns:
+        Assignment with dataset and scenario details, or None
+    """
     supabase = get_supabase_admin()
     
-    # Check if assignment already exists
     result = supabase.table('assignments').select('*, datasets(*)').eq('student_nim', student_nim).execute()
     
-    if result.data:
-        # Assignment exists, return it
-        assignment = result.data[0]
-        
-        # Parse scenario JSON
-        scenario_data = assignment['scenario_json']
+    if not result.data:
+        return None
+    
+    assignment = result.data[0]
+    
+    # Parse scenario JSON
+    scenario_data = assignment['scenario_json']
+    with timed('parse'):
         scenario = Scenario(**scenario_data)
+    
+    _cache_assignment_access(assignment, scenario)
+    
+    return AssignmentWithDataset(
+        id=assignment['id'],
+        student_nim=assignment['student_nim'],
+        dataset=assignment['datasets'],
+        scenario=scenario,
+        created_at=assignment['created_at']
+    )
+
+def _create_assignment_once(student_nim: str) -> AssignmentWithDataset:
+    """
+    Create an assignment while holding the cross-worker creation claim,
+    or wait for the worker that holds it
+    
+    Args:
+        student_nim: Student's NIM
+    
+    Returns:
+        Assignment with dataset and scenario details
+    
+    Raises:
+        ValueError: If another worker is still generating after ASSIGNMENT_CLAIM_TTL
+    """
+    deadline = time.monotonic() + config.ASSIGNMENT_CLAIM_TTL
+    
+    while True:
+        claimed_at = _acquire_creation_claim(student_nim)
+        if claimed_at is not None:
+            try:
+                # Another worker may have finished between our check and the claim
+                assignment = _get_existing_assignment(student_nim)
+                if assignment:
+                    return assignment
+                return _create_new_assignment(student_nim)
+            finally:
+                _release_creation_claim(student_nim, claimed_at)
         
-        return AssignmentWithDataset(
-            id=assignment['id'],
-            student_nim=assignment['student_nim'],
-            dataset=assignment['datasets'],
-            scenario=scenario,
-            created_at=assignment['created_at']
-        )
+        # Another worker is generating this assignment, wait for its result
+        if time.monotonic() >= deadline:
+            raise ValueError("Your assignment is still being generated. Please try again in a moment.")
+        
+        time.sleep(config.ASSIGNMENT_CLAIM_POLL_INTERVAL)
+        
+        assignment = _get_existing_assignment(student_nim)
+        if assignment:
+            return assignment
+
+async def _create_assignment_once_async(student_nim: str) -> AssignmentWithDataset:
+    """Async `_create_assignment_once`: waits with asyncio.sleep instead of blocking a thread"""
+    deadline = time.monotonic() + config.ASSIGNMENT_CLAIM_TTL
     
-    # No assignment exists, create new one
-    return _create_new_assignment(student_nim)
+    while True:
+        claimed_at = await asyncio.to_thread(_acquire_creation_claim, student_nim)
+        if claimed_at is not None:
+            try:
+                assignment = await asyncio.to_thread(_get_existing_assignment, student_nim)
+                if assignment:
+                    return assignment
+                return await _create_new_assignment_async(student_nim)
+            finally:
+                await asyncio.to_thread(_release_creation_claim, student_nim, claimed_at)
+        
+        if time.monotonic() >= deadline:
+            raise ValueError("Your assignment is still being generated. Please try again in a moment.")
+        
+        await asyncio.sleep(config.ASSIGNMENT_CLAIM_POLL_INTERVAL)
+        
+        assignment = await asyncio.to_thread(_get_existing_assignment, student_nim)
+        if assignment:
+            return assignment
+
+def _acquire_creation_claim(student_nim: str) -> Optional[str]:
+    """
+    Try to take the cross-worker claim for generating a student's assignment
+    
+    Claims older than ASSIGNMENT_CLAIM_TTL are considered abandoned (crashed
+    worker) and are taken over.
+    
+    Args:
+        student_nim: Student's NIM
+    
+    Returns:
+        `claimed_at` of the claim if this worker now owns it, None otherwise
+    
+    Raises:
+        ValueError: If the student doesn't exist
+    """
+    supabase = get_supabase_admin()
+    
+    # Drop an abandoned claim so it can be taken over
+    stale_before = datetime.utcnow() - timedelta(seconds=config.ASSIGNMENT_CLAIM_TTL)
+    supabase.table('assignment_claims').delete().eq('student_nim', student_nim).lt('claimed_at', stale_before.isoformat()).execute()
+    
+    claimed_at = datetime.utcnow().isoformat()
+    try:
+        supabase.table('assignment_claims').insert({
+            'student_nim': student_nim,
+            'claimed_at': claimed_at
+        }).execute()
+    except Exception as e:
+        if is_unique_violation(e):
+            return None
+        # Claims reference students(nim)
+        if is_foreign_key_violation(e):
+            raise ValueError("Student not found")
+        raise
+    
+    return claimed_at
+
+def _release_creation_claim(student_nim: str, claimed_at: str):
+    """
+    Release the cross-worker creation claim for a student
+    
+    Matching on `claimed_at` releases only this worker's claim: if it expired
+    and was taken over, the new owner's claim is left alone.
+    """
+    supabase = get_supabase_admin()
+    
+    try:
+        supabase.table('assignment_claims').delete().eq('student_nim', student_nim).eq('claimed_at', claimed_at).execute()
+    except Exception as e:
+        # Worst case the claim expires after ASSIGNMENT_CLAIM_TTL
+        print(f"Error releasing assignment claim for {student_nim}: {e}")
 
 def _create_new_assignment(student_nim: str) -> AssignmentWithDataset:
     """
-    Create a new assignment with JIT scenario generation (Meta-Prompt Architecture)
+    Create a new assignment, claiming a pooled scenario or falling back to
+    JIT scenario generation (Meta-Prompt Architecture)
     
     Args:
         student_nim: Student's NIM
@@ -48,6 +222,39 @@ def _create_new_assignment(student_nim: str) -> AssignmentWithDataset:
     Returns:
         Newly created assignment
     """
+    student, dataset, scenario = _prepare_new_assignment(student_nim)
+    
+    if scenario is None:
+        # Generate scenario using Architect LLM (Meta-Prompt Architecture)
+        # Pass the FULL dataset object with all metadata
+        scenario = generate_scenario(
+            student_nim=student['nim'],
+            student_name=student['name'],
+            dataset=dataset  # Full dataset dict with columns_list, sample_data, etc.
+        )
+    
+    return _store_new_assignment(student_nim, dataset, scenario)
+
+async def _create_new_assignment_async(student_nim: str) -> AssignmentWithDataset:
+    """Async `_create_new_assignment`: DB work in worker threads, the Architect call awaited"""
+    student, dataset, scenario = await asyncio.to_thread(_prepare_new_assignment, student_nim)
+    
+    if scenario is None:
+        scenario = await generate_scenario_async(
+            student_nim=student['nim'],
+            student_name=student['name'],
+            dataset=dataset
+        )
+    
+    return await asyncio.to_thread(_store_new_assignment, student_nim, dataset, scenario)
+
+def _prepare_new_assignment(student_nim: str) -> tuple[dict, dict, Optional[Scenario]]:
+    """
+    Load the student, pick a dataset and try to claim a pooled scenario
+    
+    Returns:
+        (student, dataset, pooled scenario or None)
+    """
     supabase = get_supabase_admin()
     
     # Get student details
@@ -59,13 +266,14 @@ def _create_new_assignment(student_nim: str) -> AssignmentWithDataset:
     # Get random dataset
     dataset = _select_random_dataset()
     
-    # Generate scenario using Architect LLM (Meta-Prompt Architecture)
-    # Pass the FULL dataset object with all metadata
-    scenario = generate_scenario(
-        student_nim=student['nim'],
-        student_name=student['name'],
-        dataset=dataset  # Full dataset dict with columns_list, sample_data, etc.
-    )
+    # Claim a pre-generated scenario from the warm pool when one is available
+    scenario = claim_pooled_scenario(dataset['id'], student)
+    
+    return student, dataset, scenario
+
+def _store_new_assignment(student_nim: str, dataset: dict, scenario: Scenario) -> AssignmentWithDataset:
+    """Insert the assignment row for a scenario"""
+    supabase = get_supabase_admin()
     
     # Convert scenario to dict for JSON storage
     scenario_dict = {
@@ -79,17 +287,27 @@ def _create_new_assignment(student_nim: str) -> AssignmentWithDataset:
     }
     
     # Save assignment to database
-    assignment_result = supabase.table('assignments').insert({
-        'student_nim': student_nim,
-        'dataset_id': dataset['id'],
-        'scenario_json': scenario_dict
-    }).execute()
+    try:
+        assignment_result = supabase.table('assignments').insert({
+            'student_nim': student_nim,
+            'dataset_id': dataset['id'],
+            'scenario_json': scenario_dict
+        }).execute()
+    except Exception as e:
+        # Lost a race on UNIQUE(student_nim) after a claim takeover, keep the winner's assignment
+        if is_unique_violation(e):
+            existing = _get_existing_assignment(student_nim)
+            if existing:
+                return existing
+        raise
     
     if not assignment_result.data:
         raise ValueError("Failed to create assignment")
     
     assignment = assignment_result.data[0]
     
+    _cache_assignment_access(assignment, scenario)
+    
     return AssignmentWithDataset(
         id=assignment['id'],
         student_nim=assignment['student_nim'],
@@ -102,23 +320,22 @@ def _select_random_dataset() -> dict:
     """
     Select a random dataset from available datasets
     
+    Picks from the cached catalog IDs and only loads the chosen row in full.
+    
     Returns:
         Dataset dict
     
     Raises:
         ValueError: If no datasets available
     """
-    supabase = get_supabase_admin()
-    
-    # Get all datasets
-    result = supabase.table('datasets').select('*').execute()
-    
-    if not result.data:
-        raise ValueError("No datasets available. Please ask your lecturer to add datasets.")
+    dataset_id = select_random_dataset_id()
     
-    # Select random dataset
-    dataset = random.choice(result.data)
-    return dataset
+    try:
+        return get_dataset(dataset_id)
+    except ValueError:
+        # Catalog was stale (dataset deleted by another worker), reload and retry once
+        invalidate_dataset_catalog()
+        return get_dataset(select_random_dataset_id())
 
 def delete_assignment(student_nim: str) -> bool:
     """
@@ -135,8 +352,42 @@ def delete_assignment(student_nim: str) -> bool:
     # Delete assignment (cascade will delete related chat messages, submissions, grades)
     result = supabase.table('assignments').delete().eq('student_nim', student_nim).execute()
     
+    for assignment in result.data:
+        _access_cache.pop(assignment['id'])
+    
     return True
 
+def get_assignment_access(assignment_id: str) -> AssignmentAccess:
+    """
+    Get the owner and parsed scenario of an assignment (cached)
+    
+    Args:
+        assignment_id: Assignment UUID
+    
+    Returns:
+        AssignmentAccess with student_nim and scenario
+    
+    Raises:
+        ValueError: If assignment not found
+    """
+    access = _access_cache.get(assignment_id)
+    if access is not None:
+        return access
+    
+    supabase = get_supabase_admin()
+    
+    result = supabase.table('assignments').select('id, student_nim, dataset_id, scenario_json').eq('id', assignment_id).execute()
+    
+    if not result.data:
+        raise ValueError("Assignment not found")
+    
+    assignment = result.data[0]
+    
+    with timed('parse'):
+        scenario = Scenario(**assignment['scenario_json'])
+    
+    return _cache_assignment_access(assignment, scenario)
+
 def get_assignment_by_id(assignment_id: str) -> dict:
     """
     Get assignment by ID
@@ -155,3 +406,15 @@ def get_assignment_by_id(assignment_id: str) -> dict:
         raise ValueError("Assignment not found")
     
     return result.data[0]
+
+def _cache_assignment_access(assignment: dict, scenario: Scenario) -> AssignmentAccess:
+    """Store the owner and parsed scenario of an assignment in the access cache"""
+    access = AssignmentAccess(
+        id=assignment['id'],
+        student_nim=assignment['student_nim'],
+        dataset_id=assignment['dataset_id'],
+        scenario=scenario
+    )
+    _access_cache.set(access.id, access)
+    
+    return access
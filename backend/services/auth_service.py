@@ -1,21 +1,82 @@
+import asyncio
+import threading
+import time
+import uuid
 import bcrypt
 import jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from backend.config import get_config
-from backend.utils.db import get_supabase_admin
+from backend.utils.bounded_executor import BoundedExecutor, ExecutorBusyError
+from backend.utils.cache import LRUCache
+from backend.utils.db import get_supabase_admin, parse_timestamp
+from backend.utils.metrics import registry
 
 config = get_config()
 
+# Token string -> verified payload, kept until the token expires. A token's
+# HMAC only has to be checked the first time it is seen by this worker.
+_verified_tokens = LRUCache(maxsize=config.JWT_VERIFY_CACHE_SIZE)
+
+# Revoked tokens, loaded from token_revocations every TOKEN_REVOCATION_REFRESH
+# seconds so revocations made on other workers apply within that interval
+_revocations = {
+    'jtis': set(),   # single revoked tokens
+    'users': {},     # user_id -> revoked_at (epoch seconds); older tokens are revoked
+    'loaded_at': None
+}
+_revocations_lock = threading.Lock()
+
+# bcrypt is deliberately CPU-heavy. Running it on a few dedicated threads caps
+# the CPU a burst of logins can take from other requests; past the queue
+# limit, logins are turned away (ExecutorBusyError) instead of piling up.
+_password_hashing = BoundedExecutor(
+    max_workers=config.PASSWORD_HASH_WORKERS,
+    max_queue=config.PASSWORD_HASH_QUEUE,
+    thread_name_prefix='bcrypt'
+)
+
 def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+    """
+    Hash a password using bcrypt with BCRYPT_ROUNDS
+
+    Raises:
+        ExecutorBusyError: If too many hashes are already pending
+    """
+    return _password_hashing.run(_hash_password, password)
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """
+    Verify a password against its hash
+
+    Raises:
+        ExecutorBusyError: If too many hashes are already pending
+    """
+    return _password_hashing.run(_check_password, password, password_hash)
+
+def _hash_password(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=config.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
-def verify_password(password: str, password_hash: str) -> bool:
-    """Verify a password against its hash"""
+def _check_password(password: str, password_hash: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
 
+def _needs_rehash(password_hash: str) -> bool:
+    """Whether a hash ($2b$<cost>$...) was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        return int(password_hash.split('$')[2]) != config.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def _rehash_password(user_id: str, password: str):
+    try:
+        supabase = get_supabase_admin()
+        supabase.table('users').update({
+            'password_hash': _hash_password(password)
+        }, returning='minimal').eq('id', user_id).execute()
+    except Exception as e:
+        print(f"Error rehashing password: {e}")
+
 def generate_jwt_token(user_id: str, user_type: str) -> str:
     """
     Generate JWT token for authentication
@@ -31,7 +92,8 @@ def generate_jwt_token(user_id: str, user_type: str) -> str:
         'user_id': user_id,
         'user_type': user_type,
         'exp': datetime.utcnow() + timedelta(hours=config.JWT_EXPIRATION_HOURS),
-        'iat': datetime.utcnow()
+        'iat': datetime.utcnow(),
+        'jti': uuid.uuid4().hex
     }
     
     token = jwt.encode(payload, config.JWT_SECRET, algorithm=config.JWT_ALGORITHM)
@@ -59,6 +121,140 @@ def decode_jwt_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise ValueError("Invalid token")
 
+def verify_jwt_token(token: str) -> dict:
+    """
+    Verify a JWT token for an authenticated request
+
+    Payloads of tokens verified before are served from an in-process cache
+    until the token expires; every call checks the revocation list.
+
+    Args:
+        token: JWT token string
+
+    Returns:
+        Decoded payload dict (shared with the cache; don't modify it)
+
+    Raises:
+        ValueError: If the token is invalid, expired or revoked
+    """
+    payload = _verified_tokens.get(token)
+    if payload is None:
+        payload = decode_jwt_token(token)
+        _verified_tokens.set(token, payload, ttl=payload['exp'] - time.time())
+    elif payload['exp'] <= time.time():
+        raise ValueError("Token has expired")
+
+    if _revocations_stale():
+        refresh_revocations()
+    if _is_revoked(payload):
+        raise ValueError("Token has been revoked")
+
+    return payload
+
+async def verify_jwt_token_async(token: str) -> dict:
+    """Async verify_jwt_token: the periodic revocation reload runs in a worker thread"""
+    if _revocations_stale():
+        await asyncio.to_thread(refresh_revocations)
+    return verify_jwt_token(token)
+
+def revoke_token(payload: dict):
+    """
+    Revoke a single token (logout)
+
+    Args:
+        payload: Verified payload of the token
+    """
+    if 'jti' not in payload:
+        # Issued before tokens carried an ID; only user-wide revocation applies
+        revoke_user_tokens(payload['user_id'])
+        return
+
+    supabase = get_supabase_admin()
+    supabase.table('token_revocations').insert({
+        'jti': payload['jti'],
+        'expires_at': datetime.utcfromtimestamp(payload['exp']).isoformat()
+    }, returning='minimal').execute()
+
+    with _revocations_lock:
+        _revocations['jtis'].add(payload['jti'])
+
+def revoke_user_tokens(user_id: str):
+    """
+    Revoke every token issued to a user so far (force logout)
+
+    Args:
+        user_id: Lecturer email or student NIM
+    """
+    revoked_at = datetime.utcnow()
+
+    supabase = get_supabase_admin()
+    supabase.table('token_revocations').insert({
+        'user_id': user_id,
+        'revoked_at': revoked_at.isoformat(),
+        # No token issued before revoked_at is valid after this
+        'expires_at': (revoked_at + timedelta(hours=config.JWT_EXPIRATION_HOURS)).isoformat()
+    }, returning='minimal').execute()
+
+    with _revocations_lock:
+        _revocations['users'][user_id] = revoked_at.replace(tzinfo=timezone.utc).timestamp()
+
+def refresh_revocations():
+    """Reload the revocation list from token_revocations"""
+    with _revocations_lock:
+        # Another thread may have reloaded while this one waited for the lock
+        if not _revocations_stale():
+            return
+
+        try:
+            supabase = get_supabase_admin()
+            result = supabase.table('token_revocations').select(
+                'jti, user_id, revoked_at'
+            ).gt('expires_at', datetime.utcnow().isoformat()).execute()
+        except Exception as e:
+            # Keep the current list; retried after the next interval
+            print(f"Error loading token revocations: {e}")
+            _revocations['loaded_at'] = time.monotonic()
+            return
+
+        jtis, users = set(), {}
+        for row in result.data:
+            if row.get('jti'):
+                jtis.add(row['jti'])
+            try:
+                if row.get('user_id'):
+                    revoked_at = parse_timestamp(row['revoked_at']).timestamp()
+                    users[row['user_id']] = max(revoked_at, users.get(row['user_id'], 0))
+            except (KeyError, TypeError, ValueError) as e:
+                # One unreadable row must not lock every user out
+                print(f"Skipping unreadable token revocation for {row.get('user_id') or row.get('jti')}: {e}")
+
+        _revocations.update(jtis=jtis, users=users, loaded_at=time.monotonic())
+
+def _revocations_stale() -> bool:
+    loaded_at = _revocations['loaded_at']
+    return loaded_at is None or time.monotonic() - loaded_at >= config.TOKEN_REVOCATION_REFRESH
+
+def _is_revoked(payload: dict) -> bool:
+    if payload.get('jti') in _revocations['jtis']:
+        return True
+    revoked_at = _revocations['users'].get(payload['user_id'])
+    # iat has whole-second precision, so a token issued in the same second
+    # as the revocation counts as revoked
+    return revoked_at is not None and payload['iat'] <= revoked_at
+
+def _collect_auth_metrics() -> list[tuple]:
+    stats = _verified_tokens.stats()
+    hashing = _password_hashing.stats()
+    return [
+        ('auth_token_cache_total', 'counter', 'Token verifications, by whether the verified payload was cached',
+         [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]),
+        ('auth_token_cache_size', 'gauge', 'Verified tokens cached', [({}, stats['size'])]),
+        ('auth_password_hash_pending', 'gauge', 'Password hashes/checks running or waiting for a bcrypt thread',
+         [({}, hashing['pending'])]),
+        ('auth_password_hash_rejected_total', 'counter', 'Password hashes/checks turned away because the queue was full',
+         [({}, hashing['rejected_total'])])
+    ]
+
 def create_lecturer(email: str, password: str) -> dict:
     """
     Create a new lecturer account
@@ -69,6 +265,9 @@ def create_lecturer(email: str, password: str) -> dict:
     
     Returns:
         Created user dict
+    
+    Raises:
+        ExecutorBusyError: If too many password hashes are already pending
     """
     supabase = get_supabase_admin()
     
@@ -99,6 +298,7 @@ def authenticate_lecturer(email: str, password: str) -> dict:
     
     Raises:
         ValueError: If authentication fails
+        ExecutorBusyError: If too many password checks are already pending
     """
     supabase = get_supabase_admin()
     
@@ -114,6 +314,14 @@ def authenticate_lecturer(email: str, password: str) -> dict:
     if not verify_password(password, user['password_hash']):
         raise ValueError("Invalid email or password")
     
+    # Upgrade hashes made with an older BCRYPT_ROUNDS while the password is
+    # at hand, off the request path; skipped if hashing is busy (next login retries)
+    if _needs_rehash(user['password_hash']):
+        try:
+            _password_hashing.submit(_rehash_password, user['id'], password)
+        except ExecutorBusyError:
+            pass
+    
     return user
 
 def authenticate_student(nim: str) -> dict:
@@ -138,3 +346,5 @@ def authenticate_student(nim: str) -> dict:
         raise ValueError("Student not found. Please contact your lecturer.")
     
     return result.data[0]
+
+registry.add_collector(_collect_auth_metrics)
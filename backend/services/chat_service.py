@@ -0,0 +1,316 @@
+import asyncio
+from typing import Optional
+from backend.config import get_config
+from backend.models.assignment import Scenario
+from backend.models.chat_message import ChatContext
+from backend.services.llm_service import summarize_conversation, summarize_conversation_async
+from backend.utils.cache import LRUCache
+from backend.utils.db import get_supabase_admin
+from backend.utils.tokens import estimate_tokens, truncate_to_tokens
+
+config = get_config()
+
+# Tokens per history line spent on the "Sender: " label and newline
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Per-assignment conversation state: the rolling summary plus the newest
+# messages not yet folded into it (oldest first), at most
+# _history_read_limit() of them, and the timestamp of the newest message.
+# Turns are appended as they are saved; before a cached entry is used, one
+# indexed query checks that no other worker has saved a turn since, so a
+# normal turn needs no history read.
+_conversation_cache = LRUCache(
+    maxsize=config.CHAT_WINDOW_CACHE_SIZE,
+    ttl=config.CHAT_WINDOW_CACHE_TTL
+)
+
+def get_chat_context(assignment_id: str, scenario: Scenario) -> ChatContext:
+    """
+    Build the conversation context for the Actor LLM within CHAT_CONTEXT_TOKEN_BUDGET
+
+    The most recent messages (each capped at CHAT_MESSAGE_MAX_TOKENS, at most
+    CHAT_HISTORY_WINDOW of them) are kept verbatim. Older messages are folded
+    into the rolling summary once they add up to CHAT_SUMMARY_BATCH_TOKENS;
+    until then they stay in the prompt too, in the share of the budget
+    reserved for them.
+
+    Args:
+        assignment_id: Assignment UUID
+        scenario: Scenario of the assignment (used for summarization)
+
+    Returns:
+        ChatContext with the summary and recent messages
+    """
+    conversation = _get_conversation(assignment_id)
+    recent, overflow = _select_recent(conversation['messages'])
+
+    summary = conversation['summary']
+    if _needs_fold(overflow):
+        summary = _fold_into_summary(assignment_id, scenario, summary, overflow)
+    else:
+        recent = _truncate_messages(overflow) + recent
+
+    return ChatContext(summary=summary, recent=recent)
+
+async def get_chat_context_async(assignment_id: str, scenario: Scenario) -> ChatContext:
+    """Async `get_chat_context` (ASGI app): DB reads run in a worker thread, summarization is awaited"""
+    conversation = await asyncio.to_thread(_get_conversation, assignment_id)
+    recent, overflow = _select_recent(conversation['messages'])
+
+    summary = conversation['summary']
+    if _needs_fold(overflow):
+        fold = _Fold(assignment_id, summary, overflow)
+        try:
+            for previous_summary, batch in fold.batches():
+                fold.summarized(await summarize_conversation_async(scenario, previous_summary, batch))
+            summary = await asyncio.to_thread(fold.save)
+        except Exception as e:
+            summary = fold.failed(e)
+    else:
+        recent = _truncate_messages(overflow) + recent
+
+    return ChatContext(summary=summary, recent=recent)
+
+def append_chat_turn(assignment_id: str, student_content: str, ai_content: str) -> tuple[dict, dict]:
+    """
+    Save a student message and the AI reply to it, and append both to the cached conversation
+
+    Called once the reply exists, so a failed LLM call leaves nothing behind.
+    Both rows are written by the `append_chat_turn` database function in one
+    round trip and one transaction, with timestamps assigned by the database
+    (the reply one microsecond after the message).
+
+    Args:
+        assignment_id: Assignment UUID
+        student_content: Student message text
+        ai_content: AI reply text
+
+    Returns:
+        (student message, AI message) dicts as inserted
+
+    Raises:
+        ValueError: If the turn could not be saved
+    """
+    supabase = get_supabase_admin()
+
+    result = supabase.rpc('append_chat_turn', {
+        'chat_assignment_id': assignment_id,
+        'student_content': student_content,
+        'ai_content': ai_content
+    }).execute()
+
+    messages = {message['sender']: message for message in result.data or []}
+    if set(messages) != {'student', 'ai'}:
+        raise ValueError("Failed to save chat message")
+
+    student_message, ai_message = messages['student'], messages['ai']
+
+    # Uncached conversations are loaded from the DB on next read, which already includes this turn
+    _conversation_cache.update(
+        assignment_id,
+        lambda conversation: {
+            **conversation,
+            'messages': (conversation['messages'] + [
+                {
+                    'sender': message['sender'],
+                    'content': message['content'],
+                    'timestamp': message['timestamp']
+                }
+                for message in (student_message, ai_message)
+            ])[-_history_read_limit():],
+            'latest_timestamp': ai_message['timestamp']
+        }
+    )
+
+    return student_message, ai_message
+
+def _get_conversation(assignment_id: str) -> dict:
+    """
+    Load the summary and the newest unsummarized messages from cache or the database
+
+    At most _history_read_limit() messages are read, so a conversation whose
+    folds keep failing (or that predates summaries) still costs a bounded
+    read; anything older than that never reaches the prompt or the summary.
+    """
+    supabase = get_supabase_admin()
+
+    conversation = _conversation_cache.get(assignment_id)
+    if conversation is not None:
+        # Turns saved by another worker never reach this cache; reload if there are any
+        latest_result = supabase.table('chat_messages').select('timestamp').eq('assignment_id', assignment_id).order('timestamp', desc=True).limit(1).execute()
+        latest_timestamp = latest_result.data[0]['timestamp'] if latest_result.data else None
+        if latest_timestamp == conversation['latest_timestamp']:
+            return conversation
+
+    summary_result = supabase.table('chat_summaries').select('summary, summarized_until').eq('assignment_id', assignment_id).execute()
+    summary_row = summary_result.data[0] if summary_result.data else None
+
+    query = supabase.table('chat_messages').select('sender, content, timestamp').eq('assignment_id', assignment_id)
+    if summary_row:
+        query = query.gt('timestamp', summary_row['summarized_until'])
+    result = query.order('timestamp', desc=True).limit(_history_read_limit()).execute()
+
+    messages = result.data[::-1]
+    if messages:
+        latest_timestamp = messages[-1]['timestamp']
+    else:
+        # Every message so far is in the summary (or there are none)
+        latest_timestamp = summary_row['summarized_until'] if summary_row else None
+
+    conversation = {
+        'summary': summary_row['summary'] if summary_row else None,
+        'messages': messages,
+        'latest_timestamp': latest_timestamp
+    }
+    _conversation_cache.set(assignment_id, conversation)
+
+    return conversation
+
+def _history_read_limit() -> int:
+    """Unsummarized messages read and cached per conversation: the window plus one summary batch"""
+    # A message costs at least MESSAGE_OVERHEAD_TOKENS + 1, which bounds how many fit in a batch
+    return config.CHAT_HISTORY_WINDOW + config.CHAT_SUMMARY_BATCH_TOKENS // (MESSAGE_OVERHEAD_TOKENS + 1)
+
+def _select_recent(messages: list[dict]) -> tuple[list[dict], list[dict]]:
+    """
+    Split unsummarized messages into the recent ones that fit the budget
+    (content truncated) and the older overflow
+    """
+    # The summary's share of the budget is reserved so the prompt size
+    # doesn't depend on how long the summary currently is, and so is room for
+    # overflow that is still below a summary batch and is sent verbatim
+    recent_budget = (
+        config.CHAT_CONTEXT_TOKEN_BUDGET
+        - config.CHAT_SUMMARY_MAX_TOKENS
+        - config.CHAT_SUMMARY_BATCH_TOKENS
+    )
+
+    recent = []
+    used_tokens = 0
+    for message in reversed(messages):
+        if len(recent) >= config.CHAT_HISTORY_WINDOW:
+            break
+
+        content = truncate_to_tokens(message['content'], config.CHAT_MESSAGE_MAX_TOKENS)
+        cost = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        if used_tokens + cost > recent_budget:
+            break
+
+        recent.append({**message, 'content': content})
+        used_tokens += cost
+    recent.reverse()
+
+    return recent, messages[:len(messages) - len(recent)]
+
+def _truncate_messages(messages: list[dict]) -> list[dict]:
+    return [
+        {**message, 'content': truncate_to_tokens(message['content'], config.CHAT_MESSAGE_MAX_TOKENS)}
+        for message in messages
+    ]
+
+def _needs_fold(overflow: list[dict]) -> bool:
+    return bool(overflow) and _history_tokens(overflow) >= config.CHAT_SUMMARY_BATCH_TOKENS
+
+def _fold_into_summary(assignment_id: str, scenario: Scenario, summary: Optional[str],
+                       overflow: list[dict]) -> Optional[str]:
+    """
+    Summarize `overflow` into the rolling summary and persist it
+
+    Returns:
+        The new summary, or the previous one if summarization failed
+    """
+    fold = _Fold(assignment_id, summary, overflow)
+    try:
+        for previous_summary, batch in fold.batches():
+            fold.summarized(summarize_conversation(scenario, previous_summary, batch))
+        return fold.save()
+    except Exception as e:
+        return fold.failed(e)
+
+class _Fold:
+    """
+    One fold of overflow messages into the rolling summary
+
+    Holds everything but the LLM calls, so the sync and async paths (which
+    only differ in how they call the summarizer and the DB) fold the same way.
+    """
+
+    def __init__(self, assignment_id: str, summary: Optional[str], overflow: list[dict]):
+        self.assignment_id = assignment_id
+        self.previous_summary = summary
+        self.summary = summary
+        self.overflow = overflow
+
+    def batches(self):
+        """
+        Yield (summary so far, batch) for each summarization call
+
+        Conversations that predate summaries may have a long backlog; it is
+        folded in budget-sized batches so each summarization prompt stays bounded.
+        """
+        for batch in _batches(self.overflow, config.CHAT_CONTEXT_TOKEN_BUDGET):
+            yield self.summary, batch
+
+    def summarized(self, summary: str):
+        """Take the summarizer's reply for the current batch"""
+        self.summary = truncate_to_tokens(summary, config.CHAT_SUMMARY_MAX_TOKENS)
+
+    def save(self) -> str:
+        """Persist the summary; returns the summary now stored"""
+        return _save_summary(self.assignment_id, self.summary, self.overflow[-1]['timestamp'])
+
+    def failed(self, error: Exception) -> Optional[str]:
+        """Not fatal: the turn goes ahead with the previous summary and the fold is retried next turn"""
+        print(f"Error summarizing chat for assignment {self.assignment_id}: {error}")
+        return self.previous_summary
+
+def _save_summary(assignment_id: str, summary: str, summarized_until: str) -> str:
+    """
+    Persist a new summary and drop the messages it covers from the cached conversation
+
+    The `save_chat_summary` database function only moves `summarized_until`
+    forward, so a worker folding from a stale conversation can't overwrite a
+    newer summary saved by another worker; the stored summary is returned
+    either way.
+
+    Returns:
+        The summary now stored for the assignment
+    """
+    supabase = get_supabase_admin()
+    result = supabase.rpc('save_chat_summary', {
+        'chat_assignment_id': assignment_id,
+        'new_summary': summary,
+        'new_summarized_until': summarized_until
+    }).execute()
+
+    if result.data:
+        summary, summarized_until = result.data[0]['summary'], result.data[0]['summarized_until']
+
+    _conversation_cache.update(
+        assignment_id,
+        lambda conversation: {
+            **conversation,
+            'summary': summary,
+            'messages': [m for m in conversation['messages'] if m['timestamp'] > summarized_until]
+        }
+    )
+
+    return summary
+
+def _batches(messages: list[dict], max_tokens: int):
+    """Split messages into consecutive batches of about `max_tokens` each"""
+    batch = []
+    batch_tokens = 0
+    for message in _truncate_messages(messages):
+        tokens = _history_tokens([message])
+        if batch and batch_tokens + tokens > max_tokens:
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(message)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def _history_tokens(messages: list[dict]) -> int:
+    return sum(estimate_tokens(m['content']) + MESSAGE_OVERHEAD_TOKENS for m in messages)
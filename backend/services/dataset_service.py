@@ -0,0 +1,135 @@
+import random
+from backend.config import get_config
+from backend.utils.cache import LRUCache
+from backend.utils.db import get_supabase_admin
+from backend.utils.http_cache import weak_etag
+
+config = get_config()
+
+# Everything except the (potentially large) sample_data text
+CATALOG_COLUMNS = 'id, name, url, metadata_summary, columns_list, data_quality_notes, created_at'
+
+# Single-entry cache holding the catalog. Writes through this module invalidate
+# it immediately; the TTL picks up writes made by other workers.
+_catalog_cache = LRUCache(maxsize=1, ttl=config.DATASET_CATALOG_TTL)
+_CATALOG_KEY = 'catalog'
+
+def get_dataset_catalog() -> list[dict]:
+    """
+    Get metadata for all datasets, newest first (cached)
+
+    Returns:
+        List of dataset dicts without sample_data
+    """
+    return list(_get_catalog()['datasets'])
+
+def get_dataset_catalog_etag() -> str:
+    """
+    Get the version of the cached catalog, for conditional GETs
+
+    Returns:
+        ETag value that changes when a dataset is added or removed
+    """
+    return _get_catalog()['etag']
+
+def select_random_dataset_id() -> str:
+    """
+    Pick a random dataset ID from the cached catalog
+
+    Returns:
+        Dataset UUID
+
+    Raises:
+        ValueError: If no datasets available
+    """
+    dataset_ids = _get_catalog()['ids']
+
+    if not dataset_ids:
+        raise ValueError("No datasets available. Please ask your lecturer to add datasets.")
+
+    return random.choice(dataset_ids)
+
+def get_dataset(dataset_id: str) -> dict:
+    """
+    Get a full dataset row, including sample_data
+
+    Args:
+        dataset_id: Dataset UUID
+
+    Returns:
+        Dataset dict
+
+    Raises:
+        ValueError: If dataset not found
+    """
+    supabase = get_supabase_admin()
+
+    result = supabase.table('datasets').select('*').eq('id', dataset_id).execute()
+
+    if not result.data:
+        raise ValueError("Dataset not found")
+
+    return result.data[0]
+
+def create_dataset(dataset: dict) -> dict:
+    """
+    Create a dataset and invalidate the catalog cache
+
+    Args:
+        dataset: Dataset fields to insert
+
+    Returns:
+        Created dataset dict
+    """
+    supabase = get_supabase_admin()
+
+    result = supabase.table('datasets').insert(dataset).execute()
+
+    if not result.data:
+        raise ValueError("Failed to create dataset")
+
+    invalidate_dataset_catalog()
+
+    return result.data[0]
+
+def delete_dataset(dataset_id: str) -> bool:
+    """
+    Delete a dataset and invalidate the catalog cache
+
+    Args:
+        dataset_id: Dataset UUID
+
+    Returns:
+        True if deleted successfully
+    """
+    supabase = get_supabase_admin()
+
+    supabase.table('datasets').delete().eq('id', dataset_id).execute()
+
+    invalidate_dataset_catalog()
+
+    return True
+
+def invalidate_dataset_catalog():
+    """Drop the cached catalog so the next read reloads it"""
+    _catalog_cache.pop(_CATALOG_KEY)
+
+def _get_catalog() -> dict:
+    """Load the catalog from cache or the database"""
+    catalog = _catalog_cache.get(_CATALOG_KEY)
+    if catalog is not None:
+        return catalog
+
+    supabase = get_supabase_admin()
+
+    result = supabase.table('datasets').select(CATALOG_COLUMNS).order('created_at', desc=True).execute()
+
+    catalog = {
+        'datasets': tuple(result.data),
+        'ids': tuple(dataset['id'] for dataset in result.data),
+        # Datasets are only ever created or deleted, so their ids and creation times version the catalog
+        'etag': weak_etag([(dataset['id'], dataset['created_at']) for dataset in result.data])
+    }
+    _catalog_cache.set(_CATALOG_KEY, catalog)
+
+    return catalog
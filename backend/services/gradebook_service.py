@@ -0,0 +1,151 @@
+"""
+Gradebook export.
+
+Students are read in NIM order in keyset-paginated batches, each joined to
+its assignments, latest submissions and grades with one query per table,
+and turned into rows as they are read. Memory use depends on the batch
+size, not on the size of the cohort.
+"""
+import csv
+import io
+import tempfile
+from typing import Iterator, Optional
+from backend.config import get_config
+from backend.utils.db import get_supabase_admin
+
+config = get_config()
+
+EXPORT_COLUMNS = [
+    'NIM', 'Name', 'Dataset', 'Scenario Title',
+    'Progress Submission', 'Final Submission', 'Score', 'Feedback'
+]
+
+# Spreadsheet apps run CSV cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def iter_gradebook_rows(batch_size: Optional[int] = None) -> Iterator[list]:
+    """
+    Yield one gradebook row (EXPORT_COLUMNS) per student, ordered by NIM
+
+    Args:
+        batch_size: Students per batch (default GRADEBOOK_EXPORT_BATCH_SIZE)
+    """
+    batch_size = batch_size or config.GRADEBOOK_EXPORT_BATCH_SIZE
+    supabase = get_supabase_admin()
+    last_nim = None
+
+    while True:
+        # Keyset pagination: each batch starts after the last NIM seen, so
+        # later batches cost the same as the first (unlike OFFSET)
+        query = supabase.table('students').select('nim, name').order('nim').limit(batch_size)
+        if last_nim is not None:
+            query = query.gt('nim', last_nim)
+        students = query.execute().data
+
+        if not students:
+            return
+
+        yield from _gradebook_batch(supabase, students)
+
+        if len(students) < batch_size:
+            return
+        last_nim = students[-1]['nim']
+
+def stream_csv(rows: Iterator[list]) -> Iterator[str]:
+    """Encode rows as CSV with a header, yielding one chunk per row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for row in _with_header(rows):
+        writer.writerow([_safe_cell(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def stream_xlsx(rows: Iterator[list]) -> Iterator[bytes]:
+    """
+    Encode rows as an XLSX workbook with a header
+
+    An XLSX file is a zip archive that is only readable once complete, so
+    nothing is sent until every row is written. openpyxl's write-only mode
+    and a spooled temporary file keep memory bounded meanwhile.
+    """
+    # Imported lazily: only needed for spreadsheet exports
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Gradebook')
+    for row in _with_header(rows):
+        sheet.append([_xlsx_cell(sheet, value) for value in row])
+
+    with tempfile.SpooledTemporaryFile(max_size=config.GRADEBOOK_EXPORT_SPOOL_BYTES) as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(64 * 1024):
+            yield chunk
+
+def _gradebook_batch(supabase, students: list[dict]) -> Iterator[list]:
+    nims = [student['nim'] for student in students]
+
+    # Only the scenario title is read from scenario_json, not the whole scenario
+    assignment_result = supabase.table('assignments').select(
+        'id, student_nim, scenario_title:scenario_json->>scenario_title, datasets(name)'
+    ).in_('student_nim', nims).execute()
+    assignments_by_nim = {assignment['student_nim']: assignment for assignment in assignment_result.data}
+
+    assignment_ids = [assignment['id'] for assignment in assignment_result.data]
+    latest_links = {}  # (assignment_id, submission_type) -> link_url
+    grades_by_assignment = {}
+    if assignment_ids:
+        submissions_result = supabase.table('submissions').select(
+            'assignment_id, submission_type, link_url'
+        ).in_('assignment_id', assignment_ids).order('created_at', desc=True).execute()
+        for submission in submissions_result.data:
+            latest_links.setdefault((submission['assignment_id'], submission['submission_type']), submission['link_url'])
+
+        grade_result = supabase.table('grades').select('assignment_id, score, feedback').in_('assignment_id', assignment_ids).execute()
+        grades_by_assignment = {grade['assignment_id']: grade for grade in grade_result.data}
+
+    for student in students:
+        assignment = assignments_by_nim.get(student['nim'])
+        if not assignment:
+            yield [student['nim'], student['name'], None, None, None, None, None, None]
+            continue
+
+        grade = grades_by_assignment.get(assignment['id']) or {}
+        yield [
+            student['nim'],
+            student['name'],
+            (assignment.get('datasets') or {}).get('name'),
+            assignment.get('scenario_title'),
+            latest_links.get((assignment['id'], 'progress')),
+            latest_links.get((assignment['id'], 'final')),
+            grade.get('score'),
+            grade.get('feedback')
+        ]
+
+def _with_header(rows: Iterator[list]) -> Iterator[list]:
+    yield EXPORT_COLUMNS
+    yield from rows
+
+def _safe_cell(value):
+    """Keep user-provided text (names, feedback) from being evaluated as a formula when a CSV is opened"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _xlsx_cell(sheet, value):
+    """
+    Store text that openpyxl would write as a formula as a plain string cell
+
+    XLSX cells are typed: only a leading '=' makes openpyxl write a formula,
+    so other text (e.g. "-5 for missing plot") is kept as is rather than
+    quoted like in CSV.
+    """
+    if isinstance(value, str) and value.startswith('='):
+        from openpyxl.cell import WriteOnlyCell
+
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.data_type = 's'
+        return cell
+    return value
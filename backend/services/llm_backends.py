@@ -0,0 +1,543 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Iterator
+from backend.config import get_config
+from backend.utils.cache import LRUCache
+from backend.utils.metrics import record_llm_tokens, timed, timed_aiter, timed_iter
+from backend.utils.single_flight import SingleFlight
+from backend.utils.tokens import estimate_tokens
+
+config = get_config()
+
+class LLMBackend:
+    """
+    Text generation provider used by llm_service.
+
+    Backends only turn a prompt into text; prompt construction and parsing
+    of the Architect/Actor output stay in llm_service.
+    """
+    name = 'base'
+
+    def generate(self, prompt: str, temperature: float, json_mode: bool = False) -> str:
+        """
+        Generate a complete response
+
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            json_mode: Ask the provider for a JSON response
+
+        Returns:
+            Response text
+        """
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str, temperature: float) -> Iterator[str]:
+        """
+        Generate a response as a stream of text chunks
+
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+
+        Yields:
+            Text chunks in order
+        """
+        raise NotImplementedError
+
+    def chat(self, system_instruction: str, turns: list[dict], temperature: float) -> str:
+        """
+        Continue a conversation
+
+        Args:
+            system_instruction: Persona/system prompt, identical across turns
+            turns: Conversation so far, ending with the new user message;
+                [{"role": "user"|"model", "text": "..."}], roles alternating
+            temperature: Sampling temperature
+
+        Returns:
+            Response text
+
+        Backends without a native conversation API flatten it into one prompt.
+        """
+        return self.generate(_flatten_conversation(system_instruction, turns), temperature)
+
+    def chat_stream(self, system_instruction: str, turns: list[dict], temperature: float) -> Iterator[str]:
+        """
+        Continue a conversation, streaming the response (see `chat`)
+
+        Yields:
+            Text chunks in order
+        """
+        yield from self.generate_stream(_flatten_conversation(system_instruction, turns), temperature)
+
+    # Async variants, used by the ASGI app. Backends without an async client
+    # fall back to running the sync call in a worker thread.
+
+    async def generate_async(self, prompt: str, temperature: float, json_mode: bool = False) -> str:
+        """Async `generate`"""
+        return await asyncio.to_thread(self.generate, prompt, temperature, json_mode)
+
+    async def chat_async(self, system_instruction: str, turns: list[dict], temperature: float) -> str:
+        """Async `chat`"""
+        return await asyncio.to_thread(self.chat, system_instruction, turns, temperature)
+
+    async def chat_stream_async(self, system_instruction: str, turns: list[dict], temperature: float) -> AsyncIterator[str]:
+        """Async `chat_stream`"""
+        chunks = await asyncio.to_thread(lambda: list(self.chat_stream(system_instruction, turns, temperature)))
+        for chunk in chunks:
+            yield chunk
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini via google-generativeai
+
+    Chat turns are sent as typed contents with the persona as
+    system_instruction. Personas large enough for explicit context caching
+    (GEMINI_CONTEXT_CACHE_MIN_TOKENS) are uploaded once as CachedContent and
+    reused across turns until the cache TTL runs out; smaller ones use a
+    plain system_instruction model, which still leaves the provider a stable
+    prefix to reuse. Generated personas are usually below the model minimum,
+    so the app only enables caching when GEMINI_CONTEXT_CACHE is set.
+    """
+    name = 'gemini'
+
+    def __init__(self, api_key: str, model_name: str, genai_module=None,
+                 context_cache: bool = True, cache_ttl: int = 900,
+                 cache_min_tokens: int = 1024, cache_size: int = 1000):
+        """
+        Args:
+            api_key: Gemini API key
+            model_name: Model used for every call
+            genai_module: google.generativeai or a compatible stand-in (offline tests)
+            context_cache: Create CachedContent handles for chat personas
+            cache_ttl: Seconds a CachedContent lives on the provider side
+            cache_min_tokens: Smallest persona (estimated tokens) worth caching
+            cache_size: Persona models kept in memory
+        """
+        if genai_module is None:
+            # Imported here so the SDK is only loaded when Gemini is actually used
+            import google.generativeai as genai_module
+
+        genai_module.configure(api_key=api_key)
+        self.genai = genai_module
+        self.model_name = model_name
+        self.model = genai_module.GenerativeModel(model_name)
+
+        self.context_cache = context_cache and hasattr(genai_module, 'caching')
+        self.cache_ttl = cache_ttl
+        self.cache_min_tokens = cache_min_tokens
+
+        # Persona hash -> (GenerativeModel, uses_cached_content). Entries expire a
+        # minute before the provider-side cache so an expired handle is never used.
+        self._persona_models = LRUCache(maxsize=cache_size, ttl=max(cache_ttl - 60, 1))
+        self._persona_flight = SingleFlight()
+
+    def generate(self, prompt: str, temperature: float, json_mode: bool = False) -> str:
+        generation_config = {'temperature': temperature}
+        if json_mode:
+            generation_config['response_mime_type'] = 'application/json'
+
+        with timed('llm'):
+            response = self.model.generate_content(prompt, generation_config=generation_config)
+        _record_usage(response)
+        return response.text
+
+    def generate_stream(self, prompt: str, temperature: float) -> Iterator[str]:
+        response = self.model.generate_content(
+            prompt,
+            generation_config={'temperature': temperature},
+            stream=True
+        )
+
+        last_chunk = None
+        for chunk in timed_iter('llm', response):
+            last_chunk = chunk
+            # Chunks without text (e.g. safety/metadata only) are skipped
+            if chunk.parts:
+                yield chunk.text
+
+        # The final chunk carries usage for the whole stream
+        if last_chunk is not None:
+            _record_usage(last_chunk)
+
+    def chat(self, system_instruction: str, turns: list[dict], temperature: float) -> str:
+        contents = _to_contents(turns)
+        generation_config = {'temperature': temperature}
+        model, cached = self._persona_model(system_instruction)
+
+        try:
+            with timed('llm'):
+                response = model.generate_content(contents, generation_config=generation_config)
+        except Exception as e:
+            if not cached:
+                raise
+            # The CachedContent may have been evicted early; retry without it
+            print(f"Error using cached persona, retrying uncached: {e}")
+            model = self._uncache_persona(system_instruction)
+            with timed('llm'):
+                response = model.generate_content(contents, generation_config=generation_config)
+
+        _record_usage(response)
+        return response.text
+
+    def chat_stream(self, system_instruction: str, turns: list[dict], temperature: float) -> Iterator[str]:
+        contents = _to_contents(turns)
+        generation_config = {'temperature': temperature}
+        model, cached = self._persona_model(system_instruction)
+
+        try:
+            with timed('llm'):
+                response = iter(model.generate_content(contents, generation_config=generation_config, stream=True))
+                first_chunk = next(response, None)
+        except Exception as e:
+            if not cached:
+                raise
+            # Nothing has been sent to the client yet, so retrying is invisible
+            print(f"Error using cached persona, retrying uncached: {e}")
+            model = self._uncache_persona(system_instruction)
+            with timed('llm'):
+                response = iter(model.generate_content(contents, generation_config=generation_config, stream=True))
+                first_chunk = next(response, None)
+
+        if first_chunk is None:
+            return
+
+        last_chunk = first_chunk
+        if first_chunk.parts:
+            yield first_chunk.text
+
+        for chunk in timed_iter('llm', response):
+            last_chunk = chunk
+            if chunk.parts:
+                yield chunk.text
+
+        _record_usage(last_chunk)
+
+    async def generate_async(self, prompt: str, temperature: float, json_mode: bool = False) -> str:
+        generation_config = {'temperature': temperature}
+        if json_mode:
+            generation_config['response_mime_type'] = 'application/json'
+
+        with timed('llm'):
+            response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        _record_usage(response)
+        return response.text
+
+    async def chat_async(self, system_instruction: str, turns: list[dict], temperature: float) -> str:
+        contents = _to_contents(turns)
+        generation_config = {'temperature': temperature}
+        model, cached = await self._persona_model_async(system_instruction)
+
+        try:
+            with timed('llm'):
+                response = await model.generate_content_async(contents, generation_config=generation_config)
+        except Exception as e:
+            if not cached:
+                raise
+            print(f"Error using cached persona, retrying uncached: {e}")
+            model = self._uncache_persona(system_instruction)
+            with timed('llm'):
+                response = await model.generate_content_async(contents, generation_config=generation_config)
+
+        _record_usage(response)
+        return response.text
+
+    async def chat_stream_async(self, system_instruction: str, turns: list[dict], temperature: float) -> AsyncIterator[str]:
+        contents = _to_contents(turns)
+        generation_config = {'temperature': temperature}
+        model, cached = await self._persona_model_async(system_instruction)
+
+        async def start(model):
+            response = await model.generate_content_async(contents, generation_config=generation_config, stream=True)
+            chunks = response.__aiter__()
+            try:
+                # Not anext(): that builtin needs Python 3.10
+                return chunks, await chunks.__anext__()
+            except StopAsyncIteration:
+                return chunks, None
+
+        try:
+            with timed('llm'):
+                chunks, first_chunk = await start(model)
+        except Exception as e:
+            if not cached:
+                raise
+            print(f"Error using cached persona, retrying uncached: {e}")
+            with timed('llm'):
+                chunks, first_chunk = await start(self._uncache_persona(system_instruction))
+
+        if first_chunk is None:
+            return
+
+        last_chunk = first_chunk
+        if first_chunk.parts:
+            yield first_chunk.text
+
+        async for chunk in timed_aiter('llm', chunks):
+            last_chunk = chunk
+            if chunk.parts:
+                yield chunk.text
+
+        _record_usage(last_chunk)
+
+    async def _persona_model_async(self, system_instruction: str) -> tuple:
+        entry = self._persona_models.get(_persona_key(system_instruction))
+        if entry is not None:
+            return entry
+
+        # First turn for this persona: creating the CachedContent is a sync call
+        return await asyncio.to_thread(self._persona_model, system_instruction)
+
+    def _persona_model(self, system_instruction: str) -> tuple:
+        """Get (model, uses_cached_content) for a persona, creating it on first use"""
+        key = _persona_key(system_instruction)
+
+        entry = self._persona_models.get(key)
+        if entry is not None:
+            return entry
+
+        # Concurrent first turns for the same persona create one cache, not several
+        return self._persona_flight.do(key, lambda: self._create_persona_model(key, system_instruction))
+
+    def _create_persona_model(self, key: str, system_instruction: str) -> tuple:
+        entry = None
+
+        if self.context_cache and estimate_tokens(system_instruction) >= self.cache_min_tokens:
+            try:
+                with timed('llm'):
+                    cached_content = self.genai.caching.CachedContent.create(
+                        model=self.model_name,
+                        system_instruction=system_instruction,
+                        ttl=timedelta(seconds=self.cache_ttl)
+                    )
+                entry = (self.genai.GenerativeModel.from_cached_content(cached_content), True)
+            except Exception as e:
+                # E.g. below the model's minimum cacheable size; the plain model works the same
+                print(f"Error creating persona context cache: {e}")
+
+        if entry is None:
+            entry = (self.genai.GenerativeModel(self.model_name, system_instruction=system_instruction), False)
+
+        self._persona_models.set(key, entry)
+        return entry
+
+    def _uncache_persona(self, system_instruction: str):
+        """Replace a persona's cached-content model with a plain one"""
+        model = self.genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+        self._persona_models.set(_persona_key(system_instruction), (model, False))
+        return model
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic local stand-in for load testing, no network access.
+
+    Responses depend only on the prompt. Latency (time to first token),
+    token rate and failure injection are configurable so our own overhead
+    can be measured separately from the provider's.
+    """
+    name = 'stub'
+
+    REPLIES = [
+        "Thanks for looking into this. Have you checked whether any of the columns have missing values?",
+        "I'm not a data person, but the numbers for last month look off to me. Can you tell me why?",
+        "That's helpful. What would you need from me to get a clearer answer for the management meeting?",
+        "I can't help you with code, I'm afraid. But I can tell you how we record this data on the ward."
+    ]
+
+    def __init__(self, latency_ms: float = 0, tokens_per_second: float = 0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency_ms: Delay before the first token
+            tokens_per_second: Output rate after the first token (0 = instant)
+            failure_rate: Probability (0-1) that a call raises
+            seed: Seed for failure injection
+        """
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, temperature: float, json_mode: bool = False) -> str:
+        with timed('llm'):
+            self._start_call()
+            text = self._scenario_json(prompt) if json_mode else self._reply(prompt)
+            self._emit_delay(len(text.split()))
+        # Whitespace-separated words stand in for tokens
+        record_llm_tokens(len(prompt.split()), len(text.split()))
+        return text
+
+    def generate_stream(self, prompt: str, temperature: float) -> Iterator[str]:
+        words = self._reply(prompt).split(' ')
+        yield from timed_iter('llm', self._stream_words(words))
+        record_llm_tokens(len(prompt.split()), len(words))
+
+    def _stream_words(self, words: list[str]) -> Iterator[str]:
+        self._start_call()
+        for word in words:
+            self._emit_delay(1)
+            yield word + ' '
+
+    async def generate_async(self, prompt: str, temperature: float, json_mode: bool = False) -> str:
+        with timed('llm'):
+            await self._start_call_async()
+            text = self._scenario_json(prompt) if json_mode else self._reply(prompt)
+            await self._emit_delay_async(len(text.split()))
+        record_llm_tokens(len(prompt.split()), len(text.split()))
+        return text
+
+    async def chat_async(self, system_instruction: str, turns: list[dict], temperature: float) -> str:
+        return await self.generate_async(_flatten_conversation(system_instruction, turns), temperature)
+
+    async def chat_stream_async(self, system_instruction: str, turns: list[dict], temperature: float) -> AsyncIterator[str]:
+        prompt = _flatten_conversation(system_instruction, turns)
+        words = self._reply(prompt).split(' ')
+        async for chunk in timed_aiter('llm', self._stream_words_async(words)):
+            yield chunk
+        record_llm_tokens(len(prompt.split()), len(words))
+
+    async def _stream_words_async(self, words: list[str]) -> AsyncIterator[str]:
+        await self._start_call_async()
+        for word in words:
+            await self._emit_delay_async(1)
+            yield word + ' '
+
+    def _start_call(self):
+        """Simulate time to first token and injected failures"""
+        fail = self._should_fail()
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if fail:
+            raise RuntimeError("Stub LLM backend injected failure")
+
+    async def _start_call_async(self):
+        fail = self._should_fail()
+
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if fail:
+            raise RuntimeError("Stub LLM backend injected failure")
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def _emit_delay(self, tokens: int):
+        if self.tokens_per_second:
+            time.sleep(tokens / self.tokens_per_second)
+
+    async def _emit_delay_async(self, tokens: int):
+        if self.tokens_per_second:
+            await asyncio.sleep(tokens / self.tokens_per_second)
+
+    def _reply(self, prompt: str) -> str:
+        return self.REPLIES[_prompt_hash(prompt) % len(self.REPLIES)]
+
+    def _scenario_json(self, prompt: str) -> str:
+        """Build a schema-valid Architect scenario from the dataset/student in the prompt"""
+        dataset_name = _prompt_field(prompt, 'Dataset Name', 'the hospital dataset')
+        columns = _prompt_field(prompt, 'Columns', 'the provided columns')
+        student_name = _prompt_field(prompt, 'Name', 'Student')
+        suffix = _prompt_hash(prompt) % 1000
+
+        return json.dumps({
+            'scenario_title': f"The {dataset_name} Puzzle #{suffix}",
+            'difficulty_level': ['Beginner', 'Intermediate', 'Advanced'][suffix % 3],
+            'stakeholder_name': 'Dr. Siti Rahmawati',
+            'stakeholder_role': 'Head of Clinical Operations',
+            'email_body': f"Hi {student_name}, something looks wrong in {dataset_name}. Can you take a look before Friday?",
+            'key_objectives': [
+                f"Assess missing values in {columns}",
+                "Identify the main trend behind the complaint",
+                "Summarize findings for non-technical staff"
+            ],
+            'persona_system_instruction': (
+                f"You are Dr. Siti Rahmawati, Head of Clinical Operations at RS Sehat. "
+                f"CONTEXT: You rely on {dataset_name} with columns {columns}. "
+                "YOUR BEHAVIOR: Friendly but busy, knows medicine but not data analysis. "
+                "RESTRICTIONS: Never write code. If asked, say \"I'm a doctor, not a programmer.\""
+            )
+        })
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_llm_backend() -> LLMBackend:
+    """
+    Get the configured LLM backend (lazy initialization)
+
+    Returns:
+        LLMBackend selected by LLM_BACKEND ('gemini' or 'stub')
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+def set_llm_backend(backend: LLMBackend):
+    """Install a specific backend instance (used by benchmarks to plug in local stand-ins)"""
+    global _backend
+    _backend = backend
+
+def _create_backend() -> LLMBackend:
+    if config.LLM_BACKEND == 'stub':
+        return StubBackend(
+            latency_ms=config.LLM_STUB_LATENCY_MS,
+            tokens_per_second=config.LLM_STUB_TOKENS_PER_SECOND,
+            failure_rate=config.LLM_STUB_FAILURE_RATE,
+            seed=config.LLM_STUB_SEED
+        )
+    if config.LLM_BACKEND == 'gemini':
+        return GeminiBackend(
+            api_key=config.GEMINI_API_KEY,
+            model_name=config.GEMINI_MODEL,
+            context_cache=config.GEMINI_CONTEXT_CACHE,
+            cache_ttl=config.GEMINI_CONTEXT_CACHE_TTL,
+            cache_min_tokens=config.GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+            cache_size=config.GEMINI_CONTEXT_CACHE_SIZE
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {config.LLM_BACKEND}")
+
+def _record_usage(response):
+    """Record token usage reported by a Gemini response, if present"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage:
+        record_llm_tokens(
+            usage.prompt_token_count,
+            usage.candidates_token_count,
+            getattr(usage, 'cached_content_token_count', 0)
+        )
+
+def _to_contents(turns: list[dict]) -> list[dict]:
+    """Convert chat turns to Gemini contents"""
+    return [{'role': turn['role'], 'parts': [turn['text']]} for turn in turns]
+
+def _flatten_conversation(system_instruction: str, turns: list[dict]) -> str:
+    """Render a conversation as a single prompt for backends without a chat API"""
+    lines = [system_instruction, '']
+    for turn in turns:
+        lines.append(f"{'User' if turn['role'] == 'user' else 'Model'}: {turn['text']}")
+    lines.append('Model:')
+    return '\n'.join(lines)
+
+def _persona_key(system_instruction: str) -> str:
+    # Full digest: a collision would serve one student another student's persona
+    return hashlib.sha256(system_instruction.encode('utf-8')).hexdigest()
+
+def _prompt_hash(prompt: str) -> int:
+    return int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+
+def _prompt_field(prompt: str, label: str, default: str) -> str:
+    match = re.search(rf'^- {label}: (.+)$', prompt, re.MULTILINE)
+    return match.group(1).strip() if match else default
@@ -1,16 +1,14 @@
-import google.generativeai as genai
 import json
+from typing import Optional
 from backend.config import get_config
 from backend.models.assignment import Scenario
+from backend.models.chat_message import ChatContext
+from backend.services.llm_backends import get_llm_backend
+from backend.utils.metrics import timed
+from backend.utils.tokens import truncate_to_tokens
 
 config = get_config()
 
-# Configure Gemini API
-genai.configure(api_key=config.GEMINI_API_KEY)
-
-# Initialize model
-model = genai.GenerativeModel('gemini-2.5-flash')
-
 def generate_scenario(student_nim: str, student_name: str, dataset: dict) -> Scenario:
     """
     STAGE 1: Architect LLM generates scenario + Actor system prompt (Meta-Prompt Architecture)
@@ -24,12 +22,182 @@ def generate_scenario(student_nim: str, student_name: str, dataset: dict) -> Sce
         Scenario object with persona_system_instruction for Actor LLM
     """
     
+    architect_prompt = _build_architect_prompt(student_nim, student_name, dataset)
+    
+    try:
+        response_text = get_llm_backend().generate(
+            architect_prompt,
+            temperature=0.7,
+            json_mode=True
+        )
+        
+        return _parse_scenario(response_text)
+        
+    except Exception as e:
+        print(f"Error generating scenario: {e}")
+        raise
+
+async def generate_scenario_async(student_nim: str, student_name: str, dataset: dict) -> Scenario:
+    """Async `generate_scenario` (ASGI app)"""
+    architect_prompt = _build_architect_prompt(student_nim, student_name, dataset)
+    
+    try:
+        response_text = await get_llm_backend().generate_async(
+            architect_prompt,
+            temperature=0.7,
+            json_mode=True
+        )
+        
+        return _parse_scenario(response_text)
+        
+    except Exception as e:
+        print(f"Error generating scenario: {e}")
+        raise
+
+def chat_with_stakeholder(scenario: Scenario, context: ChatContext, 
+                         new_message: str) -> str:
+    """
+    STAGE 2: Actor LLM uses the generated system prompt (Meta-Prompt Architecture)
+    
+    Args:
+        scenario: The scenario object with persona_system_instruction
+        context: Rolling summary and recent messages (from chat_service.get_chat_context)
+        new_message: The student's new message
+    
+    Returns:
+        AI response as the stakeholder
+    """
+    turns = _build_chat_turns(context, new_message)
+
+    try:
+        # The persona goes in as system_instruction, identical on every turn,
+        # so the provider can reuse (and cache) it as a prefix
+        response_text = get_llm_backend().chat(
+            scenario.persona_system_instruction,
+            turns,
+            temperature=0.8  # More natural conversation
+        )
+        
+        return response_text.strip()
+        
+    except Exception as e:
+        print(f"Error in chat: {e}")
+        raise
+
+def stream_chat_with_stakeholder(scenario: Scenario, context: ChatContext,
+                                 new_message: str):
+    """
+    STAGE 2 (streaming): same as chat_with_stakeholder, but yields the reply
+    as text chunks while the LLM produces them
+    
+    Args:
+        scenario: The scenario object with persona_system_instruction
+        context: Rolling summary and recent messages (from chat_service.get_chat_context)
+        new_message: The student's new message
+    
+    Yields:
+        Text chunks of the AI response as the stakeholder
+    """
+    turns = _build_chat_turns(context, new_message)
+
+    try:
+        yield from get_llm_backend().chat_stream(
+            scenario.persona_system_instruction,
+            turns,
+            temperature=0.8  # More natural conversation
+        )
+        
+    except Exception as e:
+        print(f"Error in streaming chat: {e}")
+        raise
+
+async def chat_with_stakeholder_async(scenario: Scenario, context: ChatContext,
+                                     new_message: str) -> str:
+    """Async `chat_with_stakeholder` (ASGI app)"""
+    turns = _build_chat_turns(context, new_message)
+
+    try:
+        response_text = await get_llm_backend().chat_async(
+            scenario.persona_system_instruction,
+            turns,
+            temperature=0.8  # More natural conversation
+        )
+        
+        return response_text.strip()
+        
+    except Exception as e:
+        print(f"Error in chat: {e}")
+        raise
+
+async def stream_chat_with_stakeholder_async(scenario: Scenario, context: ChatContext,
+                                             new_message: str):
+    """Async `stream_chat_with_stakeholder` (ASGI app)"""
+    turns = _build_chat_turns(context, new_message)
+
+    try:
+        async for chunk in get_llm_backend().chat_stream_async(
+            scenario.persona_system_instruction,
+            turns,
+            temperature=0.8  # More natural conversation
+        ):
+            yield chunk
+        
+    except Exception as e:
+        print(f"Error in streaming chat: {e}")
+        raise
+
+def summarize_conversation(scenario: Scenario, previous_summary: Optional[str],
+                           messages: list[dict]) -> str:
+    """
+    Fold older chat messages into the rolling conversation summary
+    
+    Args:
+        scenario: The scenario object (for the stakeholder's name and role)
+        previous_summary: Summary of everything before `messages`, if any
+        messages: Messages to fold in, oldest first
+    
+    Returns:
+        Updated summary text
+    """
+    prompt = _build_summary_prompt(scenario, previous_summary, messages)
+
+    try:
+        response_text = get_llm_backend().generate(
+            prompt,
+            temperature=0.2  # Faithful rather than creative
+        )
+        
+        return response_text.strip()
+        
+    except Exception as e:
+        print(f"Error summarizing conversation: {e}")
+        raise
+
+async def summarize_conversation_async(scenario: Scenario, previous_summary: Optional[str],
+                                       messages: list[dict]) -> str:
+    """Async `summarize_conversation` (ASGI app)"""
+    prompt = _build_summary_prompt(scenario, previous_summary, messages)
+
+    try:
+        response_text = await get_llm_backend().generate_async(
+            prompt,
+            temperature=0.2  # Faithful rather than creative
+        )
+        
+        return response_text.strip()
+        
+    except Exception as e:
+        print(f"Error summarizing conversation: {e}")
+        raise
+
+def _build_architect_prompt(student_nim: str, student_name: str, dataset: dict) -> str:
+    """Fill in the Architect prompt for a student and dataset"""
     # Prepare dataset information
     columns_str = ', '.join(dataset.get('columns_list', [])) if dataset.get('columns_list') else 'Not provided'
     sample_data_str = dataset.get('sample_data', 'No sample data provided')
     data_quality_notes = dataset.get('data_quality_notes', 'None specified')
     
-    architect_prompt = f"""SYSTEM PROMPT:
+    return f"""SYSTEM PROMPT:
 You are a Senior Hospital Administrator and Educational Designer.
 Your goal is to create a realistic, immersive Data Analytics assignment based on a provided dataset.
 
@@ -86,74 +254,70 @@ EDUCATIONAL GOALS:
 
 Generate the JSON now. Return ONLY valid JSON, no additional text."""
 
+def _parse_scenario(response_text: str) -> Scenario:
+    """Parse and validate the Architect's JSON output"""
     try:
-        response = model.generate_content(
-            architect_prompt,
-            generation_config={
-                'temperature': 0.7,
-                'response_mime_type': 'application/json'
-            }
-        )
-        
-        # Parse JSON response
-        scenario_data = json.loads(response.text)
-        
-        # Validate and create Scenario object
-        scenario = Scenario(**scenario_data)
-        
-        return scenario
+        with timed('parse'):
+            # Parse JSON response
+            scenario_data = json.loads(response_text)
+            
+            # Validate and create Scenario object
+            return Scenario(**scenario_data)
         
     except json.JSONDecodeError as e:
         print(f"JSON decode error: {e}")
-        print(f"Response text: {response.text}")
+        print(f"Response text: {response_text}")
         raise ValueError("Failed to generate valid scenario JSON from Architect LLM")
-    except Exception as e:
-        print(f"Error generating scenario: {e}")
-        raise
 
-def chat_with_stakeholder(scenario: Scenario, chat_history: list[dict], 
-                         new_message: str) -> str:
-    """
-    STAGE 2: Actor LLM uses the generated system prompt (Meta-Prompt Architecture)
+def _build_summary_prompt(scenario: Scenario, previous_summary: Optional[str], messages: list[dict]) -> str:
+    """Fill in the summarization prompt"""
+    summary_words = config.CHAT_SUMMARY_MAX_TOKENS * 3 // 4
     
-    Args:
-        scenario: The scenario object with persona_system_instruction
-        chat_history: List of previous messages [{"sender": "student|ai", "content": "..."}]
-        new_message: The student's new message
+    return f"""You maintain a running summary of a roleplay conversation between a data analytics student and {scenario.stakeholder_name} ({scenario.stakeholder_role}).
+The summary replaces the original messages as context for continuing the conversation.
+
+Write an updated summary of at most {summary_words} words covering:
+- What the student asked and what {scenario.stakeholder_name} answered
+- Facts, findings, column names and numbers mentioned (keep them exact)
+- Agreements, requests and open questions
+
+PREVIOUS SUMMARY:
+{previous_summary or 'None yet.'}
+
+NEW MESSAGES:
+{_format_history(scenario, messages)}
+
+Updated summary:"""
+
+def _build_chat_turns(context: ChatContext, new_message: str) -> list[dict]:
+    """Turn the conversation summary, recent chat history and the new message into user/model turns"""
+    turns = []
     
-    Returns:
-        AI response as the stakeholder
-    """
+    if context.summary:
+        turns.append({'role': 'user', 'text': f"(Summary of our earlier conversation: {context.summary})"})
+    elif context.recent and context.recent[0]['sender'] == 'ai':
+        # Conversations must open with a user turn
+        turns.append({'role': 'user', 'text': "(Earlier messages omitted.)"})
     
-    # Use the GENERATED system prompt from the Architect
-    system_prompt = scenario.persona_system_instruction
+    for msg in context.recent:
+        _append_turn(turns, 'user' if msg['sender'] == 'student' else 'model', msg['content'])
     
-    # Format chat history for context
-    history_text = ""
-    for msg in chat_history[-20:]:  # Last 20 messages to stay within token limits
-        sender_label = "Student" if msg['sender'] == 'student' else scenario.stakeholder_name
-        history_text += f"{sender_label}: {msg['content']}\n"
+    # Long pastes are cut down so a single message can't blow up the prompt
+    _append_turn(turns, 'user', truncate_to_tokens(new_message, config.CHAT_MESSAGE_MAX_TOKENS))
     
-    # Combine system prompt with chat history and new message
-    full_prompt = f"""{system_prompt}
+    return turns
 
-CHAT HISTORY:
-{history_text}
+def _append_turn(turns: list[dict], role: str, text: str):
+    """Add a turn, merging it into the previous one if the role repeats (roles must alternate)"""
+    if turns and turns[-1]['role'] == role:
+        turns[-1]['text'] += f"\n\n{text}"
+    else:
+        turns.append({'role': role, 'text': text})
 
-Student's new message: {new_message}
-
-Respond as {scenario.stakeholder_name}:"""
-
-    try:
-        response = model.generate_content(
-            full_prompt,
-            generation_config={
-                'temperature': 0.8,  # More natural conversation
-            }
-        )
-        
-        return response.text.strip()
-        
-    except Exception as e:
-        print(f"Error in chat: {e}")
-        raise
+def _format_history(scenario: Scenario, messages: list[dict]) -> str:
+    """Format messages as "Sender: content" lines"""
+    history_text = ""
+    for msg in messages:
+        sender_label = "Student" if msg['sender'] == 'student' else scenario.stakeholder_name
+        history_text += f"{sender_label}: {msg['content']}\n"
+    return history_text
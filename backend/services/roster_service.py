@@ -0,0 +1,169 @@
+"""
+Student roster import.
+
+Rows are read one at a time from the uploaded CSV or XLSX file, validated,
+and upserted in chunks of ROSTER_IMPORT_CHUNK_SIZE, so memory use does not
+grow with the size of the roster.
+"""
+import codecs
+import csv
+from typing import IO, Iterator, Optional
+from pydantic import ValidationError
+from backend.config import get_config
+from backend.utils.db import get_supabase_admin
+from backend.utils.validators import NIMValidator
+
+config = get_config()
+
+NAME_MAX_LENGTH = 255  # students.name VARCHAR(255)
+
+def import_roster(stream: IO[bytes], filename: str = '') -> dict:
+    """
+    Import a roster file, one row per student
+
+    The first row may be a header naming the `nim` and `name` columns (in any
+    order, other columns are ignored); otherwise the first two columns are
+    NIM and name, as in the lecturer dashboard's text format.
+
+    Args:
+        stream: Binary file object. XLSX files must be seekable
+        filename: Original file name, used to tell XLSX from CSV
+
+    Returns:
+        Summary dict: rows, imported, failed, and up to ROSTER_IMPORT_MAX_ERRORS
+        per-row errors ({'row', 'nim', 'error'}) plus errors_truncated
+
+    Raises:
+        ValueError: If the file can't be read as CSV/XLSX. A read error after
+            the first row is reported as a row error instead, since earlier
+            rows may already be saved
+    """
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        rows = _iter_xlsx_rows(stream)
+    else:
+        rows = _iter_csv_rows(stream)
+
+    return upsert_students(_parse_rows(rows))
+
+def upsert_students(students: Iterator[tuple[int, Optional[dict], Optional[str]]]) -> dict:
+    """
+    Upsert students in chunks of ROSTER_IMPORT_CHUNK_SIZE
+
+    Args:
+        students: (row number, {'nim', 'name'} or None, error or None) per input row
+
+    Returns:
+        Import summary (see import_roster)
+    """
+    summary = {'rows': 0, 'imported': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+
+    # nim -> (row, student); a later row for the same NIM replaces an earlier one,
+    # since Postgres rejects an upsert that touches the same row twice
+    chunk = {}
+
+    for row, student, error in students:
+        summary['rows'] += 1
+        if error:
+            _add_error(summary, row, student['nim'] if student else None, error)
+            continue
+
+        chunk[student['nim']] = (row, student)
+        if len(chunk) >= config.ROSTER_IMPORT_CHUNK_SIZE:
+            _flush(chunk, summary)
+            chunk = {}
+
+    if chunk:
+        _flush(chunk, summary)
+
+    return summary
+
+def _flush(chunk: dict, summary: dict):
+    supabase = get_supabase_admin()
+    try:
+        supabase.table('students').upsert(
+            [student for _, student in chunk.values()],
+            returning='minimal'
+        ).execute()
+        summary['imported'] += len(chunk)
+    except Exception as e:
+        print(f"Error upserting roster chunk: {e}")
+        for row, student in chunk.values():
+            _add_error(summary, row, student['nim'], 'Could not be saved')
+
+def _add_error(summary: dict, row: int, nim: Optional[str], error: str):
+    summary['failed'] += 1
+    if len(summary['errors']) < config.ROSTER_IMPORT_MAX_ERRORS:
+        summary['errors'].append({'row': row, 'nim': nim, 'error': error})
+    else:
+        summary['errors_truncated'] = True
+
+def _parse_rows(rows: Iterator[list]) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    """Validate raw rows, yielding (row number, student, error); blank rows are skipped"""
+    nim_column, name_column = 0, 1
+    rows = iter(rows)
+    row_number = 0
+
+    while True:
+        try:
+            values = next(rows)
+        except StopIteration:
+            return
+        except ValueError as e:
+            # Earlier chunks may already be upserted: report the unreadable rest of
+            # the file as a failed row so the caller still gets the summary
+            if row_number == 0:
+                raise
+            yield row_number + 1, None, str(e)
+            return
+
+        row_number += 1
+        values = ['' if value is None else str(value).strip() for value in values]
+        if not any(values):
+            continue
+
+        if row_number == 1:
+            header = [value.lower() for value in values]
+            if 'nim' in header:
+                if 'name' not in header:
+                    raise ValueError("Header row has a 'nim' column but no 'name' column")
+                nim_column, name_column = header.index('nim'), header.index('name')
+                continue
+
+        nim = values[nim_column] if nim_column < len(values) else ''
+        name = values[name_column] if name_column < len(values) else ''
+
+        try:
+            nim = NIMValidator(nim=nim).nim
+        except ValidationError as e:
+            yield row_number, None, e.errors()[0]['msg'].removeprefix('Value error, ')
+            continue
+
+        if not name:
+            yield row_number, {'nim': nim}, 'Name cannot be empty'
+        elif len(name) > NAME_MAX_LENGTH:
+            yield row_number, {'nim': nim}, f'Name too long (max {NAME_MAX_LENGTH} characters)'
+        else:
+            yield row_number, {'nim': nim, 'name': name}, None
+
+def _iter_csv_rows(stream: IO[bytes]) -> Iterator[list]:
+    # utf-8-sig strips the BOM spreadsheet programs put in exported CSVs
+    text = codecs.iterdecode(stream, 'utf-8-sig')
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f"Could not read CSV file: {e}")
+
+def _iter_xlsx_rows(stream: IO[bytes]) -> Iterator[list]:
+    # Imported lazily: only needed for spreadsheet uploads
+    from openpyxl import load_workbook
+
+    try:
+        # Read-only mode streams rows from the archive instead of loading the workbook
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"Could not read XLSX file: {e}")
+
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
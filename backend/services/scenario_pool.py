@@ -0,0 +1,320 @@
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+from backend.config import get_config
+from backend.utils.db import get_supabase_admin, is_unique_violation
+from backend.services.llm_service import generate_scenario
+from backend.services.dataset_service import get_dataset, get_dataset_catalog
+from backend.models.assignment import Scenario
+
+config = get_config()
+
+# Pooled scenarios are generated for a placeholder student; the placeholders
+# are swapped for the real student's details when a scenario is claimed.
+STUDENT_NIM_PLACEHOLDER = '{{student_nim}}'
+STUDENT_NAME_PLACEHOLDER = '{{student_name}}'
+
+# How many of the oldest pooled rows to try before giving up on a claim
+CLAIM_CANDIDATES = 5
+
+# Name of the `scenario_pool_leases` row held by the worker that replenishes
+REPLENISH_LEASE = 'replenish'
+
+_stats = {
+    'claimed': 0,
+    'missed': 0,
+    'generated': 0,
+    'generation_failures': 0,
+    'last_replenish_at': None
+}
+_stats_lock = threading.Lock()
+_replenish_lock = threading.Lock()
+_wake_event = threading.Event()
+_replenisher_thread = None
+
+def claim_pooled_scenario(dataset_id: str, student: dict) -> Optional[Scenario]:
+    """
+    Claim a pre-generated scenario for a dataset and personalize it for a student
+
+    Args:
+        dataset_id: Dataset UUID
+        student: Student dict with nim and name
+
+    Returns:
+        Personalized Scenario, or None if the pool is disabled or empty
+    """
+    if config.SCENARIO_POOL_DEPTH <= 0:
+        return None
+
+    supabase = get_supabase_admin()
+
+    try:
+        candidates = supabase.table('scenario_pool').select('id').eq('dataset_id', dataset_id).order('created_at').limit(CLAIM_CANDIDATES).execute()
+
+        for candidate in candidates.data:
+            # DELETE ... RETURNING is the claim: only one worker gets the row back
+            claimed = supabase.table('scenario_pool').delete().eq('id', candidate['id']).execute()
+            if claimed.data:
+                scenario = Scenario(**claimed.data[0]['scenario_json'])
+                if not has_student_placeholder(scenario):
+                    # Pooled before inserts were checked; never show its name to this student
+                    continue
+                _record('claimed')
+                return personalize_scenario(scenario, student)
+    except Exception as e:
+        print(f"Error claiming pooled scenario: {e}")
+        return None
+
+    # Pool ran dry for this dataset, ask the replenisher to top it up now
+    _record('missed')
+    _wake_event.set()
+    return None
+
+def personalize_scenario(scenario: Scenario, student: dict) -> Scenario:
+    """
+    Fill the student placeholders of a pooled scenario with real student details
+
+    Args:
+        scenario: Scenario generated for the placeholder student
+        student: Student dict with nim and name
+
+    Returns:
+        Personalized Scenario
+    """
+    def fill(text: str) -> str:
+        return text.replace(STUDENT_NIM_PLACEHOLDER, student['nim']).replace(STUDENT_NAME_PLACEHOLDER, student['name'])
+
+    scenario_data = {
+        field: [fill(item) for item in value] if isinstance(value, list) else fill(value)
+        for field, value in scenario.model_dump().items()
+    }
+
+    return Scenario(**scenario_data)
+
+def replenish_pool() -> dict:
+    """
+    Top up every dataset's pool to SCENARIO_POOL_DEPTH pre-generated scenarios
+
+    Only the worker holding the replenish lease (a row in
+    `scenario_pool_leases`) generates, so N workers don't each top up the
+    pool. The pool is recounted before every insert in case a lease
+    takeover let another worker add rows in the meantime.
+
+    Returns:
+        Dict of dataset_id -> number of scenarios added in this pass
+    """
+    added = {}
+
+    if config.SCENARIO_POOL_DEPTH <= 0:
+        return added
+
+    # One pass at a time per process; other callers just skip
+    if not _replenish_lock.acquire(blocking=False):
+        return added
+
+    try:
+        holder = _acquire_replenish_lease()
+        if holder is None:
+            # Another worker is replenishing
+            return added
+
+        try:
+            _replenish_datasets(holder, added)
+        finally:
+            _release_replenish_lease(holder)
+
+        with _stats_lock:
+            _stats['last_replenish_at'] = datetime.utcnow().isoformat()
+    finally:
+        _replenish_lock.release()
+
+    return added
+
+def _replenish_datasets(holder: str, added: dict):
+    """
+    Generate missing scenarios for every dataset while the lease is held
+
+    Args:
+        holder: Lease holder token of this pass
+        added: Dict of dataset_id -> scenarios added, updated in place
+    """
+    supabase = get_supabase_admin()
+
+    pool_counts = _get_pool_counts()
+
+    for catalog_entry in get_dataset_catalog():
+        if pool_counts.get(catalog_entry['id'], 0) >= config.SCENARIO_POOL_DEPTH:
+            continue
+
+        # Only datasets that need topping up are loaded in full
+        dataset = get_dataset(catalog_entry['id'])
+
+        while _get_pool_count(dataset['id']) < config.SCENARIO_POOL_DEPTH:
+            # Extend the lease before each paid Architect call; stop if it was taken over
+            if not _renew_replenish_lease(holder):
+                return
+
+            try:
+                scenario = generate_scenario(
+                    student_nim=STUDENT_NIM_PLACEHOLDER,
+                    student_name=STUDENT_NAME_PLACEHOLDER,
+                    dataset=dataset
+                )
+                if not has_student_placeholder(scenario):
+                    raise ValueError("Generated scenario does not address the student placeholder")
+
+                # Generation takes seconds, the pool may have been filled meanwhile
+                if _get_pool_count(dataset['id']) >= config.SCENARIO_POOL_DEPTH:
+                    break
+
+                supabase.table('scenario_pool').insert({
+                    'dataset_id': dataset['id'],
+                    'scenario_json': scenario.model_dump()
+                }).execute()
+            except Exception as e:
+                # Give up on this dataset for now, the next pass retries
+                print(f"Error pre-generating scenario for dataset {dataset['id']}: {e}")
+                _record('generation_failures')
+                break
+
+            _record('generated')
+            added[dataset['id']] = added.get(dataset['id'], 0) + 1
+
+def has_student_placeholder(scenario: Scenario) -> bool:
+    """
+    Check that a scenario generated for the placeholder student addresses the
+    student through the placeholder
+
+    The email is written to the student by name. If the LLM replaced the name
+    placeholder with some other name, the scenario can't be personalized and
+    would show that name to whoever claims it. The NIM placeholder is filled
+    in wherever it appears, but the Architect prompt doesn't require it.
+
+    Args:
+        scenario: Scenario generated for the placeholder student
+
+    Returns:
+        True if the name placeholder appears in the scenario
+    """
+    text = '\n'.join(
+        '\n'.join(value) if isinstance(value, list) else value
+        for value in scenario.model_dump().values()
+    )
+
+    return STUDENT_NAME_PLACEHOLDER in text
+
+def get_pool_status() -> dict:
+    """
+    Get warm pool depth per dataset and claim/generation counters
+
+    Returns:
+        Pool status dict
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+
+    return {
+        'enabled': config.SCENARIO_POOL_DEPTH > 0,
+        'target_depth': config.SCENARIO_POOL_DEPTH,
+        'datasets': _get_pool_counts() if config.SCENARIO_POOL_DEPTH > 0 else {},
+        'replenisher_running': _replenisher_thread is not None and _replenisher_thread.is_alive(),
+        'stats': stats
+    }
+
+def start_pool_replenisher():
+    """Start the background thread that keeps the pool topped up (idempotent)"""
+    global _replenisher_thread
+
+    if config.SCENARIO_POOL_DEPTH <= 0:
+        return
+    if _replenisher_thread is not None and _replenisher_thread.is_alive():
+        return
+
+    _replenisher_thread = threading.Thread(
+        target=_replenish_loop,
+        name='scenario-pool-replenisher',
+        daemon=True
+    )
+    _replenisher_thread.start()
+
+def _replenish_loop():
+    """Replenish on a fixed interval, or sooner when a claim finds the pool empty"""
+    while True:
+        try:
+            replenish_pool()
+        except Exception as e:
+            print(f"Error replenishing scenario pool: {e}")
+
+        _wake_event.wait(config.SCENARIO_POOL_REFILL_INTERVAL)
+        _wake_event.clear()
+
+def _acquire_replenish_lease() -> Optional[str]:
+    """
+    Try to take the cross-worker replenish lease
+
+    Leases not renewed for SCENARIO_POOL_LEASE_TTL are considered abandoned
+    (crashed worker) and are taken over.
+
+    Returns:
+        Holder token of the new lease, or None if another worker holds it
+    """
+    supabase = get_supabase_admin()
+
+    stale_before = datetime.utcnow() - timedelta(seconds=config.SCENARIO_POOL_LEASE_TTL)
+    supabase.table('scenario_pool_leases').delete().eq('name', REPLENISH_LEASE).lt('leased_at', stale_before.isoformat()).execute()
+
+    holder = uuid.uuid4().hex
+    try:
+        supabase.table('scenario_pool_leases').insert({
+            'name': REPLENISH_LEASE,
+            'holder': holder,
+            'leased_at': datetime.utcnow().isoformat()
+        }).execute()
+    except Exception as e:
+        if is_unique_violation(e):
+            return None
+        raise
+
+    return holder
+
+def _renew_replenish_lease(holder: str) -> bool:
+    """Extend the replenish lease, False if it is no longer ours"""
+    supabase = get_supabase_admin()
+
+    result = supabase.table('scenario_pool_leases').update({
+        'leased_at': datetime.utcnow().isoformat()
+    }).eq('name', REPLENISH_LEASE).eq('holder', holder).execute()
+
+    return bool(result.data)
+
+def _release_replenish_lease(holder: str):
+    """Release the replenish lease if this pass still holds it"""
+    supabase = get_supabase_admin()
+
+    try:
+        supabase.table('scenario_pool_leases').delete().eq('name', REPLENISH_LEASE).eq('holder', holder).execute()
+    except Exception as e:
+        # Worst case the lease expires after SCENARIO_POOL_LEASE_TTL
+        print(f"Error releasing scenario pool lease: {e}")
+
+def _get_pool_count(dataset_id: str) -> int:
+    """Count pooled scenarios of one dataset"""
+    supabase = get_supabase_admin()
+
+    result = supabase.table('scenario_pool').select('id', count='exact').eq('dataset_id', dataset_id).limit(1).execute()
+
+    return result.count or 0
+
+def _get_pool_counts() -> dict:
+    """Count pooled scenarios per dataset"""
+    supabase = get_supabase_admin()
+
+    result = supabase.table('scenario_pool').select('dataset_id').execute()
+
+    return dict(Counter(row['dataset_id'] for row in result.data))
+
+def _record(counter: str):
+    with _stats_lock:
+        _stats[counter] += 1
@@ -0,0 +1,38 @@
+from backend.config import get_config
+from backend.utils.db import get_supabase_admin
+
+config = get_config()
+
+QUERY_MAX_LENGTH = 100
+
+def search_students(query: str, limit: int) -> list[dict]:
+    """
+    Search students by NIM and name together, best matches first
+
+    Runs the `search_students` database function (docs/db_schema.sql), which
+    matches substrings of either column and misspelled names using trigram
+    indexes, and ranks exact and prefix NIM matches highest.
+
+    Args:
+        query: Search text (part of a NIM or name)
+        limit: Maximum number of results
+
+    Returns:
+        List of student dicts (nim, name, created_at, rank)
+
+    Raises:
+        ValueError: If the query is empty or too long
+    """
+    query = query.strip()
+    if not query:
+        raise ValueError("Search query cannot be empty")
+    if len(query) > QUERY_MAX_LENGTH:
+        raise ValueError(f"Search query too long (max {QUERY_MAX_LENGTH} characters)")
+
+    supabase = get_supabase_admin()
+    result = supabase.rpc('search_students', {
+        'search_query': query,
+        'result_limit': limit
+    }).execute()
+
+    return result.data
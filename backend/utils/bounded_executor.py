@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when a BoundedExecutor already has as much work as it accepts"""
+
+class BoundedExecutor:
+    """
+    Thread pool with a limit on waiting work.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more wait
+    for a thread. Submitting beyond that fails fast with ExecutorBusyError
+    instead of growing the backlog, and every caller's wait, without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, thread_name_prefix: str = ''):
+        """
+        Args:
+            max_workers: Jobs run concurrently
+            max_queue: Jobs allowed to wait for a free thread
+            thread_name_prefix: Name prefix of the worker threads
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Schedule `fn(*args, **kwargs)`
+
+        Returns:
+            Future of the result
+
+        Raises:
+            ExecutorBusyError: If max_workers + max_queue jobs are already pending
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusyError("Too many pending jobs")
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._job_done(None)
+            raise
+        future.add_done_callback(self._job_done)
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on the pool and wait for its result (see submit)"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self) -> dict:
+        """Return pending (running + waiting) jobs and rejected submissions"""
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'max_pending': self.max_workers + self.max_queue,
+                'rejected_total': self.rejected
+            }
+
+    def _job_done(self, future):
+        with self._lock:
+            self._pending -= 1
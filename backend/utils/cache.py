@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with optional per-entry expiry.
+
+    Entries are evicted least-recently-used first once `maxsize` is reached,
+    and are treated as missing once their TTL has elapsed.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = None):
+        """
+        Args:
+            maxsize: Maximum number of entries kept (0 disables caching)
+            ttl: Default time-to-live in seconds (None = no expiry)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` if missing/expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry):
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl: float = None):
+        """Store `value` under `key`, evicting the oldest entries if full"""
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, key, fn) -> bool:
+        """
+        Apply `fn` to the cached value in place, keeping its expiry
+
+        Returns:
+            True if the key was cached and updated, False otherwise
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry):
+                return False
+            self._data[key] = (fn(entry[0]), entry[1])
+            self._data.move_to_end(key)
+            return True
+
+    def pop(self, key, default=None):
+        """Remove `key` from the cache and return its value"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    @staticmethod
+    def _expired(entry) -> bool:
+        expires_at = entry[1]
+        return expires_at is not None and time.monotonic() >= expires_at
@@ -1,28 +1,194 @@
-from supabase import create_client, Client
+"""
+Supabase client management.
+
+Each worker process lazily builds one client per key and shares it between
+its threads. The PostgREST session runs on a pooled HTTP transport whose
+size, keep-alive and timeouts come from config, and which keeps counters
+(requests, queueing for a free connection, connections opened) that are
+exported with the other metrics. Clients inherited over a fork (e.g.
+gunicorn --preload) are dropped in the child, so workers never share
+sockets.
+
+supabase, postgrest and httpx are imported when the first client is
+created rather than at startup: they are the largest part of the import
+time of the app, which serverless cold starts pay in full.
+"""
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 from backend.config import get_config
+from backend.utils.metrics import InstrumentedClient, registry
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Postgres error codes for unique and foreign key constraint violations
+UNIQUE_VIOLATION = '23505'
+FOREIGN_KEY_VIOLATION = '23503'
+
+# Parts of PostgREST timestamps that datetime.fromisoformat rejects before Python 3.11
+_FRACTION = re.compile(r'\.(\d+)')
+_SHORT_OFFSET = re.compile(r'(:\d{2}(?:\.\d+)?[+-]\d{2})$')
+
+class _ManagedClient:
+    """A lazily created Supabase client for this process"""
+
+    def __init__(self, key_setting: str):
+        self.key_setting = key_setting
+        self.client = None
+        self.transport = None
+        self.installed = False
+        self.lock = threading.Lock()
+
+    def get(self):
+        client = self.client
+        if client is not None:
+            return client
 
-# Lazy initialization to avoid errors on import
-_supabase_client = None
-_supabase_admin_client = None
+        with self.lock:
+            if self.client is None:
+                config = get_config()
+                raw_client, self.transport = _create_pooled_client(
+                    config.SUPABASE_URL,
+                    getattr(config, self.key_setting)
+                )
+                self.client = InstrumentedClient(raw_client)
+            return self.client
 
-def get_supabase_client() -> Client:
+    def install(self, client):
+        with self.lock:
+            self.client = InstrumentedClient(client)
+            self.transport = None
+            self.installed = True
+
+    def reset_after_fork(self):
+        # The parent may have held the lock mid-creation, and its pooled
+        # sockets must not be used (or closed) by the child
+        self.lock = threading.Lock()
+        if not self.installed:
+            self.client = None
+            self.transport = None
+
+_clients = {
+    'anon': _ManagedClient('SUPABASE_KEY'),
+    'admin': _ManagedClient('SUPABASE_SERVICE_KEY')
+}
+
+def get_supabase_client() -> 'Client':
     """Get standard Supabase client (lazy initialization)"""
-    global _supabase_client
-    if _supabase_client is None:
-        config = get_config()
-        _supabase_client = create_client(
-            config.SUPABASE_URL,
-            config.SUPABASE_KEY
-        )
-    return _supabase_client
+    return _clients['anon'].get()
 
-def get_supabase_admin() -> Client:
+def get_supabase_admin() -> 'Client':
     """Get admin Supabase client with service role key (lazy initialization)"""
-    global _supabase_admin_client
-    if _supabase_admin_client is None:
-        config = get_config()
-        _supabase_admin_client = create_client(
-            config.SUPABASE_URL,
-            config.SUPABASE_SERVICE_KEY
+    return _clients['admin'].get()
+
+def set_supabase_admin(client):
+    """Install a pre-built admin client (used by benchmarks to plug in local stand-ins)"""
+    _clients['admin'].install(client)
+
+def is_unique_violation(error: Exception) -> bool:
+    """Whether a query failed on a unique constraint (Postgres error 23505)"""
+    # Matched on the PostgREST error code instead of `except APIError`, so
+    # callers don't import postgrest
+    return getattr(error, 'code', None) == UNIQUE_VIOLATION
+
+def is_foreign_key_violation(error: Exception) -> bool:
+    """Whether a query failed on a foreign key constraint (Postgres error 23503)"""
+    return getattr(error, 'code', None) == FOREIGN_KEY_VIOLATION
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse a timestamp as PostgREST returns it
+
+    Args:
+        value: ISO 8601 timestamp; TIMESTAMP values without an offset are UTC
+
+    Returns:
+        Timezone-aware datetime
+
+    Raises:
+        ValueError: If the value isn't an ISO 8601 timestamp
+    """
+    # PostgREST trims trailing zeros of the fraction (e.g. '...:00.12345') and
+    # may send a '+00' offset; Python < 3.11 only parses 3 or 6 digit fractions
+    # and '+HH:MM' offsets
+    value = _FRACTION.sub(lambda match: '.' + match.group(1)[:6].ljust(6, '0'), value)
+    value = _SHORT_OFFSET.sub(r'\1:00', value.replace('Z', '+00:00'))
+
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def pool_stats() -> dict:
+    """
+    HTTP connection pool statistics of this process's Supabase clients
+
+    Returns:
+        Dict of client name ('anon', 'admin') -> stats, for clients created so far
+    """
+    return {
+        name: managed.transport.stats()
+        for name, managed in _clients.items()
+        if managed.transport is not None
+    }
+
+def _create_pooled_client(url: str, key: str) -> tuple:
+    """Create a Supabase client whose PostgREST session uses a configured, instrumented pool"""
+    import httpx
+    from postgrest.utils import SyncClient
+    from supabase import create_client
+    from backend.utils.http_pool import PoolTransport
+
+    config = get_config()
+    client = create_client(url, key)
+
+    transport = PoolTransport(
+        limits=httpx.Limits(
+            max_connections=config.SUPABASE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=config.SUPABASE_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=config.SUPABASE_KEEPALIVE_EXPIRY
         )
-    return _supabase_admin_client
+    )
+    timeout = httpx.Timeout(
+        config.SUPABASE_READ_TIMEOUT,
+        connect=config.SUPABASE_CONNECT_TIMEOUT,
+        pool=config.SUPABASE_POOL_TIMEOUT
+    )
+
+    # supabase-py doesn't expose pool settings; swap in an equivalent session
+    default_session = client.postgrest.session
+    client.postgrest.session = SyncClient(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=timeout,
+        transport=transport
+    )
+    default_session.close()
+
+    return client, transport
+
+def _collect_pool_metrics() -> list[tuple]:
+    stats = pool_stats()
+    return [
+        ('supabase_pool_connections', 'gauge', 'Open Supabase HTTP connections, by client and state',
+         [({'client': name, 'state': 'idle'}, s['connections_idle']) for name, s in stats.items()] +
+         [({'client': name, 'state': 'active'}, s['connections_open'] - s['connections_idle']) for name, s in stats.items()]),
+        ('supabase_pool_connections_opened_total', 'counter', 'Supabase HTTP connections opened (churn), by client',
+         [({'client': name}, s['connections_opened_total']) for name, s in stats.items()]),
+        ('supabase_http_requests_total', 'counter', 'Supabase HTTP requests, by client',
+         [({'client': name}, s['requests_total']) for name, s in stats.items()]),
+        ('supabase_http_requests_in_flight', 'gauge', 'Supabase HTTP requests in progress, by client',
+         [({'client': name}, s['requests_in_flight']) for name, s in stats.items()]),
+        ('supabase_http_requests_queued_total', 'counter', 'Supabase HTTP requests that waited for a free pooled connection, by client',
+         [({'client': name}, s['requests_queued_total']) for name, s in stats.items()])
+    ]
+
+def _reset_after_fork():
+    for managed in _clients.values():
+        managed.reset_after_fork()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+registry.add_collector(_collect_pool_metrics)
@@ -0,0 +1,124 @@
+"""
+Conditional GET and compression for JSON responses.
+
+GET responses carry a weak ETag and `Cache-Control: private, no-cache`, so
+the browser revalidates every poll with If-None-Match and gets an empty 304
+when nothing changed. Routes whose data has a cheap version (ids, creation
+timestamps, row counts) compute the ETag before building the body and skip
+serialization on a match (see `not_modified`); other JSON responses get an
+ETag hashed from the body. Bodies of RESPONSE_COMPRESSION_MIN_BYTES or more
+are sent brotli- or gzip-encoded, as the client accepts. Streamed responses
+(SSE, exports) are left alone.
+"""
+import gzip
+import hashlib
+import json
+from typing import Optional
+from flask import current_app, request
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header, parse_etags
+from backend.config import get_config
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without the Brotli package, responses are gzip-encoded only
+    brotli = None
+
+config = get_config()
+
+# Browsers may keep the response but must revalidate it before each use;
+# shared caches must not store it (responses are per user)
+CACHE_CONTROL = 'private, no-cache'
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/plain', 'text/html'}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Close to gzip's speed at a better ratio
+
+def weak_etag(*parts) -> str:
+    """
+    Build an ETag value from the values that version a response
+
+    Args:
+        parts: JSON-serializable values (ids, timestamps, counts); datetimes are stringified
+
+    Returns:
+        Opaque tag, used as a weak ETag
+    """
+    raw = json.dumps(parts, default=str, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches `etag` (weak comparison)"""
+    return bool(if_none_match) and parse_etags(if_none_match).contains_weak(etag)
+
+def not_modified(etag: str):
+    """
+    Answer a GET whose If-None-Match matches `etag` without building the body
+
+    Returns:
+        A 304 response if the client's copy is current, None otherwise
+    """
+    if not etag_matches(request.headers.get('If-None-Match'), etag):
+        return None
+
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> tuple[bytes, Optional[str]]:
+    """
+    Encode a body with the best coding the client accepts
+
+    Args:
+        body: Response body
+        accept_encoding: Accept-Encoding header value
+
+    Returns:
+        (body, content coding), or the body unchanged and None if compression
+        is disabled, the body is small, or no supported coding is accepted
+    """
+    if not config.RESPONSE_COMPRESSION or len(body) < config.RESPONSE_COMPRESSION_MIN_BYTES:
+        return body, None
+
+    codings = ['br', 'gzip'] if brotli else ['gzip']
+    coding = parse_accept_header(accept_encoding or '', Accept).best_match(codings)
+
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if coding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+    return body, None
+
+def init_app(app):
+    """
+    Add ETags, 304 handling and compression to non-streamed responses
+
+    Args:
+        app: Flask application
+    """
+    @app.after_request
+    def conditional_and_compressed(response):
+        if response.is_streamed or response.direct_passthrough:
+            return response
+
+        compressible = response.mimetype in COMPRESSIBLE_MIMETYPES or response.status_code == 304
+        if compressible:
+            # Also on 304s, which stand in for the (possibly encoded) 200
+            response.vary.add('Accept-Encoding')
+
+        if request.method in ('GET', 'HEAD') and response.status_code == 200 and response.mimetype == 'application/json':
+            if 'ETag' not in response.headers:
+                response.add_etag(weak=True)
+            response.headers.setdefault('Cache-Control', CACHE_CONTROL)
+            response.make_conditional(request)
+
+        if compressible and response.status_code == 200 and 'Content-Encoding' not in response.headers:
+            body, coding = compress(response.get_data(), request.headers.get('Accept-Encoding'))
+            if coding:
+                response.set_data(body)
+                response.headers['Content-Encoding'] = coding
+
+        return response
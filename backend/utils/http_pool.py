@@ -0,0 +1,84 @@
+"""
+Pooled HTTP transport for the Supabase clients (see db.py).
+
+Imported only when the first client is created: httpx is part of the
+dependency tree kept out of cold starts.
+"""
+import threading
+import httpx
+
+class PoolTransport(httpx.HTTPTransport):
+    """HTTP transport with connection pool statistics"""
+
+    def __init__(self, limits: httpx.Limits, **kwargs):
+        super().__init__(limits=limits, **kwargs)
+        self.limits = limits
+        self._lock = threading.Lock()
+        self.requests_total = 0
+        self.requests_in_flight = 0
+        self.requests_in_flight_peak = 0
+        self.requests_queued = 0  # Started while every pooled connection was busy
+        self.connections_opened = 0
+
+        create_connection = self._pool.create_connection
+
+        def counted_create_connection(origin):
+            with self._lock:
+                self.connections_opened += 1
+            return create_connection(origin)
+
+        self._pool.create_connection = counted_create_connection
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.requests_total += 1
+            self.requests_in_flight += 1
+            self.requests_in_flight_peak = max(self.requests_in_flight_peak, self.requests_in_flight)
+            if self.requests_in_flight > self.limits.max_connections:
+                self.requests_queued += 1
+
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            self._request_done()
+            raise
+
+        # A request holds its connection until the body has been read
+        response.stream = _ClosingStream(response.stream, self._request_done)
+        return response
+
+    def stats(self) -> dict:
+        connections = self._pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        with self._lock:
+            return {
+                'max_connections': self.limits.max_connections,
+                'max_keepalive_connections': self.limits.max_keepalive_connections,
+                'connections_open': len(connections),
+                'connections_idle': idle,
+                'connections_opened_total': self.connections_opened,
+                'requests_total': self.requests_total,
+                'requests_in_flight': self.requests_in_flight,
+                'requests_in_flight_peak': self.requests_in_flight_peak,
+                'requests_queued_total': self.requests_queued
+            }
+
+    def _request_done(self):
+        with self._lock:
+            self.requests_in_flight -= 1
+
+class _ClosingStream(httpx.SyncByteStream):
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
@@ -0,0 +1,353 @@
+"""
+Per-request stage timing and aggregate metrics.
+
+Code wraps expensive work in `timed('<stage>')` (db, llm, parse, serialize).
+Inside a request the time is added to that request's breakdown, returned
+as a `Server-Timing` header, and folded into per-route histograms served in
+Prometheus text format at /api/metrics. Work outside a request (e.g. the
+scenario pool replenisher) is aggregated under the route "background".
+
+Metrics are kept in process memory, so each worker reports its own numbers.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+BACKGROUND_ROUTE = 'background'
+
+# Kept in the WSGI environ rather than flask.g, since streamed responses run
+# their generator in a fresh app context (and g) after the view returns
+_ENVIRON_KEY = 'backend.request_timings'
+
+# Requests served by the ASGI app (backend/asgi.py) have no Flask context; their
+# timings live in a context variable, which asyncio.to_thread carries into threads
+_async_timings: ContextVar = ContextVar('request_timings', default=None)
+
+class RequestTimings:
+    """Stage durations, DB query count and LLM tokens for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # stage -> seconds
+        self.db_queries = 0
+        self.llm_tokens = Counter()  # 'prompt'/'output'/'cached' -> tokens
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        if stage == 'db':
+            self.db_queries += 1
+
+    def server_timing(self, total: float) -> str:
+        """Format as a Server-Timing header value (milliseconds)"""
+        entries = []
+        for stage, seconds in self.stages.items():
+            entry = f'{stage};dur={seconds * 1000:.1f}'
+            if stage == 'db':
+                entry += f';desc="{self.db_queries} queries"'
+            entries.append(entry)
+
+        # Time not attributed to any stage: routing, auth, our own code
+        unattributed = max(total - sum(self.stages.values()), 0.0)
+        entries.append(f'app;dur={unattributed * 1000:.1f}')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+class _Histogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, upper in enumerate(DURATION_BUCKETS):
+            if value <= upper:
+                self.bucket_counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Thread-safe aggregate metrics for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = Counter()  # (route, method, status) -> count
+        self._durations = {}  # (route, method) -> _Histogram
+        self._stages = {}  # (route, stage) -> _Histogram
+        self._db_queries = Counter()  # route -> count
+        self._llm_tokens = Counter()  # (route, kind) -> tokens
+        self._collectors = []
+
+    def observe_request(self, route: str, method: str, status: int, duration: float, timings: RequestTimings):
+        with self._lock:
+            self._requests[(route, method, str(status))] += 1
+            self._durations.setdefault((route, method), _Histogram()).observe(duration)
+            for stage, seconds in timings.stages.items():
+                self._stages.setdefault((route, stage), _Histogram()).observe(seconds)
+            self._db_queries[route] += timings.db_queries
+            for kind, tokens in timings.llm_tokens.items():
+                self._llm_tokens[(route, kind)] += tokens
+
+    def observe_stage(self, route: str, stage: str, seconds: float):
+        with self._lock:
+            self._stages.setdefault((route, stage), _Histogram()).observe(seconds)
+            if stage == 'db':
+                self._db_queries[route] += 1
+
+    def add_llm_tokens(self, route: str, kind: str, tokens: int):
+        with self._lock:
+            self._llm_tokens[(route, kind)] += tokens
+
+    def add_collector(self, collect):
+        """
+        Add metrics owned by another module, read at render time
+
+        Args:
+            collect: Callable returning a list of (name, type, help, [(labels, value)])
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP http_requests_total Requests handled, by route, method and status',
+                '# TYPE http_requests_total counter'
+            ]
+            for (route, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+            lines += [
+                '# HELP http_request_duration_seconds Request handling time, by route and method',
+                '# TYPE http_request_duration_seconds histogram'
+            ]
+            for (route, method), histogram in sorted(self._durations.items()):
+                lines += _histogram_lines('http_request_duration_seconds', histogram, route=route, method=method)
+
+            lines += [
+                '# HELP request_stage_duration_seconds Time per request spent in each stage (db, llm, parse, serialize)',
+                '# TYPE request_stage_duration_seconds histogram'
+            ]
+            for (route, stage), histogram in sorted(self._stages.items()):
+                lines += _histogram_lines('request_stage_duration_seconds', histogram, route=route, stage=stage)
+
+            lines += [
+                '# HELP db_queries_total Supabase queries executed, by route',
+                '# TYPE db_queries_total counter'
+            ]
+            for route, count in sorted(self._db_queries.items()):
+                lines.append(f'db_queries_total{_labels(route=route)} {count}')
+
+            lines += [
+                '# HELP llm_tokens_total LLM tokens used, by route and kind (prompt/output/cached)',
+                '# TYPE llm_tokens_total counter'
+            ]
+            for (route, kind), tokens in sorted(self._llm_tokens.items()):
+                lines.append(f'llm_tokens_total{_labels(route=route, kind=kind)} {tokens}')
+
+        for collect in self._collectors:
+            for name, metric_type, help_text, samples in collect():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(**labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+@contextmanager
+def timed(stage: str):
+    """
+    Time a block of work and attribute it to `stage`
+
+    Args:
+        stage: Stage name, e.g. 'db', 'llm', 'parse', 'serialize'
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_stage(stage, time.perf_counter() - started)
+
+def timed_iter(stage: str, iterator: Iterator) -> Iterator:
+    """
+    Yield from `iterator`, attributing the time spent producing each item to `stage`
+
+    Time spent by the consumer between items is not counted.
+    """
+    iterator = iter(iterator)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            _record_stage(stage, time.perf_counter() - started)
+            return
+        _record_stage(stage, time.perf_counter() - started)
+        yield item
+
+async def timed_aiter(stage: str, aiterator: AsyncIterator) -> AsyncIterator:
+    """Async counterpart of `timed_iter`"""
+    aiterator = aiterator.__aiter__()
+    while True:
+        started = time.perf_counter()
+        try:
+            item = await aiterator.__anext__()
+        except StopAsyncIteration:
+            _record_stage(stage, time.perf_counter() - started)
+            return
+        _record_stage(stage, time.perf_counter() - started)
+        yield item
+
+def record_llm_tokens(prompt_tokens: int, output_tokens: int, cached_tokens: int = 0):
+    """
+    Attribute LLM token usage to the current request (or background work)
+
+    Args:
+        prompt_tokens: Input tokens of the call (including cached ones)
+        output_tokens: Generated tokens
+        cached_tokens: Input tokens served from a provider-side context cache
+    """
+    timings = _current_timings()
+    for kind, tokens in (('prompt', prompt_tokens), ('output', output_tokens), ('cached', cached_tokens)):
+        if not tokens:
+            continue
+        if timings is not None:
+            timings.llm_tokens[kind] += tokens
+        else:
+            registry.add_llm_tokens(BACKGROUND_ROUTE, kind, tokens)
+
+class InstrumentedClient:
+    """
+    Transparent proxy over a Supabase client (or any query builder it returns)
+    that times every `.execute()` as a 'db' stage.
+    """
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+
+        if name == 'execute':
+            def execute(*args, **kwargs):
+                with timed('db'):
+                    return attr(*args, **kwargs)
+            return execute
+
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            # Keep wrapping query builders so the eventual execute() is timed
+            return InstrumentedClient(result) if hasattr(result, 'execute') else result
+        return call
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that times response serialization"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not has_request_context():
+            return super().dumps(obj, **kwargs)
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+def init_app(app):
+    """
+    Install request timing hooks, the Server-Timing header and the timed JSON provider
+
+    Args:
+        app: Flask application
+    """
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_timing():
+        request.environ[_ENVIRON_KEY] = RequestTimings()
+
+    @app.after_request
+    def finish_request_timing(response):
+        timings = request.environ.get(_ENVIRON_KEY)
+        if timings is None:
+            return response
+
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+
+        def observe():
+            total = time.perf_counter() - timings.started
+            registry.observe_request(route, method, response.status_code, total, timings)
+            return total
+
+        if response.is_streamed:
+            # Headers go out before the body is generated, so the header only
+            # covers setup; the aggregates are recorded once the stream closes.
+            # Stages timed while streaming still land in `timings`.
+            response.headers['Server-Timing'] = timings.server_timing(time.perf_counter() - timings.started)
+            response.call_on_close(observe)
+        else:
+            response.headers['Server-Timing'] = timings.server_timing(observe())
+
+        return response
+
+def start_async_request() -> RequestTimings:
+    """Begin timing a request served outside Flask (ASGI views)"""
+    timings = RequestTimings()
+    _async_timings.set(timings)
+    return timings
+
+def finish_async_request(timings: RequestTimings, route: str, method: str, status: int) -> str:
+    """
+    Record a request served outside Flask in the aggregates
+
+    Args:
+        timings: Value returned by start_async_request()
+        route: Route rule, in Flask syntax so series match the sync app
+        method: HTTP method
+        status: Response status code
+
+    Returns:
+        Server-Timing header value
+    """
+    total = time.perf_counter() - timings.started
+    registry.observe_request(route, method, status, total, timings)
+    return timings.server_timing(total)
+
+def _current_timings():
+    if not has_request_context():
+        return _async_timings.get()
+    return request.environ.get(_ENVIRON_KEY)
+
+def _record_stage(stage: str, seconds: float):
+    timings = _current_timings()
+    if timings is not None:
+        timings.add(stage, seconds)
+    else:
+        registry.observe_stage(BACKGROUND_ROUTE, stage, seconds)
+
+def _histogram_lines(name: str, histogram: _Histogram, **labels) -> list[str]:
+    lines = []
+    cumulative = 0
+    for upper, count in zip(DURATION_BUCKETS, histogram.bucket_counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=str(upper))} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+    return lines
+
+def _labels(**labels) -> str:
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
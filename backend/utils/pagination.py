@@ -0,0 +1,48 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor carries the sort key of the last row of a page; the next page is
+the rows after it. Cursors aren't signed: a modified cursor can only move
+the starting point of a listing the caller may already read in full.
+"""
+import base64
+import binascii
+import json
+
+def encode_cursor(position: dict) -> str:
+    """
+    Encode a page position as an opaque, URL-safe cursor
+
+    Args:
+        position: Sort key values of the last row of the page, e.g. {'nim': '2024001'}
+
+    Returns:
+        Cursor string
+    """
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, keys: tuple) -> dict:
+    """
+    Decode a cursor made by encode_cursor
+
+    Args:
+        cursor: Cursor string from a previous response
+        keys: Sort keys the cursor must contain
+
+    Returns:
+        Position dict
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(position, dict) or any(not isinstance(position.get(key), str) for key in keys):
+        raise ValueError("Invalid cursor")
+
+    return position
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+class _Call:
+    """An in-flight call whose result is shared by every waiter"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block until it finishes and receive the same result (or
+    exception). Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run `fn()` once for all concurrent callers sharing `key`
+
+        Args:
+            key: Hashable key identifying the work
+            fn: Zero-argument callable doing the work
+
+        Returns:
+            The return value of the single `fn()` execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop.
+
+    The work runs as its own task, so a caller that is cancelled (client
+    disconnected) doesn't cancel it for the others still waiting.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        """
+        Await `fn()` once for all concurrent callers sharing `key`
+
+        Args:
+            key: Hashable key identifying the work
+            fn: Zero-argument callable returning a coroutine
+
+        Returns:
+            The result of the single `fn()` execution
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+        return await asyncio.shield(task)
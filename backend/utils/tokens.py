@@ -0,0 +1,41 @@
+import math
+
+# Gemini averages roughly 4 characters per token for English/Indonesian text.
+# Counting exactly would need a count_tokens API call per message.
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_MARKER = ' [...] '
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shorten a text to about `max_tokens`, keeping its beginning and end
+
+    Args:
+        text: Text to shorten
+        max_tokens: Token budget for the result
+
+    Returns:
+        The text unchanged if it fits, otherwise head + marker + tail
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    keep = max(max_chars - len(TRUNCATION_MARKER), 0)
+    head = keep * 2 // 3
+    tail = keep - head
+    return text[:head] + TRUNCATION_MARKER + (text[-tail:] if tail else '')
@@ -0,0 +1,85 @@
+"""
+Per-request overhead of JWT authentication (require_auth).
+
+Times token verification on its own and a minimal authenticated request
+through the Flask test client, with the verified-token cache disabled
+(every request decodes and HMAC-verifies the token, as before the cache)
+and enabled.
+
+Usage:
+    python -m benchmarks.bench_auth --requests 20000 --tokens 100
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.load_test import _configure_environment
+from benchmarks.local_supabase import LocalSupabase
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000, help='Verifications/requests per measurement')
+    parser.add_argument('--tokens', type=int, default=100, help='Distinct users (tokens) cycled through')
+    parser.add_argument('--repeat', type=int, default=5, help='Measurements per case; the median is reported')
+    args = parser.parse_args()
+
+    _configure_environment()
+
+    from backend.app import create_app
+    from backend.routes.auth import require_auth
+    from backend.services import auth_service
+    from backend.utils.db import set_supabase_admin
+
+    set_supabase_admin(LocalSupabase())
+
+    app = create_app()
+
+    @app.route('/bench/auth')
+    @require_auth()
+    def bench_auth():
+        return 'ok'
+
+    client = app.test_client()
+    tokens = [auth_service.generate_jwt_token(f'2024{i:06d}', 'student') for i in range(args.tokens)]
+    headers = [{'Authorization': f'Bearer {token}'} for token in tokens]
+
+    def verify():
+        for i in range(args.requests):
+            auth_service.verify_jwt_token(tokens[i % len(tokens)])
+
+    def request():
+        for i in range(args.requests):
+            response = client.get('/bench/auth', headers=headers[i % len(headers)])
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+    cache_size = auth_service._verified_tokens.maxsize
+    print(f"{'case':34} {'us/op':>10}")
+    for label, fn in [('verify_jwt_token', verify), ('GET with require_auth', request)]:
+        results = {}
+        for cached in (False, True):
+            auth_service._verified_tokens.maxsize = cache_size if cached else 0
+            auth_service._verified_tokens.clear()
+            fn()  # warm up (and fill the cache)
+            results[cached] = _measure(fn, args.requests, args.repeat)
+            print(f"{label + (' (cached)' if cached else ' (uncached)'):34} {results[cached]:>10.2f}")
+        print(f"{label + ' saving':34} {results[False] - results[True]:>10.2f}")
+
+    auth_service._verified_tokens.maxsize = cache_size
+
+def _measure(fn, operations: int, repeat: int) -> float:
+    """Median microseconds per operation over `repeat` runs"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) / operations * 1e6)
+    return statistics.median(samples)
+
+if __name__ == '__main__':
+    main()
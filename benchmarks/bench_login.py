@@ -0,0 +1,120 @@
+"""
+Latency that lecturer logins (bcrypt) add to other requests.
+
+Client threads send cheap authenticated requests (GET /api/datasets, served
+from the catalog cache) while other threads log lecturers in as fast as they
+can. Three runs are compared:
+
+    idle      - no logins
+    unbounded - every login hashes on its own thread at once, like hashing
+                inline on the request thread
+    bounded   - hashing on the PASSWORD_HASH_WORKERS/PASSWORD_HASH_QUEUE
+                executor (logins past the queue limit get 503)
+
+Usage:
+    python -m benchmarks.bench_login --login-threads 16 --seconds 5
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.load_test import LECTURER_PASSWORD, _configure_environment, _seed
+from benchmarks.local_supabase import LocalSupabase
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--login-threads', type=int, default=16, help='Threads logging lecturers in continuously')
+    parser.add_argument('--request-threads', type=int, default=4, help='Threads sending other requests')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+    args = parser.parse_args()
+
+    _configure_environment()
+
+    from backend.app import create_app
+    from backend.config import get_config
+    from backend.services import auth_service
+    from backend.utils.bounded_executor import BoundedExecutor
+    from backend.utils.db import set_supabase_admin
+
+    config = get_config()
+    db = LocalSupabase()
+    _seed(db, argparse.Namespace(students=1, lecturers=1, datasets=1))
+    set_supabase_admin(db)
+
+    client = create_app().test_client()
+    token = auth_service.generate_jwt_token('lecturer0@example.com', 'lecturer')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    bounded = auth_service._password_hashing
+    unbounded = BoundedExecutor(max_workers=args.login_threads, max_queue=0, thread_name_prefix='bcrypt-unbounded')
+
+    print(f"bcrypt cost {config.BCRYPT_ROUNDS}, {config.PASSWORD_HASH_WORKERS} hashing threads, queue {config.PASSWORD_HASH_QUEUE}")
+    print(f"{'run':10} {'other p50 ms':>13} {'other p99 ms':>13} {'other req/s':>12} {'logins/s':>9} {'503s':>6}")
+
+    for label, executor, login_threads in [
+        ('idle', bounded, 0),
+        ('unbounded', unbounded, args.login_threads),
+        ('bounded', bounded, args.login_threads)
+    ]:
+        auth_service._password_hashing = executor
+        result = _run(client, headers, args.request_threads, login_threads, args.seconds)
+        latencies = sorted(result['latencies'])
+        print(
+            f"{label:10} {statistics.median(latencies):>13.2f} "
+            f"{latencies[int(len(latencies) * 0.99)]:>13.2f} "
+            f"{len(latencies) / args.seconds:>12.0f} "
+            f"{result['logins'] / args.seconds:>9.1f} {result['rejected']:>6}"
+        )
+
+    auth_service._password_hashing = bounded
+
+def _run(client, headers: dict, request_threads: int, login_threads: int, seconds: float) -> dict:
+    stop = threading.Event()
+    lock = threading.Lock()
+    result = {'latencies': [], 'logins': 0, 'rejected': 0}
+
+    def send_requests():
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get('/api/datasets', headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        with lock:
+            result['latencies'] += latencies
+
+    def log_in():
+        while not stop.is_set():
+            response = client.post('/api/auth/lecturer/login', json={
+                'email': 'lecturer0@example.com',
+                'password': LECTURER_PASSWORD
+            })
+            with lock:
+                if response.status_code == 503:
+                    result['rejected'] += 1
+                else:
+                    assert response.status_code == 200, response.get_data(as_text=True)
+                    result['logins'] += 1
+            if response.status_code == 503:
+                time.sleep(float(response.headers.get('Retry-After', '1')) / 10)
+
+    threads = [threading.Thread(target=send_requests) for _ in range(request_threads)]
+    threads += [threading.Thread(target=log_in) for _ in range(login_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return result
+
+if __name__ == '__main__':
+    main()
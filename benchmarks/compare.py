@@ -0,0 +1,43 @@
+"""
+Compare two load_test.py result files endpoint by endpoint.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+import json
+import sys
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__.strip())
+        sys.exit(1)
+
+    with open(sys.argv[1]) as f:
+        baseline = json.load(f)
+    with open(sys.argv[2]) as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {baseline['meta'].get('commit')}  candidate: {candidate['meta'].get('commit')}")
+    print(f"{'endpoint':40} {'p50 ms':>20} {'p99 ms':>20} {'db trips/req':>16} {'errors':>10}")
+
+    for label in sorted(set(baseline['endpoints']) | set(candidate['endpoints'])):
+        before = baseline['endpoints'].get(label)
+        after = candidate['endpoints'].get(label)
+        if not before or not after:
+            print(f"{label:40} {'only in ' + ('candidate' if after else 'baseline'):>20}")
+            continue
+
+        print(
+            f"{label:40} "
+            f"{_delta(before['latency_ms']['p50'], after['latency_ms']['p50']):>20} "
+            f"{_delta(before['latency_ms']['p99'], after['latency_ms']['p99']):>20} "
+            f"{_delta(before['db_round_trips']['mean'], after['db_round_trips']['mean']):>16} "
+            f"{before['errors']:>4} -> {after['errors']:<3}"
+        )
+
+def _delta(before: float, after: float) -> str:
+    change = f"{(after - before) / before * 100:+.0f}%" if before else 'n/a'
+    return f"{before:g} -> {after:g} ({change})"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Import-time report for the serverless entry point (api/index.py).
+
+Imports api/index.py (which builds the app) in a fresh interpreter under
+`python -X importtime` and prints the slowest modules by cumulative time
+and the total per top-level package. Runs as a regression check: exits
+non-zero if a module that should only load on first use (LLM SDK, Supabase
+client stack, spreadsheet and ASGI libraries) is imported at startup, or
+if the import time exceeds --max-ms.
+
+Usage:
+    python -m benchmarks.importtime_report --top 25 --max-ms 1500
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+# Loaded on first use, never while the app starts
+DEFERRED_MODULES = [
+    'google.generativeai',
+    'supabase',
+    'postgrest',
+    'httpx',
+    'openpyxl',
+    'starlette'
+]
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--top', type=int, default=25, help='Slowest modules to list')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs; the fastest is reported (the first may hit a cold disk cache)')
+    parser.add_argument('--max-ms', type=float, default=None, help='Fail if startup imports take longer than this')
+    args = parser.parse_args()
+
+    runs = [_profile_imports() for _ in range(args.repeat)]
+    modules = min(runs, key=lambda run: sum(self_us for self_us, _, _ in run.values()))
+    total_ms = sum(self_us for self_us, _, _ in modules.values()) / 1000
+
+    print(f"Startup imports: {len(modules)} modules, {total_ms:.0f} ms")
+
+    print(f"\n{'cumulative ms':>14} {'self ms':>8}  module")
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us, depth) in slowest:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {'  ' * depth}{name}")
+
+    packages = defaultdict(int)
+    for name, (self_us, _, _) in modules.items():
+        packages[name.split('.')[0]] += self_us
+    print(f"\n{'self ms':>8}  package")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>8.1f}  {package}")
+
+    failures = [
+        f"{module} is imported at startup"
+        for module in DEFERRED_MODULES
+        if module in modules
+    ]
+    if args.max_ms is not None and total_ms > args.max_ms:
+        failures.append(f"startup imports took {total_ms:.0f} ms (budget {args.max_ms:.0f} ms)")
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+
+def _profile_imports() -> dict:
+    """Import api/index.py in a fresh interpreter; returns module -> (self us, cumulative us, depth)"""
+    env = dict(os.environ)
+    # Configured like production (Gemini backend), but nothing is contacted at startup
+    env.update({
+        'SUPABASE_URL': env.get('SUPABASE_URL', 'http://localhost:54321'),
+        'SUPABASE_KEY': env.get('SUPABASE_KEY', 'importtime-report'),
+        'SUPABASE_SERVICE_KEY': env.get('SUPABASE_SERVICE_KEY', 'importtime-report'),
+        'JWT_SECRET': env.get('JWT_SECRET', 'importtime-report'),
+        'GEMINI_API_KEY': env.get('GEMINI_API_KEY', 'importtime-report'),
+        'LLM_BACKEND': 'gemini',
+        'SCENARIO_POOL_BACKGROUND': 'False'
+    })
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import runpy; runpy.run_path("api/index.py")'],
+        cwd=project_root, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing api/index.py failed:\n{result.stderr}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return modules
+
+if __name__ == '__main__':
+    main()
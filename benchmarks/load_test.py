@@ -0,0 +1,358 @@
+"""
+End-to-end HTTP load test for the Flask app built by create_app().
+
+Runs scripted user flows for a cohort of N students and M lecturers against
+local stand-ins for Supabase (benchmarks/local_supabase.py) and Gemini (the
+stub LLM backend), with injectable latency for both:
+
+    1. login_storm      - every student and lecturer logs in at once
+    2. first_assignment - every student opens /api/assignments/me (JIT generation)
+    3. chat             - every student sends --chat-turns messages, syncing the history after each
+    4. dashboard        - every lecturer loads datasets, two pages of the grading list and a search
+
+Writes per-endpoint latency percentiles/histograms, DB round trips and LLM
+calls as JSON so runs can be compared across commits (see compare.py).
+
+Usage:
+    python -m benchmarks.load_test --students 100 --lecturers 5 --output results.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.local_supabase import LocalSupabase
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+LECTURER_PASSWORD = 'benchmark-password'
+
+class Recorder:
+    """Collects one sample per request, grouped by endpoint label"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, label: str, latency_ms: float, status: int, db_round_trips: int, llm_calls: int):
+        with self._lock:
+            self.samples.setdefault(label, []).append({
+                'latency_ms': latency_ms,
+                'status': status,
+                'db_round_trips': db_round_trips,
+                'llm_calls': llm_calls
+            })
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {label: _summarize(samples) for label, samples in sorted(self.samples.items())}
+
+class LoadTest:
+    """Drives the app in-process with one test client per request"""
+
+    def __init__(self, app, db: LocalSupabase, llm, args):
+        self.app = app
+        self.db = db
+        self.llm = llm
+        self.args = args
+        self.recorder = Recorder()
+        self.phases = {}
+        self.student_tokens = {}
+        self.lecturer_tokens = {}
+        self.assignment_ids = {}
+
+    def request(self, label: str, method: str, url: str, token: str = None, **kwargs):
+        """Issue one request and record latency, DB round trips and LLM calls"""
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        client = self.app.test_client()
+
+        db_before = self.db.thread_round_trips()
+        llm_before = self.llm.thread_calls()
+        start = time.perf_counter()
+
+        response = client.open(url, method=method, headers=headers, **kwargs)
+        body = response.get_json(silent=True)
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.recorder.add(
+            label,
+            latency_ms,
+            response.status_code,
+            self.db.thread_round_trips() - db_before,
+            self.llm.thread_calls() - llm_before
+        )
+        return response.status_code, body
+
+    def run_phase(self, name: str, tasks: list):
+        """Run callables concurrently and record wall time/throughput for the phase"""
+        requests_before = sum(len(s) for s in self.recorder.samples.values())
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            for future in [executor.submit(task) for task in tasks]:
+                future.result()
+
+        wall_time = time.perf_counter() - start
+        requests = sum(len(s) for s in self.recorder.samples.values()) - requests_before
+        self.phases[name] = {
+            'wall_time_s': round(wall_time, 3),
+            'requests': requests,
+            'throughput_rps': round(requests / wall_time, 2) if wall_time else None
+        }
+        print(f"  {name}: {requests} requests in {wall_time:.2f}s", file=sys.stderr)
+
+    def login_storm(self):
+        def student_login(nim):
+            def task():
+                status, body = self.request('POST /api/auth/student/login', 'POST', '/api/auth/student/login', json={'nim': nim})
+                if status == 200:
+                    self.student_tokens[nim] = body['token']
+            return task
+
+        def lecturer_login(email):
+            def task():
+                status, body = self.request('POST /api/auth/lecturer/login', 'POST', '/api/auth/lecturer/login',
+                                            json={'email': email, 'password': LECTURER_PASSWORD})
+                if status == 200:
+                    self.lecturer_tokens[email] = body['token']
+            return task
+
+        tasks = [student_login(nim) for nim in _student_nims(self.args)]
+        tasks += [lecturer_login(email) for email in _lecturer_emails(self.args)]
+        self.run_phase('login_storm', tasks)
+
+    def first_assignment(self):
+        def open_assignment(nim, token):
+            def task():
+                status, body = self.request('GET /api/assignments/me', 'GET', '/api/assignments/me', token)
+                if status == 200:
+                    self.assignment_ids[nim] = body['assignment']['id']
+            return task
+
+        self.run_phase('first_assignment', [open_assignment(nim, token) for nim, token in self.student_tokens.items()])
+
+    def chat(self):
+        def conversation(nim, assignment_id):
+            def task():
+                token = self.student_tokens[nim]
+                # Like the dashboard: load the newest page, then sync what each turn added
+                status, body = self.request('GET /api/chat/<id>/messages', 'GET', f'/api/chat/{assignment_id}/messages', token)
+                cursor = body.get('next_cursor') if status == 200 else None
+                for turn in range(self.args.chat_turns):
+                    self.request('POST /api/chat/<id>/message', 'POST', f'/api/chat/{assignment_id}/message', token,
+                                 json={'content': f'Question {turn}: which columns have missing values?'})
+                    path = f'/api/chat/{assignment_id}/messages' + (f'?after={cursor}' if cursor else '')
+                    status, body = self.request('GET /api/chat/<id>/messages', 'GET', path, token)
+                    if status == 200:
+                        cursor = body.get('next_cursor')
+            return task
+
+        self.run_phase('chat', [conversation(nim, aid) for nim, aid in self.assignment_ids.items()])
+
+    def dashboard(self):
+        def load_dashboard(token):
+            def task():
+                self.request('GET /api/datasets', 'GET', '/api/datasets', token)
+                status, body = self.request('GET /api/grading/students', 'GET', f'/api/grading/students?limit={self.args.page_size}&count=estimated', token)
+                if status == 200 and body.get('next_cursor'):
+                    self.request('GET /api/grading/students', 'GET',
+                                 f"/api/grading/students?limit={self.args.page_size}&cursor={body['next_cursor']}", token)
+                self.request('GET /api/grading/search/<query>', 'GET', '/api/grading/search/20240000', token)
+            return task
+
+        self.run_phase('dashboard', [load_dashboard(token) for token in self.lecturer_tokens.values()])
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test with local Supabase/Gemini stand-ins')
+    parser.add_argument('--students', type=int, default=50, help='Number of students in the cohort')
+    parser.add_argument('--lecturers', type=int, default=3, help='Number of lecturers')
+    parser.add_argument('--datasets', type=int, default=3, help='Number of datasets to seed')
+    parser.add_argument('--chat-turns', type=int, default=3, help='Chat messages sent per student')
+    parser.add_argument('--page-size', type=int, default=50, help='Grading list page size')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent simulated clients')
+    parser.add_argument('--db-latency-ms', type=float, default=20, help='Simulated Supabase round-trip time')
+    parser.add_argument('--db-jitter-ms', type=float, default=5, help='Random extra Supabase latency')
+    parser.add_argument('--llm-client', choices=['stub', 'local-gemini'], default='stub',
+                        help='stub: StubBackend; local-gemini: GeminiBackend with an in-memory Gemini client')
+    parser.add_argument('--llm-cache-min-tokens', type=int, default=1024,
+                        help='local-gemini: smallest persona accepted for context caching')
+    parser.add_argument('--llm-latency-ms', type=float, default=800, help='Stub LLM time to first token')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=0, help='Stub LLM output rate (0 = instant)')
+    parser.add_argument('--llm-failure-rate', type=float, default=0, help='Stub LLM injected failure probability')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for latency jitter and failure injection')
+    parser.add_argument('--output', help='Write JSON results to this file (default: stdout)')
+    args = parser.parse_args()
+
+    _configure_environment()
+
+    from backend.app import create_app
+    from backend.services.llm_backends import set_llm_backend
+    from backend.utils.db import set_supabase_admin
+
+    db = LocalSupabase(latency_ms=args.db_latency_ms, jitter_ms=args.db_jitter_ms, seed=args.seed)
+    llm = _build_llm_backend(args)
+    set_supabase_admin(db)
+    set_llm_backend(llm)
+    _seed(db, args)
+
+    # Keep stdout clean for the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        app = create_app()
+    load_test = LoadTest(app, db, llm, args)
+
+    print(f"Running load test: {args.students} students, {args.lecturers} lecturers", file=sys.stderr)
+    load_test.login_storm()
+    load_test.first_assignment()
+    load_test.chat()
+    load_test.dashboard()
+
+    results = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'config': vars(args)
+        },
+        'phases': load_test.phases,
+        'endpoints': load_test.recorder.summary(),
+        'db_round_trips_by_query': dict(sorted(db.round_trips.items()))
+    }
+    if args.llm_client == 'local-gemini':
+        results['llm_client'] = dict(llm.genai.stats)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+def _configure_environment():
+    """Settings that must be in place before the backend is imported"""
+    os.environ.setdefault('SUPABASE_URL', 'http://local-supabase')
+    os.environ.setdefault('SUPABASE_KEY', 'benchmark')
+    os.environ.setdefault('SUPABASE_SERVICE_KEY', 'benchmark')
+    os.environ.setdefault('JWT_SECRET', 'benchmark-secret')
+    os.environ['LLM_BACKEND'] = 'stub'
+    os.environ['SCENARIO_POOL_BACKGROUND'] = 'False'
+
+def _seed(db: LocalSupabase, args):
+    from backend.services.auth_service import hash_password
+
+    for i in range(args.datasets):
+        db.rows('datasets').append({
+            'id': f'00000000-0000-0000-0000-{i:012d}',
+            'name': f'Hospital Dataset {i}',
+            'url': f'https://example.com/dataset-{i}.csv',
+            'metadata_summary': 'Patient admissions with wait times',
+            'columns_list': ['patient_id', 'admission_date', 'department', 'wait_minutes'],
+            'sample_data': 'patient_id,admission_date,department,wait_minutes\n1,2024-01-01,Cardiology,45',
+            'data_quality_notes': 'wait_minutes has nulls; admission_date mixes formats',
+            'created_at': db._now()
+        })
+
+    for nim in _student_nims(args):
+        db.rows('students').append({'nim': nim, 'name': f'Student {nim}', 'created_at': db._now()})
+
+    password_hash = hash_password(LECTURER_PASSWORD)
+    for email in _lecturer_emails(args):
+        db.rows('users').append({'id': email, 'email': email, 'password_hash': password_hash, 'created_at': db._now()})
+
+def _student_nims(args) -> list:
+    return [f'2024{i:06d}' for i in range(args.students)]
+
+def _lecturer_emails(args) -> list:
+    return [f'lecturer{i}@example.com' for i in range(args.lecturers)]
+
+def _summarize(samples: list) -> dict:
+    latencies = sorted(sample['latency_ms'] for sample in samples)
+    histogram = {f'le_{bound}': 0 for bound in HISTOGRAM_BUCKETS_MS}
+    histogram['le_inf'] = 0
+    for latency in latencies:
+        bucket = next((f'le_{bound}' for bound in HISTOGRAM_BUCKETS_MS if latency <= bound), 'le_inf')
+        histogram[bucket] += 1
+
+    db_round_trips = [sample['db_round_trips'] for sample in samples]
+
+    return {
+        'count': len(samples),
+        'errors': sum(1 for sample in samples if sample['status'] >= 400),
+        'latency_ms': {
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'mean': round(sum(latencies) / len(latencies), 2),
+            'max': round(latencies[-1], 2)
+        },
+        'histogram_ms': histogram,
+        'db_round_trips': {
+            'mean': round(sum(db_round_trips) / len(db_round_trips), 2),
+            'max': max(db_round_trips),
+            'total': sum(db_round_trips)
+        },
+        'llm_calls': sum(sample['llm_calls'] for sample in samples)
+    }
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    """Nearest-rank percentile"""
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values) + 0.5)) - 1))
+    return round(sorted_values[index], 2)
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def _build_llm_backend(args):
+    """LLM backend that also counts calls per thread (imported after env setup)"""
+    from backend.services.llm_backends import GeminiBackend, StubBackend
+
+    if args.llm_client == 'local-gemini':
+        # The real Gemini code path (typed turns, persona context caching) against a local client
+        from benchmarks.local_genai import LocalGenAI
+
+        genai = LocalGenAI(latency_ms=args.llm_latency_ms, min_cache_tokens=args.llm_cache_min_tokens)
+        backend = GeminiBackend(
+            api_key='benchmark',
+            model_name='gemini-2.5-flash',
+            genai_module=genai,
+            cache_min_tokens=args.llm_cache_min_tokens
+        )
+        backend.thread_calls = genai.thread_calls
+        return backend
+
+    class CountingStubBackend(StubBackend):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._local = threading.local()
+
+        def thread_calls(self) -> int:
+            return getattr(self._local, 'calls', 0)
+
+        def _start_call(self):
+            self._local.calls = self.thread_calls() + 1
+            super()._start_call()
+
+    return CountingStubBackend(
+        latency_ms=args.llm_latency_ms,
+        tokens_per_second=args.llm_tokens_per_second,
+        failure_rate=args.llm_failure_rate,
+        seed=args.seed
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+In-memory stand-in for the google.generativeai module.
+
+Implements what GeminiBackend uses (configure, GenerativeModel with
+system_instruction, generate_content(_async) with typed contents and streaming,
+caching.CachedContent.create, GenerativeModel.from_cached_content) with
+deterministic replies, usage metadata and the provider's minimum cacheable
+size, so the real Gemini code path can be exercised offline.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from backend.services.llm_backends import StubBackend
+from backend.utils.tokens import estimate_tokens
+
+class LocalGenAI:
+    """Module-like object passed to GeminiBackend(genai_module=...)"""
+
+    def __init__(self, latency_ms: float = 0, min_cache_tokens: int = 1024):
+        """
+        Args:
+            latency_ms: Delay before every response
+            min_cache_tokens: Smallest CachedContent accepted (like the real API)
+        """
+        self.latency_ms = latency_ms
+        self.min_cache_tokens = min_cache_tokens
+        self.api_key = None
+        self.caches = {}
+        self.stats = Counter()  # calls, cache creations, prompt/cached tokens
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stub = StubBackend()
+
+        genai = self
+
+        class GenerativeModel(LocalGenerativeModel):
+            _genai = genai
+
+        class CachedContent:
+            @staticmethod
+            def create(model: str, system_instruction: str = None, contents=None, ttl: timedelta = None, **kwargs):
+                return genai._create_cache(model, system_instruction, ttl)
+
+        self.GenerativeModel = GenerativeModel
+        self.caching = SimpleNamespace(CachedContent=CachedContent)
+
+    def configure(self, api_key: str = None, **kwargs):
+        self.api_key = api_key
+
+    def thread_calls(self) -> int:
+        """Number of generate_content calls made by the calling thread"""
+        return getattr(self._local, 'calls', 0)
+
+    def _create_cache(self, model: str, system_instruction: str, ttl: timedelta):
+        tokens = estimate_tokens(system_instruction or '')
+        if tokens < self.min_cache_tokens:
+            raise ValueError(f"400 Cached content is too small. total_token_count={tokens}, min_total_token_count={self.min_cache_tokens}")
+
+        with self._lock:
+            name = f'cachedContents/{next(self._ids)}'
+            self.caches[name] = SimpleNamespace(
+                name=name,
+                model=model if '/' in model else f'models/{model}',
+                system_instruction=system_instruction,
+                token_count=tokens,
+                expire_time=datetime.utcnow() + (ttl or timedelta(hours=1))
+            )
+            self.stats['cache_creations'] += 1
+            return self.caches[name]
+
+    def _resolve_cache(self, name: str):
+        cache = self.caches.get(name)
+        if cache is None or cache.expire_time <= datetime.utcnow():
+            raise LookupError(f"404 CachedContent not found (or expired): {name}")
+        return cache
+
+class LocalGenerativeModel:
+    _genai = None
+
+    def __init__(self, model_name: str, system_instruction: str = None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cached_content = None
+
+    @classmethod
+    def from_cached_content(cls, cached_content, **kwargs):
+        model = cls(cached_content.model)
+        model.cached_content = cached_content.name
+        return model
+
+    def generate_content(self, contents, generation_config: dict = None, stream: bool = False):
+        self._genai._local.calls = self._genai.thread_calls() + 1
+        text, usage = self._respond(contents, generation_config)
+
+        if self._genai.latency_ms:
+            time.sleep(self._genai.latency_ms / 1000)
+
+        if stream:
+            return self._stream(text, usage)
+        return SimpleNamespace(text=text, parts=[text], usage_metadata=usage)
+
+    async def generate_content_async(self, contents, generation_config: dict = None, stream: bool = False):
+        text, usage = self._respond(contents, generation_config)
+
+        if self._genai.latency_ms:
+            await asyncio.sleep(self._genai.latency_ms / 1000)
+
+        if stream:
+            return self._stream_async(text, usage)
+        return SimpleNamespace(text=text, parts=[text], usage_metadata=usage)
+
+    def _respond(self, contents, generation_config: dict) -> tuple:
+        """Build the reply text and usage metadata, and record the call"""
+        genai = self._genai
+
+        system_instruction = self.system_instruction
+        cached_tokens = 0
+        if self.cached_content:
+            cache = genai._resolve_cache(self.cached_content)
+            system_instruction = cache.system_instruction
+            cached_tokens = cache.token_count
+
+        if isinstance(contents, str):
+            contents = [{'role': 'user', 'parts': [contents]}]
+        prompt = '\n'.join(part for content in contents for part in content['parts'])
+
+        if (generation_config or {}).get('response_mime_type') == 'application/json':
+            text = self._stub._scenario_json(prompt)
+        else:
+            text = self._stub._reply(f'{system_instruction}\n{prompt}')
+
+        prompt_tokens = estimate_tokens(system_instruction or '') + estimate_tokens(prompt)
+        usage = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=estimate_tokens(text),
+            cached_content_token_count=cached_tokens
+        )
+        with genai._lock:
+            genai.stats['calls'] += 1
+            genai.stats['prompt_tokens'] += prompt_tokens
+            genai.stats['cached_tokens'] += cached_tokens
+
+        return text, usage
+
+    @property
+    def _stub(self):
+        return self._genai._stub
+
+    @classmethod
+    async def _stream_async(cls, text: str, usage):
+        for chunk in cls._stream(text, usage):
+            yield chunk
+
+    @staticmethod
+    def _stream(text: str, usage):
+        words = text.split(' ')
+        for i, word in enumerate(words):
+            chunk_text = word if i == len(words) - 1 else word + ' '
+            yield SimpleNamespace(
+                text=chunk_text,
+                parts=[chunk_text],
+                usage_metadata=usage if i == len(words) - 1 else None
+            )
@@ -0,0 +1,463 @@
+"""
+In-memory stand-in for the Supabase client used by the backend.
+
+Implements the subset of the postgrest query builder the app uses (select
+with embedded relations, filters, ordering, limit/range, insert, upsert,
+update, delete, rpc) against Python lists, with injectable per-query
+latency and round-trip counting. Not a database: just enough for load
+testing our own request handling without a network.
+"""
+import copy
+import difflib
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from postgrest.exceptions import APIError
+
+# Primary key of each table (defaults to 'id')
+PRIMARY_KEYS = {
+    'students': 'nim',
+    'grades': 'assignment_id',
+    'assignment_claims': 'student_nim',
+    'scenario_pool_leases': 'name',
+    'chat_summaries': 'assignment_id'
+}
+
+# Extra unique constraints
+UNIQUE_COLUMNS = {
+    'users': ['email'],
+    'assignments': ['student_nim']
+}
+
+# (table, embedded relation) -> (local column, remote column)
+FOREIGN_KEYS = {
+    ('assignments', 'datasets'): ('dataset_id', 'id'),
+    ('assignments', 'students'): ('student_nim', 'nim')
+}
+
+# (table, embedded relation) -> (local column, remote column) of tables
+# referencing this one, embedded as a list of rows
+REFERENCING_KEYS = {
+    ('assignments', 'submissions'): ('id', 'assignment_id'),
+    ('assignments', 'grades'): ('id', 'assignment_id')
+}
+
+# Foreign keys checked on insert: table -> [(column, referenced table, referenced column)]
+REFERENCES = {
+    'assignment_claims': [('student_nim', 'students', 'nim')]
+}
+
+# Tables removed with their parent row (ON DELETE CASCADE)
+CASCADES = {
+    'assignments': [('chat_messages', 'assignment_id'), ('chat_summaries', 'assignment_id'), ('submissions', 'assignment_id'), ('grades', 'assignment_id')],
+    'datasets': [('assignments', 'dataset_id'), ('scenario_pool', 'dataset_id')]
+}
+
+# Server-assigned timestamp column of each table (defaults to 'created_at')
+TIMESTAMP_COLUMNS = {
+    'chat_messages': 'timestamp',
+    'assignment_claims': 'claimed_at',
+    'scenario_pool_leases': 'leased_at',
+    'chat_summaries': 'updated_at',
+    'token_revocations': 'revoked_at'
+}
+
+class LocalResponse:
+    """Mimics postgrest's APIResponse"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class LocalSupabase:
+    """In-memory Supabase client with latency injection and round-trip counters"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, seed: int = 0):
+        """
+        Args:
+            latency_ms: Simulated round-trip time added to every query
+            jitter_ms: Uniform random extra latency (0..jitter_ms)
+            seed: Seed for the jitter
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tables = {}
+        self.functions = dict(SCHEMA_FUNCTIONS)
+        self.round_trips = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._last_timestamp = datetime.utcnow()
+
+    def table(self, name: str) -> 'LocalQuery':
+        return LocalQuery(self, name)
+
+    def rpc(self, fn: str, params: dict) -> 'LocalRPC':
+        return LocalRPC(self, fn, params)
+
+    def register_function(self, name: str, fn):
+        """Register a Python implementation of a Postgres function: fn(db, params) -> data"""
+        self.functions[name] = fn
+
+    def rows(self, table: str) -> list:
+        """Direct access to a table's rows (for seeding)"""
+        return self.tables.setdefault(table, [])
+
+    def thread_round_trips(self) -> int:
+        """Number of queries issued by the calling thread so far"""
+        return getattr(self._local, 'round_trips', 0)
+
+    def total_round_trips(self) -> int:
+        with self._lock:
+            return sum(self.round_trips.values())
+
+    def _round_trip(self, label: str):
+        """Account for one query and sleep for the simulated network latency"""
+        self._local.round_trips = self.thread_round_trips() + 1
+        with self._lock:
+            self.round_trips[label] += 1
+            delay = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def _now(self) -> str:
+        """Strictly increasing server timestamp"""
+        with self._lock:
+            now = datetime.utcnow()
+            if now <= self._last_timestamp:
+                now = self._last_timestamp + timedelta(microseconds=1)
+            self._last_timestamp = now
+            return now.isoformat()
+
+class LocalRPC:
+    def __init__(self, db: LocalSupabase, fn: str, params: dict):
+        self.db = db
+        self.fn = fn
+        self.params = params
+
+    def execute(self) -> LocalResponse:
+        self.db._round_trip(f'rpc:{self.fn}')
+        if self.fn not in self.db.functions:
+            raise APIError({'code': 'PGRST202', 'message': f'Could not find the function {self.fn}'})
+        with self.db._lock:
+            return LocalResponse(copy.deepcopy(self.db.functions[self.fn](self.db, self.params)))
+
+class LocalQuery:
+    """Chainable query builder mirroring postgrest's request builders"""
+
+    def __init__(self, db: LocalSupabase, table: str):
+        self.db = db
+        self.table = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.count_method = None
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.orders = []
+        self.limit_value = None
+        self.range_value = None
+
+    # Operations
+
+    def select(self, *columns, count=None):
+        self.columns = ','.join(columns) if columns else '*'
+        self.count_method = count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.operation = 'insert'
+        self.payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = None, **kwargs):
+        self.operation = 'upsert'
+        self.payload = rows
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, values: dict, **kwargs):
+        self.operation = 'update'
+        self.payload = values
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = 'delete'
+        return self
+
+    # Filters
+
+    def eq(self, column, value):
+        return self._filter(lambda row: _text(row.get(column)) == _text(value))
+
+    def neq(self, column, value):
+        return self._filter(lambda row: _text(row.get(column)) != _text(value))
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and _compare(row.get(column), value) > 0)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and _compare(row.get(column), value) >= 0)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and _compare(row.get(column), value) < 0)
+
+    def lte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and _compare(row.get(column), value) <= 0)
+
+    def in_(self, column, values):
+        allowed = {_text(value) for value in values}
+        return self._filter(lambda row: _text(row.get(column)) in allowed)
+
+    def is_(self, column, value):
+        if value in (None, 'null'):
+            return self._filter(lambda row: row.get(column) is None)
+        return self._filter(lambda row: row.get(column) == value)
+
+    def like(self, column, pattern):
+        return self._pattern(column, pattern, 0)
+
+    def ilike(self, column, pattern):
+        return self._pattern(column, pattern, re.IGNORECASE)
+
+    # Modifiers
+
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self.limit_value = size
+        return self
+
+    def range(self, start, end):
+        self.range_value = (start, end)
+        return self
+
+    def execute(self) -> LocalResponse:
+        self.db._round_trip(f'{self.operation}:{self.table}')
+        with self.db._lock:
+            if self.operation in ('insert', 'upsert'):
+                return self._execute_write()
+            return self._execute_read_or_delete()
+
+    # Internals
+
+    def _filter(self, predicate):
+        self.filters.append(predicate)
+        return self
+
+    def _pattern(self, column, pattern, flags):
+        regex = re.compile('^' + re.escape(pattern).replace('%', '.*').replace('_', '.') + '$', flags)
+        return self._filter(lambda row: row.get(column) is not None and bool(regex.match(str(row.get(column)))))
+
+    def _execute_write(self) -> LocalResponse:
+        rows = self.db.rows(self.table)
+        primary_key = PRIMARY_KEYS.get(self.table, 'id')
+        conflict_column = self.on_conflict or primary_key
+        timestamp_column = TIMESTAMP_COLUMNS.get(self.table, 'created_at')
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+
+        written = []
+        for values in payload:
+            row = dict(values)
+            if primary_key == 'id':
+                row.setdefault('id', str(uuid.uuid4()))
+            row.setdefault(timestamp_column, self.db._now())
+
+            existing = next((r for r in rows if _text(r.get(conflict_column)) == _text(row.get(conflict_column))), None)
+            if existing is not None:
+                if self.operation == 'insert':
+                    raise APIError({'code': '23505', 'message': f'duplicate key value violates unique constraint on {self.table}.{conflict_column}'})
+                existing.update(values)
+                written.append(copy.deepcopy(existing))
+                continue
+
+            for column, referenced_table, referenced_column in REFERENCES.get(self.table, []):
+                if not any(r.get(referenced_column) == row.get(column) for r in self.db.rows(referenced_table)):
+                    raise APIError({'code': '23503', 'message': f'insert on {self.table} violates foreign key constraint on {column}'})
+
+            for column in UNIQUE_COLUMNS.get(self.table, []):
+                if any(r.get(column) == row.get(column) for r in rows):
+                    raise APIError({'code': '23505', 'message': f'duplicate key value violates unique constraint on {self.table}.{column}'})
+
+            rows.append(row)
+            written.append(copy.deepcopy(row))
+
+        return LocalResponse(written)
+
+    def _execute_read_or_delete(self) -> LocalResponse:
+        rows = self.db.rows(self.table)
+        matched = [row for row in rows if all(predicate(row) for predicate in self.filters)]
+
+        if self.operation == 'update':
+            for row in matched:
+                row.update(self.payload)
+            return LocalResponse(copy.deepcopy(matched))
+
+        if self.operation == 'delete':
+            self._delete_rows(self.table, matched)
+            return LocalResponse(copy.deepcopy(matched))
+
+        for column, desc in reversed(self.orders):
+            matched.sort(key=lambda row: (row.get(column) is None, _sort_key(row.get(column))), reverse=desc)
+
+        count = len(matched) if self.count_method else None
+
+        if self.range_value:
+            matched = matched[self.range_value[0]:self.range_value[1] + 1]
+        if self.limit_value is not None:
+            matched = matched[:self.limit_value]
+
+        return LocalResponse([self._project(self.table, self.columns, row) for row in matched], count)
+
+    def _delete_rows(self, table: str, doomed: list):
+        doomed_ids = {id(row) for row in doomed}
+        self.db.tables[table] = [row for row in self.db.rows(table) if id(row) not in doomed_ids]
+
+        for child_table, child_column in CASCADES.get(table, []):
+            parent_column = 'id'
+            parent_values = {row.get(parent_column) for row in doomed}
+            children = [row for row in self.db.rows(child_table) if row.get(child_column) in parent_values]
+            if children:
+                self._delete_rows(child_table, children)
+
+    def _project(self, table: str, columns: str, row: dict) -> dict:
+        """Apply a postgrest column list (embeds, aliases, ->> paths) to a row"""
+        if columns.strip() == '*':
+            return copy.deepcopy(row)
+
+        projected = {}
+        for part in _split_columns(columns):
+            embed = re.match(r'^(?:(\w+):)?(\w+)\((.*)\)$', part)
+            if embed:
+                alias, relation, inner = embed.groups()
+                if (table, relation) in REFERENCING_KEYS:
+                    local_column, remote_column = REFERENCING_KEYS[(table, relation)]
+                    projected[alias or relation] = [
+                        self._project(relation, inner, r)
+                        for r in self.db.rows(relation) if r.get(remote_column) == row.get(local_column)
+                    ]
+                    continue
+                local_column, remote_column = FOREIGN_KEYS[(table, relation)]
+                target = next((r for r in self.db.rows(relation) if r.get(remote_column) == row.get(local_column)), None)
+                projected[alias or relation] = self._project(relation, inner, target) if target else None
+                continue
+
+            if part == '*':
+                projected.update(copy.deepcopy(row))
+                continue
+
+            json_path = re.match(r'^(?:(\w+):)?(\w+)->>(\w+)$', part)
+            if json_path:
+                alias, column, key = json_path.groups()
+                value = (row.get(column) or {}).get(key)
+                projected[alias or key] = None if value is None else str(value)
+                continue
+
+            alias, _, column = part.rpartition(':')
+            projected[alias or column] = copy.deepcopy(row.get(column))
+
+        return projected
+
+def _search_students(db: LocalSupabase, params: dict) -> list:
+    """search_students() from docs/db_schema.sql; difflib stands in for pg_trgm word similarity"""
+    term = params['search_query'].lower()
+    limit = min(max(params.get('result_limit', 20), 1), 100)
+
+    matches = []
+    for student in db.rows('students'):
+        nim, name = student['nim'].lower(), student['name'].lower()
+        if nim == term:
+            rank = 1.0
+        elif nim.startswith(term):
+            rank = 0.9
+        elif name == term:
+            rank = 0.9
+        elif name.startswith(term):
+            rank = 0.8
+        else:
+            word_similarity = max(
+                (difflib.SequenceMatcher(None, term, word).ratio() for word in name.split()),
+                default=0.0
+            )
+            if term not in nim and term not in name and word_similarity < 0.6:
+                continue
+            rank = 0.7 * max(word_similarity, difflib.SequenceMatcher(None, nim, term).ratio())
+        matches.append({**student, 'rank': rank})
+
+    matches.sort(key=lambda student: (-student['rank'], student['nim']))
+    return matches[:limit]
+
+def _append_chat_turn(db: LocalSupabase, params: dict) -> list:
+    """append_chat_turn() from docs/db_schema.sql"""
+    messages = [
+        {
+            'id': str(uuid.uuid4()),
+            'assignment_id': params['chat_assignment_id'],
+            'sender': sender,
+            'content': params[f'{sender}_content'],
+            'timestamp': db._now()
+        }
+        for sender in ('student', 'ai')
+    ]
+    db.rows('chat_messages').extend(messages)
+    return messages
+
+def _save_chat_summary(db: LocalSupabase, params: dict) -> list:
+    """save_chat_summary() from docs/db_schema.sql"""
+    rows = db.rows('chat_summaries')
+    existing = next((row for row in rows if row['assignment_id'] == params['chat_assignment_id']), None)
+
+    if existing is None:
+        existing = {'assignment_id': params['chat_assignment_id']}
+        rows.append(existing)
+    elif _compare(params['new_summarized_until'], existing['summarized_until']) <= 0:
+        return [existing]
+
+    existing.update(
+        summary=params['new_summary'],
+        summarized_until=params['new_summarized_until'],
+        updated_at=db._now()
+    )
+    return [existing]
+
+# Python implementations of the functions defined in docs/db_schema.sql
+SCHEMA_FUNCTIONS = {
+    'search_students': _search_students,
+    'append_chat_turn': _append_chat_turn,
+    'save_chat_summary': _save_chat_summary
+}
+
+def _split_columns(columns: str) -> list:
+    """Split a column list on top-level commas (not inside embeds)"""
+    parts, depth, current = [], 0, ''
+    for char in columns:
+        depth += (char == '(') - (char == ')')
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+def _text(value) -> str:
+    """Compare values the way PostgREST filters do: as text"""
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+def _sort_key(value):
+    return value if isinstance(value, (int, float)) else str(value)
+
+def _compare(left, right) -> int:
+    if isinstance(left, (int, float)) and not isinstance(right, str):
+        return (left > right) - (left < right)
+    left, right = str(left), str(right)
+    return (left > right) - (left < right)
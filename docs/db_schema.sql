@@ -4,6 +4,9 @@
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Enable trigram matching (student search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Table: users (Lecturers)
 CREATE TABLE IF NOT EXISTS users (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -19,6 +22,10 @@ CREATE TABLE IF NOT EXISTS students (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Trigram indexes for student search (substring and misspelling matches on NIM and name)
+CREATE INDEX IF NOT EXISTS idx_students_nim_trgm ON students USING GIN (nim gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_students_name_trgm ON students USING GIN (name gin_trgm_ops);
+
 -- Table: datasets (Enhanced for Meta-Prompt Architecture)
 CREATE TABLE IF NOT EXISTS datasets (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -41,6 +48,23 @@ CREATE TABLE IF NOT EXISTS assignments (
     UNIQUE(student_nim)
 );
 
+-- Table: assignment_claims (one in-flight assignment generation per student across workers)
+CREATE TABLE IF NOT EXISTS assignment_claims (
+    student_nim VARCHAR(50) PRIMARY KEY REFERENCES students(nim) ON DELETE CASCADE,
+    claimed_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Table: token_revocations (JWTs revoked before they expire, loaded by every worker)
+CREATE TABLE IF NOT EXISTS token_revocations (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    jti VARCHAR(64),  -- A single token (logout)
+    user_id VARCHAR(255),  -- Every token of this user issued up to revoked_at (force logout)
+    revoked_at TIMESTAMP DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,  -- No revoked token is valid after this; older rows can be deleted
+    CHECK (jti IS NOT NULL OR user_id IS NOT NULL)
+);
+CREATE INDEX IF NOT EXISTS idx_token_revocations_expires ON token_revocations(expires_at);
+
 -- Table: chat_messages
 CREATE TABLE IF NOT EXISTS chat_messages (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -53,6 +77,14 @@ CREATE TABLE IF NOT EXISTS chat_messages (
 -- Index for chat messages
 CREATE INDEX IF NOT EXISTS idx_chat_assignment ON chat_messages(assignment_id, timestamp);
 
+-- Table: chat_summaries (rolling summary of messages that no longer fit the Actor context budget)
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    assignment_id UUID PRIMARY KEY REFERENCES assignments(id) ON DELETE CASCADE,
+    summary TEXT NOT NULL,
+    summarized_until TIMESTAMP NOT NULL,  -- Timestamp of the last chat message folded into the summary
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
 -- Table: submissions
 CREATE TABLE IF NOT EXISTS submissions (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -70,9 +102,105 @@ CREATE TABLE IF NOT EXISTS grades (
     assignment_id UUID PRIMARY KEY REFERENCES assignments(id) ON DELETE CASCADE,
     score INTEGER CHECK (score >= 0 AND score <= 100),
     feedback TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()  -- Set on every upsert; versions the grading list ETag
+);
+-- Databases created before grades.updated_at existed
+ALTER TABLE grades ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+
+-- Table: scenario_pool (pre-generated scenarios claimed on first login)
+CREATE TABLE IF NOT EXISTS scenario_pool (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    dataset_id UUID REFERENCES datasets(id) ON DELETE CASCADE,
+    scenario_json JSONB NOT NULL,  -- Generated for placeholder student, personalized on claim
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Index for claiming the oldest pooled scenario of a dataset
+CREATE INDEX IF NOT EXISTS idx_scenario_pool_dataset ON scenario_pool(dataset_id, created_at);
+
+-- Table: scenario_pool_leases (only one worker replenishes the scenario pool at a time)
+CREATE TABLE IF NOT EXISTS scenario_pool_leases (
+    name VARCHAR(50) PRIMARY KEY,
+    holder VARCHAR(64) NOT NULL,  -- Token of the replenish pass holding the lease
+    leased_at TIMESTAMP DEFAULT NOW()  -- Renewed before every generation
+);
+
+-- Function: append_chat_turn (a student message and the AI reply to it, saved together in one round trip)
+CREATE OR REPLACE FUNCTION append_chat_turn(
+    chat_assignment_id UUID,
+    student_content TEXT,
+    ai_content TEXT
+)
+RETURNS SETOF chat_messages
+LANGUAGE sql
+AS $$
+    INSERT INTO chat_messages (assignment_id, sender, content, timestamp)
+    VALUES
+        (chat_assignment_id, 'student', student_content, NOW()),
+        -- NOW() is the transaction start time: keep the reply ordered after the message
+        (chat_assignment_id, 'ai', ai_content, NOW() + INTERVAL '1 microsecond')
+    RETURNING *;
+$$;
+
+-- Function: save_chat_summary (store a rolling summary, only ever moving summarized_until forward)
+-- A worker folding from a stale conversation leaves a newer summary in place. Returns the stored row.
+CREATE OR REPLACE FUNCTION save_chat_summary(
+    chat_assignment_id UUID,
+    new_summary TEXT,
+    new_summarized_until TIMESTAMP
+)
+RETURNS SETOF chat_summaries
+LANGUAGE sql
+AS $$
+    WITH saved AS (
+        INSERT INTO chat_summaries (assignment_id, summary, summarized_until, updated_at)
+        VALUES (chat_assignment_id, new_summary, new_summarized_until, NOW())
+        ON CONFLICT (assignment_id) DO UPDATE
+            SET summary = EXCLUDED.summary,
+                summarized_until = EXCLUDED.summarized_until,
+                updated_at = EXCLUDED.updated_at
+            WHERE EXCLUDED.summarized_until > chat_summaries.summarized_until
+        RETURNING *
+    )
+    SELECT * FROM saved
+    UNION ALL
+    SELECT * FROM chat_summaries
+    WHERE assignment_id = chat_assignment_id AND NOT EXISTS (SELECT 1 FROM saved);
+$$;
+
+-- Function: search_students (ranked NIM/name search, called via RPC)
+-- Matches a substring of the NIM or name, or a misspelled word of the name,
+-- all served by the trigram indexes. Exact and prefix NIM matches rank first.
+CREATE OR REPLACE FUNCTION search_students(search_query TEXT, result_limit INTEGER DEFAULT 20)
+RETURNS TABLE (nim VARCHAR, name VARCHAR, created_at TIMESTAMP, rank REAL)
+LANGUAGE sql STABLE
+AS $$
+    WITH q AS (
+        SELECT
+            lower(search_query) AS term,
+            -- Treat LIKE wildcards in the query literally
+            replace(replace(replace(lower(search_query), '\', '\\'), '%', '\%'), '_', '\_') AS escaped
+    )
+    SELECT
+        s.nim,
+        s.name,
+        s.created_at,
+        (CASE
+            WHEN lower(s.nim) = q.term THEN 1.0
+            WHEN lower(s.nim) LIKE q.escaped || '%' THEN 0.9
+            WHEN lower(s.name) = q.term THEN 0.9
+            WHEN lower(s.name) LIKE q.escaped || '%' THEN 0.8
+            ELSE 0.7 * GREATEST(similarity(s.nim, q.term), word_similarity(q.term, s.name))
+        END)::REAL AS rank
+    FROM students s, q
+    WHERE s.nim ILIKE '%' || q.escaped || '%'
+       OR s.name ILIKE '%' || q.escaped || '%'
+       OR q.term <% s.name
+    ORDER BY rank DESC, s.nim
+    LIMIT LEAST(GREATEST(result_limit, 1), 100);
+$$;
+
 -- Optional: Row Level Security (RLS) policies
 -- Uncomment if you want to enable RLS
 
@@ -80,9 +208,14 @@ CREATE TABLE IF NOT EXISTS grades (
 -- ALTER TABLE students ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE datasets ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE assignments ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE assignment_claims ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE token_revocations ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE chat_messages ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE chat_summaries ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE submissions ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE grades ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE scenario_pool ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE scenario_pool_leases ENABLE ROW LEVEL SECURITY;
 
 -- Example RLS policy for students (students can only see their own data)
 -- CREATE POLICY "Students can view own data" ON students
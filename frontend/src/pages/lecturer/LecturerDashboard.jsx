@@ -24,12 +24,16 @@ const LecturerDashboard = () => {
 
     // Roster upload state
     const [rosterText, setRosterText] = useState('');
+    const [rosterFile, setRosterFile] = useState(null);
     const [uploading, setUploading] = useState(false);
 
     // Grading state
     const [selectedStudent, setSelectedStudent] = useState(null);
     const [gradeForm, setGradeForm] = useState({ score: '', feedback: '' });
     const [gradingPage, setGradingPage] = useState(1);
+    // pageCursors[i] is the cursor that loads page i + 1 (null for the first page)
+    const [pageCursors, setPageCursors] = useState([null]);
+    const [hasNextPage, setHasNextPage] = useState(false);
     const [searchQuery, setSearchQuery] = useState('');
     const [isSearching, setIsSearching] = useState(false);
 
@@ -46,9 +50,15 @@ const LecturerDashboard = () => {
                 const response = await datasetAPI.getAll();
                 setDatasets(response.data.datasets);
             } else if (activeTab === 'grading') {
-                const response = await gradingAPI.getAllStudents(gradingPage, itemsPerPage);
-                setStudents(response.data.students);
-                setTotalStudents(response.data.total || 0);
+                const page = gradingPage;
+                const response = await gradingAPI.getAllStudents(pageCursors[page - 1], itemsPerPage, page === 1);
+                const { students, next_cursor, total } = response.data;
+                setStudents(students);
+                setHasNextPage(Boolean(next_cursor));
+                setPageCursors(cursors => [...cursors.slice(0, page), next_cursor]);
+                if (total !== null && total !== undefined) {
+                    setTotalStudents(total);
+                }
             }
         } catch (error) {
             console.error('Error loading data:', error);
@@ -57,6 +67,21 @@ const LecturerDashboard = () => {
         }
     };
 
+    const handleExport = async (format) => {
+        try {
+            const response = await gradingAPI.exportGradebook(format);
+            const url = URL.createObjectURL(response.data);
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = `gradebook.${format}`;
+            link.click();
+            URL.revokeObjectURL(url);
+        } catch (error) {
+            console.error('Error exporting gradebook:', error);
+            alert('Failed to export gradebook');
+        }
+    };
+
     const handleSearch = async (e) => {
         e.preventDefault();
         if (!searchQuery.trim()) {
@@ -137,6 +162,25 @@ const LecturerDashboard = () => {
         }
     };
 
+    const handleImportRoster = async (e) => {
+        e.preventDefault();
+        if (!rosterFile) return;
+        setUploading(true);
+        try {
+            const response = await authAPI.importRoster(rosterFile);
+            const { imported, failed, errors } = response.data;
+            const details = errors.map(err => `Row ${err.row}: ${err.error}`).join('\n');
+            alert(`Imported ${imported} students, ${failed} rows failed${details ? '\n\n' + details : ''}`);
+            setRosterFile(null);
+            e.target.reset();
+        } catch (error) {
+            console.error('Error importing roster:', error);
+            alert(error.response?.data?.error || 'Failed to import roster');
+        } finally {
+            setUploading(false);
+        }
+    };
+
     const handleSubmitGrade = async (e) => {
         e.preventDefault();
         try {
@@ -360,6 +404,26 @@ const LecturerDashboard = () => {
                                 </button>
                             </form>
                         </div>
+                        <div className="card" style={{ marginTop: 'var(--spacing-xl)' }}>
+                            <form onSubmit={handleImportRoster}>
+                                <div className="form-group">
+                                    <label className="form-label">Or import a CSV / Excel file</label>
+                                    <input
+                                        type="file"
+                                        className="form-input"
+                                        accept=".csv,.xlsx"
+                                        onChange={(e) => setRosterFile(e.target.files[0] || null)}
+                                        required
+                                    />
+                                    <p style={{ fontSize: 'var(--text-sm)', color: 'var(--text-tertiary)', marginTop: 'var(--spacing-sm)' }}>
+                                        Columns: NIM, Name (or a header row with "nim" and "name" columns)
+                                    </p>
+                                </div>
+                                <button type="submit" className="btn btn-success btn-lg" disabled={uploading || !rosterFile}>
+                                    {uploading ? 'Importing...' : 'Import File'}
+                                </button>
+                            </form>
+                        </div>
                     </div>
                 )}
 
@@ -373,6 +437,7 @@ const LecturerDashboard = () => {
                                     value={itemsPerPage}
                                     onChange={(e) => {
                                         setItemsPerPage(Number(e.target.value));
+                                        setPageCursors([null]);
                                         setGradingPage(1);
                                     }}
                                     className="form-input"
@@ -398,6 +463,12 @@ const LecturerDashboard = () => {
                                         Clear
                                     </button>
                                 )}
+                                <button type="button" onClick={() => handleExport('csv')} className="btn btn-secondary">
+                                    Export CSV
+                                </button>
+                                <button type="button" onClick={() => handleExport('xlsx')} className="btn btn-secondary">
+                                    Export Excel
+                                </button>
                             </form>
                         </div>
                         {loading ? (
@@ -477,7 +548,7 @@ const LecturerDashboard = () => {
                                 </div>
 
                                 {/* Pagination Controls (Hide when searching) */}
-                                {!isSearching && totalStudents > itemsPerPage && (
+                                {!isSearching && (gradingPage > 1 || hasNextPage) && (
                                     <div style={{ display: 'flex', justifyContent: 'center', gap: 'var(--spacing-sm)', marginTop: 'var(--spacing-xl)' }}>
                                         <button
                                             onClick={() => setGradingPage(p => Math.max(1, p - 1))}
@@ -488,13 +559,13 @@ const LecturerDashboard = () => {
                                             Previous
                                         </button>
                                         <span style={{ display: 'flex', alignItems: 'center', padding: '0 var(--spacing-md)' }}>
-                                            Page {gradingPage} of {Math.ceil(totalStudents / itemsPerPage)}
+                                            Page {gradingPage} of ~{Math.max(gradingPage, Math.ceil(totalStudents / itemsPerPage))}
                                         </span>
                                         <button
-                                            onClick={() => setGradingPage(p => Math.min(Math.ceil(totalStudents / itemsPerPage), p + 1))}
-                                            disabled={gradingPage >= Math.ceil(totalStudents / itemsPerPage)}
+                                            onClick={() => setGradingPage(p => p + 1)}
+                                            disabled={!hasNextPage}
                                             className="btn btn-secondary"
-                                            style={{ opacity: gradingPage >= Math.ceil(totalStudents / itemsPerPage) ? 0.5 : 1 }}
+                                            style={{ opacity: hasNextPage ? 1 : 0.5 }}
                                         >
                                             Next
                                         </button>
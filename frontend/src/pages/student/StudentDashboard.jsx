@@ -6,6 +6,9 @@ const StudentDashboard = () => {
     const { user, logout } = useAuth();
     const [assignment, setAssignment] = useState(null);
     const [messages, setMessages] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [prevCursor, setPrevCursor] = useState(null);
+    const [loadingOlder, setLoadingOlder] = useState(false);
     const [newMessage, setNewMessage] = useState('');
     const [loading, setLoading] = useState(true);
     const [sending, setSending] = useState(false);
@@ -27,9 +30,10 @@ const StudentDashboard = () => {
         }
     }, [assignment]);
 
+    // Only new messages scroll the chat down, not older pages loaded above
     useEffect(() => {
         scrollToBottom();
-    }, [messages]);
+    }, [messages[messages.length - 1]?.id]);
 
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -50,11 +54,49 @@ const StudentDashboard = () => {
         try {
             const response = await chatAPI.getMessages(assignment.id);
             setMessages(response.data.messages);
+            setNextCursor(response.data.next_cursor);
+            setPrevCursor(response.data.prev_cursor);
         } catch (error) {
             console.error('Error loading messages:', error);
         }
     };
 
+    // Fetch only the messages sent since the last load
+    const syncMessages = async () => {
+        if (!nextCursor) {
+            return loadMessages();
+        }
+        try {
+            let after = nextCursor;
+            let hasMore = true;
+            while (hasMore) {
+                const response = await chatAPI.getMessages(assignment.id, { after });
+                const newMessages = response.data.messages;
+                setMessages((current) => [...current, ...newMessages]);
+                after = response.data.next_cursor;
+                hasMore = response.data.has_more;
+            }
+            setNextCursor(after);
+        } catch (error) {
+            console.error('Error syncing messages:', error);
+        }
+    };
+
+    const loadOlderMessages = async () => {
+        if (!prevCursor || loadingOlder) return;
+
+        setLoadingOlder(true);
+        try {
+            const response = await chatAPI.getMessages(assignment.id, { before: prevCursor });
+            setMessages((current) => [...response.data.messages, ...current]);
+            setPrevCursor(response.data.prev_cursor);
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     const loadSubmissions = async () => {
         try {
             const response = await submissionAPI.getByAssignment(assignment.id);
@@ -71,7 +113,7 @@ const StudentDashboard = () => {
         setSending(true);
         try {
             const response = await chatAPI.sendMessage(assignment.id, newMessage);
-            await loadMessages();
+            await syncMessages();
             setNewMessage('');
         } catch (error) {
             console.error('Error sending message:', error);
@@ -209,6 +251,13 @@ const StudentDashboard = () => {
                         </div>
 
                         <div style={{ flex: 1, overflowY: 'auto', marginBottom: 'var(--spacing-lg)', padding: 'var(--spacing-md)', background: 'var(--bg-secondary)', borderRadius: 'var(--radius-md)' }}>
+                            {prevCursor && (
+                                <div style={{ textAlign: 'center', marginBottom: 'var(--spacing-md)' }}>
+                                    <button onClick={loadOlderMessages} className="btn btn-sm btn-secondary" disabled={loadingOlder}>
+                                        {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                                    </button>
+                                </div>
+                            )}
                             {messages.length === 0 ? (
                                 <div style={{ textAlign: 'center', padding: 'var(--spacing-2xl)', color: 'var(--text-tertiary)' }}>
                                     <p>No messages yet. Start the conversation!</p>
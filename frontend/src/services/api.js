@@ -40,6 +40,11 @@ export const authAPI = {
     lecturerLogin: (email, password) => api.post('/auth/lecturer/login', { email, password }),
     lecturerRegister: (email, password) => api.post('/auth/lecturer/register', { email, password }),
     uploadRoster: (students) => api.post('/auth/students/upload-roster', { students }),
+    importRoster: (file) => {
+        const formData = new FormData();
+        formData.append('file', file);
+        return api.post('/auth/students/import-roster', formData);
+    },
 };
 
 // Dataset API
@@ -57,7 +62,8 @@ export const assignmentAPI = {
 
 // Chat API
 export const chatAPI = {
-    getMessages: (assignmentId) => api.get(`/chat/${assignmentId}/messages`),
+    getMessages: (assignmentId, { after, before, limit } = {}) =>
+        api.get(`/chat/${assignmentId}/messages`, { params: { after, before, limit } }),
     sendMessage: (assignmentId, content) => api.post(`/chat/${assignmentId}/message`, { content }),
 };
 
@@ -70,13 +76,16 @@ export const submissionAPI = {
 
 // Grading API
 export const gradingAPI = {
-    getAllStudents: (page, limit) => api.get('/grading/students', { params: { page, limit } }),
+    getAllStudents: (cursor, limit, withCount) =>
+        api.get('/grading/students', { params: { cursor, limit, count: withCount ? 'estimated' : undefined } }),
     submitGrade: (assignmentId, score, feedback) =>
         api.post('/grading/grade', { assignment_id: assignmentId, score, feedback }),
+    submitGrades: (grades) => api.post('/grading/grades/bulk', { grades }),
+    exportGradebook: (format) => api.get('/grading/export', { params: { format }, responseType: 'blob' }),
 };
 
 export const searchAPI = {
-    searchStudents: (query) => api.get(`/grading/search/${query}`),
+    searchStudents: (query) => api.get(`/grading/search/${encodeURIComponent(query)}`),
 };
 
 export default api;
@@ -0,0 +1,143 @@
+"""Query-count and response-shape tests for grading dashboard enrichment"""
+from backend.routes.grading import IN_FILTER_CHUNK_SIZE, _enrich_students_data
+
+
+class _FakeQuery:
+    """Minimal PostgREST query builder over in-memory rows"""
+
+    def __init__(self, client, table):
+        self._client = client
+        self._rows = list(client.tables.get(table, []))
+        self._embed = False
+
+    def select(self, columns, **kwargs):
+        self._embed = 'datasets(' in columns
+        return self
+
+    def eq(self, column, value):
+        self._rows = [row for row in self._rows if row[column] == value]
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._rows = [row for row in self._rows if row[column] in values]
+        return self
+
+    def order(self, column, desc=False):
+        self._rows.sort(key=lambda row: row[column], reverse=desc)
+        return self
+
+    def execute(self):
+        self._client.executed += 1
+        rows = [dict(row) for row in self._rows]
+        if self._embed:
+            datasets = {dataset['id']: dataset for dataset in self._client.tables['datasets']}
+            for row in rows:
+                row['datasets'] = datasets[row['dataset_id']]
+        return type('Result', (), {'data': rows})()
+
+
+class _FakeSupabase:
+    """Counts every `.execute()` round trip"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.executed = 0
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+
+def _make_tables(student_count):
+    """Every other student has an assignment, each with two submissions and a grade"""
+    students = [{'nim': f'{i:08d}', 'name': f'Student {i}'} for i in range(student_count)]
+    datasets = [{'id': 'ds-1', 'name': 'Sales'}]
+    assignments, submissions, grades = [], [], []
+    for i, student in enumerate(students):
+        if i % 2:
+            continue
+        assignment_id = f'a-{i}'
+        assignments.append({
+            'id': assignment_id,
+            'student_nim': student['nim'],
+            'dataset_id': 'ds-1',
+            'scenario_json': {'role': 'analyst', 'n': i},
+            'created_at': f'2024-01-01T00:00:{i % 60:02d}'
+        })
+        for k in range(2):
+            submissions.append({
+                'id': f's-{i}-{k}',
+                'assignment_id': assignment_id,
+                'created_at': f'2024-02-0{k + 1}T00:00:00'
+            })
+        grades.append({'assignment_id': assignment_id, 'score': 80, 'feedback': None})
+    return students, {
+        'students': students,
+        'datasets': datasets,
+        'assignments': assignments,
+        'submissions': submissions,
+        'grades': grades,
+    }
+
+
+def _enrich_student_data_baseline(supabase, student):
+    """The per-student enrichment the bulk path replaced, kept as the shape oracle"""
+    assignment_result = supabase.table('assignments').select('*, datasets(*)').eq('student_nim', student['nim']).execute()
+    if not assignment_result.data:
+        return {'student': student, 'assignment': None, 'submissions': [], 'grade': None}
+    assignment = assignment_result.data[0]
+    submissions_result = supabase.table('submissions').select('*').eq('assignment_id', assignment['id']).order('created_at', desc=True).execute()
+    grade_result = supabase.table('grades').select('*').eq('assignment_id', assignment['id']).execute()
+    return {
+        'student': student,
+        'assignment': {
+            'id': assignment['id'],
+            'dataset': assignment['datasets'],
+            'scenario': assignment['scenario_json'],
+            'created_at': assignment['created_at']
+        },
+        'submissions': submissions_result.data,
+        'grade': grade_result.data[0] if grade_result.data else None
+    }
+
+
+def test_enrichment_query_count_is_constant_per_chunk():
+    # 3 NIM chunks; half the students have assignments -> 2 assignment id chunks
+    student_count = IN_FILTER_CHUNK_SIZE * 2 + 50
+    students, tables = _make_tables(student_count)
+    supabase = _FakeSupabase(tables)
+
+    enriched = _enrich_students_data(supabase, students)
+
+    nim_chunks = -(-student_count // IN_FILTER_CHUNK_SIZE)
+    id_chunks = -(-len(tables['assignments']) // IN_FILTER_CHUNK_SIZE)
+    assert nim_chunks == 3 and id_chunks == 2
+    # assignments per NIM chunk, submissions + grades per assignment id chunk
+    assert supabase.executed == nim_chunks + 2 * id_chunks
+    assert len(enriched) == student_count
+
+
+def test_enrichment_query_count_does_not_grow_with_students():
+    counts = []
+    for student_count in (10, IN_FILTER_CHUNK_SIZE):
+        students, tables = _make_tables(student_count)
+        supabase = _FakeSupabase(tables)
+        _enrich_students_data(supabase, students)
+        counts.append(supabase.executed)
+    assert counts == [3, 3]
+
+
+def test_enrichment_matches_per_student_shape():
+    students, tables = _make_tables(IN_FILTER_CHUNK_SIZE + 7)
+
+    enriched = _enrich_students_data(_FakeSupabase(tables), students)
+
+    baseline_client = _FakeSupabase(tables)
+    baseline = [_enrich_student_data_baseline(baseline_client, student) for student in students]
+    assert enriched == baseline
+
+
+def test_enrichment_of_empty_page_issues_no_queries():
+    supabase = _FakeSupabase({})
+    assert _enrich_students_data(supabase, []) == []
+    assert supabase.executed == 0
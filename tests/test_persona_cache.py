@@ -0,0 +1,58 @@
+"""Offline tests for Gemini persona context caching, against benchmarks/local_genai.py"""
+import asyncio
+from backend.services.llm_backends import GeminiBackend
+from benchmarks.local_genai import LocalGenAI
+
+PERSONA = (
+    "You are Dr. Siti Rahmawati, Head of Clinical Operations at RS Sehat. "
+    "CONTEXT: You rely on the admissions dataset with columns patient_id, admission_date, department and wait_minutes. "
+    "YOUR BEHAVIOR: Friendly but busy, knows medicine but not data analysis. "
+    "RESTRICTIONS: Never write code. "
+) * 4
+
+TURNS = [{'role': 'user', 'text': 'Which department has the longest waits?'}]
+
+
+def _backend(min_cache_tokens):
+    genai = LocalGenAI(min_cache_tokens=min_cache_tokens)
+    backend = GeminiBackend(
+        api_key='test',
+        model_name='gemini-2.5-flash',
+        genai_module=genai,
+        cache_min_tokens=min_cache_tokens
+    )
+    return backend, genai
+
+
+def test_persona_cache_is_created_once_and_reused():
+    backend, genai = _backend(min_cache_tokens=100)
+
+    backend.chat(PERSONA, TURNS, 0.7)
+    backend.chat(PERSONA, TURNS + [{'role': 'model', 'text': 'Cardiology.'}, {'role': 'user', 'text': 'Why?'}], 0.7)
+
+    assert genai.stats['cache_creations'] == 1
+    assert genai.stats['calls'] == 2
+    # Both turns were served from the cached persona
+    assert genai.stats['cached_tokens'] == 2 * genai.caches['cachedContents/1'].token_count
+
+
+def test_persona_cache_is_reused_by_async_streaming():
+    backend, genai = _backend(min_cache_tokens=100)
+
+    async def stream():
+        return ''.join([chunk async for chunk in backend.chat_stream_async(PERSONA, TURNS, 0.7)])
+
+    assert asyncio.run(stream())
+    assert asyncio.run(stream())
+
+    assert genai.stats['cache_creations'] == 1
+    assert genai.stats['cached_tokens'] > 0
+
+
+def test_persona_below_minimum_uses_plain_model():
+    backend, genai = _backend(min_cache_tokens=1024)
+
+    backend.chat(PERSONA, TURNS, 0.7)
+
+    assert genai.stats['cache_creations'] == 0
+    assert genai.stats['cached_tokens'] == 0